@@ -1,8 +1,8 @@
 """All API routes for FastFood delivery system"""
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, BackgroundTasks
 from fastapi import File, Form, UploadFile
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pymongo import ReturnDocument
 from app.models.user import User, LoginRequest
 from app.models.restaurant import Restaurant
 from app.models.menu_item import MenuItem
@@ -10,14 +10,35 @@ from app.models.order import Order, OrderCreate, OrderItem
 from app.models.drone import Drone
 from app.services.auth_service import AuthService
 from app.services.payment_service import PaymentService
-from app.services.order_service import OrderService
+from app.services.order_service import ORDER_LIST_PROJECTION, OrderService
 from app.services.drone_service import DroneService
+from app.services.dispatch_service import dispatch_service
+from app.services.overview_service import overview_service
+from app.services.telemetry_service import telemetry_service
+from app.services.search_service import MAX_SEARCH_LIMIT, SEARCH_KINDS, search_service
+from app.services.media_service import ImageTooLargeError, SpooledImage, media_service
+from app.services.order_state import OrderTransitionError, transition_order
+from app.core.cache import build_cache, conditional_json_response, json_cache_entry
 from app.core.database import get_db
+from app.core.geo import geo_point, valid_lat_lon
+from app.core.migrations import normalize_lookup_key
+from app.core.pagination import DEFAULT_PAGE_LIMIT, paginate, paginate_near, parse_fields, with_links
+from app.core.serialization import FastJSONResponse, dumps, serialize_doc
+from app.core.streaming import export_response
 from app.websocket.manager import manager
-from app.core.cloudinary import CloudinaryNotConfiguredError, upload_menu_item_image, upload_restaurant_image
+from app.websocket.order_watcher import order_watcher
+from app.websocket.protocol import parse_format
+from app.core.storage import (
+    MENU_ITEM_FOLDER,
+    RESTAURANT_FOLDER,
+    LocalStorage,
+    MediaFileResponse,
+    StorageNotConfiguredError,
+)
 from bson import ObjectId
 from bson.errors import InvalidId
 from pydantic import BaseModel, Field
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 import asyncio
 
@@ -51,24 +72,9 @@ def _parse_object_id(value: str, *, field_name: str) -> ObjectId:
         raise HTTPException(status_code=400, detail=f"Invalid {field_name}")
 
 
-def _serialize_mongo_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
-    """Convert MongoDB document to JSON-serializable dict.
-
-    - Moves `_id` -> `id` (string)
-    - Stringifies any nested ObjectIds we commonly store (e.g., restaurant_id)
-    """
-    out: Dict[str, Any] = dict(doc)
-
-    if "_id" in out:
-        out["id"] = str(out.pop("_id"))
-
-    if isinstance(out.get("restaurant_id"), ObjectId):
-        out["restaurant_id"] = str(out["restaurant_id"])
-
-    if isinstance(out.get("drone_id"), ObjectId):
-        out["drone_id"] = str(out["drone_id"])
-
-    return out
+def _transition_http_error(error: OrderTransitionError) -> HTTPException:
+    """404 for a missing order, 409 for a refused transition"""
+    return HTTPException(status_code=404 if error.not_found else 409, detail=str(error))
 
 # Service instances
 auth_service = AuthService()
@@ -76,6 +82,92 @@ payment_service = PaymentService()
 order_service = OrderService()
 drone_service = DroneService()
 
+# Restaurant details and menus, keyed by restaurant id. Entries hold the
+# encoded JSON body + ETag and are invalidated by the menu/restaurant writes.
+catalog_cache = build_cache("catalog")
+
+
+async def _restaurant_entry(rid: ObjectId) -> Dict[str, Any] | None:
+    """Read-through cache entry for a restaurant (None if it does not exist)"""
+    entry = await catalog_cache.get(f"restaurant:{rid}")
+    if entry is None:
+        restaurant = await get_db().restaurants.find_one({"_id": rid})
+        if not restaurant:
+            return None
+        entry = json_cache_entry(
+            serialize_doc(restaurant),
+            owner_username=restaurant.get("owner_username", ""),
+        )
+        await catalog_cache.set(f"restaurant:{rid}", entry)
+    return entry
+
+
+async def _menu_entry(rid: ObjectId) -> Dict[str, Any]:
+    """Read-through cache entry for a restaurant's menu"""
+    entry = await catalog_cache.get(f"menu:{rid}")
+    if entry is None:
+        # Support both legacy string storage and newer ObjectId storage for restaurant_id
+        cursor = get_db().menu_items.find({"restaurant_id": {"$in": [rid, str(rid)]}})
+        items = await cursor.to_list(None)
+        entry = json_cache_entry([serialize_doc(item) for item in items])
+        await catalog_cache.set(f"menu:{rid}", entry)
+    return entry
+
+
+def _check_restaurant_owner(entry: Dict[str, Any], username: str | None, role: str | None):
+    """Restaurant users can only access their own restaurant (403 otherwise)"""
+    if role == "RESTAURANT" and username:
+        owner_username = (entry.get("owner_username") or "").strip().lower()
+        username_normalized = username.strip().lower()
+        
+        # Debug logging
+        print(f"[OWNERSHIP CHECK] Owner: '{owner_username}' | User: '{username_normalized}'")
+        
+        if owner_username and owner_username != username_normalized:
+            print(f"[OWNERSHIP CHECK] DENIED - Mismatch detected")
+            raise HTTPException(status_code=403, detail="You are not the owner of this restaurant.")
+        
+        print(f"[OWNERSHIP CHECK] ALLOWED - Match confirmed")
+
+
+async def _invalidate_menu(*restaurant_ids: Any):
+    await catalog_cache.invalidate(*{f"menu:{rid}" for rid in restaurant_ids if rid})
+
+
+async def _spool_image(image: UploadFile) -> SpooledImage:
+    """Copy and hash an uploaded image (500 if uploads are not configured, 413 if too large)"""
+    try:
+        media_service.check_configured()
+        return await media_service.spool(image)
+    except StorageNotConfiguredError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+async def _store_image(image: SpooledImage, folder: str) -> str:
+    """Store a spooled image and return its URL (deduplicated by content)"""
+    try:
+        return await media_service.store(image, folder)
+    except StorageNotConfiguredError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except OSError as e:
+        raise HTTPException(status_code=500, detail=f"Image could not be stored: {e}")
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Image upload failed: {e}")
+
+
+async def _menu_item_image_stored(item: Dict[str, Any]):
+    await _invalidate_menu(item.get("restaurant_id"))
+    search_service.upsert_menu_item(item)
+
+
+async def _restaurant_image_stored(restaurant: Dict[str, Any]):
+    await catalog_cache.invalidate(f"restaurant:{restaurant['_id']}")
+    search_service.upsert_restaurant(restaurant)
+
 
 # ============= AUTH ROUTES =============
 @router.post("/login")
@@ -95,80 +187,147 @@ async def login(request: LoginRequest):
 
 
 # ============= CUSTOMER ROUTES =============
+# Default projections of list endpoints (override with `fields=`, `fields=*` for everything)
+RESTAURANT_LIST_PROJECTION = {
+    "name": 1, "description": 1, "address": 1, "phone": 1, "image_url": 1, "latitude": 1, "longitude": 1,
+}
+DRONE_LIST_PROJECTION = {"name": 1, "status": 1, "restaurant_id": 1}
+# /restaurants/nearby search radius (metres)
+NEARBY_DEFAULT_RADIUS_M = 5000.0
+NEARBY_MAX_RADIUS_M = 50000.0
+# Overlap between consecutive `since=` dashboard refreshes (duplicates are harmless)
+DASHBOARD_SINCE_OVERLAP = timedelta(seconds=2)
+
+
 @router.get("/restaurants")
-async def get_restaurants(page: int = 1, limit: int = 6):
-    """Get paginated restaurants"""
+async def get_restaurants(
+    request: Request,
+    limit: int = 6,
+    cursor: str | None = None,
+    include_total: bool = False,
+    fields: str | None = None,
+):
+    """Get restaurants, one cursor page at a time.
+
+    Follow `next_cursor` / `prev_cursor` (or the `next` / `prev` links) to move
+    between pages. `total` (estimated) is only computed when `include_total=true`.
+    """
     db = get_db()
-    
-    # Validate pagination params
-    page = max(1, page)
-    limit = max(1, min(limit, 100))  # Cap limit at 100
-    
-    # Calculate skip
-    skip = (page - 1) * limit
-    
-    # Get total count
-    total = await db.restaurants.count_documents({})
-    
-    # Get paginated restaurants
-    cursor = db.restaurants.find().skip(skip).limit(limit)
-    restaurants = await cursor.to_list(None)
-    
-    # Calculate total pages
-    total_pages = (total + limit - 1) // limit  # Ceiling division
-    
-    return {
-        "data": [_serialize_mongo_doc(r) for r in restaurants],
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "totalPages": total_pages
-    }
+    page = await paginate(
+        db.restaurants,
+        {},
+        serialize=serialize_doc,
+        limit=limit,
+        cursor=cursor,
+        newest_first=False,
+        projection=parse_fields(fields, RESTAURANT_LIST_PROJECTION),
+        include_total=include_total,
+    )
+    if include_total:
+        page["totalPages"] = (page["total"] + page["limit"] - 1) // page["limit"]  # Ceiling division
+    return FastJSONResponse(with_links(page, request))
+
+
+@router.get("/restaurants/nearby")
+async def get_nearby_restaurants(
+    request: Request,
+    lat: float,
+    lon: float,
+    radius: float = NEARBY_DEFAULT_RADIUS_M,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    fields: str | None = None,
+):
+    """Restaurants within `radius` metres of (`lat`, `lon`), nearest first, one cursor page at a time.
+
+    Each row carries `distance_m`. Restaurants without coordinates are not listed.
+    """
+    if not valid_lat_lon(lat, lon):
+        raise HTTPException(status_code=400, detail="Invalid lat/lon")
+    if not 0 < radius <= NEARBY_MAX_RADIUS_M:
+        raise HTTPException(status_code=400, detail=f"radius must be between 0 and {NEARBY_MAX_RADIUS_M:g} metres")
+
+    page = await paginate_near(
+        get_db().restaurants,
+        geo_point(lat, lon),
+        max_distance_m=radius,
+        serialize=serialize_doc,
+        limit=limit,
+        cursor=cursor,
+        projection=parse_fields(fields, RESTAURANT_LIST_PROJECTION),
+    )
+    return FastJSONResponse(with_links(page, request))
+
+
+@router.get("/search")
+async def search(
+    q: str,
+    type: str | None = None,
+    restaurant_id: str | None = None,
+    limit: int = 20,
+):
+    """Search restaurant and menu item names and descriptions, best match first.
+
+    Every word must match; the last one also matches as a prefix. Narrow with
+    `type=restaurant|menu_item` and/or `restaurant_id` (that restaurant's menu).
+    """
+    if type is not None and type not in SEARCH_KINDS:
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(SEARCH_KINDS)}")
+    if restaurant_id:
+        restaurant_id = str(_parse_object_id(restaurant_id, field_name="restaurant_id"))
+    if not search_service.ready:
+        raise HTTPException(status_code=503, detail="Search index is loading", headers={"Retry-After": "5"})
+
+    hits = search_service.search(
+        q,
+        kinds=[type] if type else SEARCH_KINDS,
+        restaurant_id=restaurant_id,
+        limit=max(1, min(limit, MAX_SEARCH_LIMIT)),
+    )
+    return FastJSONResponse({"query": q, "data": hits})
+
+
+@router.get("/search/suggest")
+async def search_suggest(q: str, limit: int = 8):
+    """Autocomplete: distinct restaurant / dish names completing `q`"""
+    if not search_service.ready:
+        raise HTTPException(status_code=503, detail="Search index is loading", headers={"Retry-After": "5"})
+    return FastJSONResponse({"query": q, "data": search_service.suggest(q, limit=max(1, min(limit, MAX_SEARCH_LIMIT)))})
 
 
 @router.get("/restaurants/{restaurant_id}")
-async def get_restaurant(restaurant_id: str, username: str | None = None, role: str | None = None):
-    """Get restaurant details with ownership check for Restaurant users"""
-    db = get_db()
+async def get_restaurant(
+    restaurant_id: str,
+    request: Request,
+    username: str | None = None,
+    role: str | None = None,
+):
+    """Get restaurant details with ownership check for Restaurant users.
 
+    Served from the catalog cache; honours If-None-Match with 304.
+    """
     rid = _parse_object_id(restaurant_id, field_name="restaurant_id")
-    restaurant = await db.restaurants.find_one({"_id": rid})
-    if not restaurant:
+    entry = await _restaurant_entry(rid)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
-    # Check access control: Restaurant users can only access their own restaurant
-    if role == "RESTAURANT" and username:
-        owner_username = restaurant.get("owner_username", "").strip().lower()
-        username_normalized = username.strip().lower()
-        
-        # Debug logging
-        print(f"[OWNERSHIP CHECK] Owner: '{owner_username}' | User: '{username_normalized}'")
-        
-        if owner_username and owner_username != username_normalized:
-            print(f"[OWNERSHIP CHECK] DENIED - Mismatch detected")
-            raise HTTPException(status_code=403, detail="You are not the owner of this restaurant.")
-        
-        print(f"[OWNERSHIP CHECK] ALLOWED - Match confirmed")
-
-    return _serialize_mongo_doc(restaurant)
+    _check_restaurant_owner(entry, username, role)
+    return conditional_json_response(request, entry)
 
 
 @router.get("/restaurants/{restaurant_id}/menu")
-async def get_restaurant_menu(restaurant_id: str):
-    """Get menu items for restaurant"""
-    db = get_db()
-
+async def get_restaurant_menu(restaurant_id: str, request: Request):
+    """Get menu items for restaurant (cached; honours If-None-Match with 304)"""
     rid = _parse_object_id(restaurant_id, field_name="restaurant_id")
 
-    # Restaurant must exist
-    restaurant = await db.restaurants.find_one({"_id": rid})
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found")
+    entry = await catalog_cache.get(f"menu:{rid}")
+    if entry is None:
+        # Restaurant must exist
+        if await _restaurant_entry(rid) is None:
+            raise HTTPException(status_code=404, detail="Restaurant not found")
+        entry = await _menu_entry(rid)
 
-    # Support both legacy string storage and newer ObjectId storage for restaurant_id
-    cursor = db.menu_items.find({"restaurant_id": {"$in": [rid, str(rid)]}})
-    items = await cursor.to_list(None)
-    return [_serialize_mongo_doc(item) for item in items]
+    return conditional_json_response(request, entry)
 
 
 @router.post("/orders")
@@ -188,11 +347,11 @@ async def create_order(payload: OrderCreate):
             payload.items,
             payload.total_price,
             payload.delivery_address,
+            payload.delivery_lat,
+            payload.delivery_lon,
         )
         response_payload = {"success": True, "order": order}
-        return JSONResponse(
-            content=jsonable_encoder(response_payload, custom_encoder={ObjectId: str})
-        )
+        return FastJSONResponse(response_payload)
     except HTTPException:
         raise
     except Exception as e:
@@ -212,103 +371,153 @@ async def get_order(order_id: str):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/orders/{order_id}/complete")
-async def complete_order(order_id: str):
-    """Mark an order as COMPLETED (demo helper)."""
-    db = get_db()
+@router.get("/orders/{order_id}/track")
+async def get_order_track(order_id: str, max_points: int = 200):
+    """Recorded drone path of a delivery as a downsampled `[lat, lon, time]` polyline"""
     oid = _parse_object_id(order_id, field_name="order_id")
+    return FastJSONResponse(await telemetry_service.track(oid, max_points))
 
-    order = await db.orders.find_one({"_id": oid})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
 
-    if order.get("status") == "COMPLETED":
-        return {"success": True, "message": "Order already completed"}
+@router.post("/orders/{order_id}/complete")
+async def complete_order(order_id: str):
+    """Mark an order as COMPLETED (demo helper; DELIVERING -> COMPLETED)."""
+    oid = _parse_object_id(order_id, field_name="order_id")
 
-    await db.orders.update_one(
-        {"_id": oid},
-        {"$set": {"status": "COMPLETED", "updated_at": __import__("datetime").datetime.utcnow().isoformat()}},
-    )
+    try:
+        updated = await transition_order(oid, "COMPLETED")
+    except OrderTransitionError as e:
+        if e.current == "COMPLETED":
+            return {"success": True, "message": "Order already completed"}
+        raise _transition_http_error(e)
 
-    # Optional: if drone is attached, free it up (best-effort)
-    drone_id = order.get("drone_id")
-    if isinstance(drone_id, str):
-        try:
-            did = _parse_object_id(drone_id, field_name="drone_id")
-            await db.drones.update_one({"_id": did}, {"$set": {"status": "AVAILABLE"}})
-        except HTTPException:
-            pass
+    # Free the drone (best-effort; the fleet simulator may already have).
+    drone_id = updated.get("drone_id")
+    if isinstance(drone_id, str) and ObjectId.is_valid(drone_id):
+        await drone_service.release_drone(ObjectId(drone_id), oid)
 
-    updated = await db.orders.find_one({"_id": oid})
-    return {"success": True, "message": "Order delivered successfully", "order": _serialize_mongo_doc(updated)}
+    return {"success": True, "message": "Order delivered successfully", "order": serialize_doc(updated)}
 
 
 @router.get("/customer/{customer_id}/orders")
-async def get_customer_orders(customer_id: str):
-    """Get all orders for customer"""
+async def get_customer_orders(
+    customer_id: str,
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+    fields: str | None = None,
+):
+    """Get a customer's orders, newest first, one cursor page at a time"""
     try:
-        orders = await order_service.get_customer_orders(customer_id)
-        return orders
+        projection = parse_fields(fields, ORDER_LIST_PROJECTION)
+        page = await order_service.get_customer_orders(customer_id, limit, cursor, include_total, projection)
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/payments/mock/{order_id}")
-async def mock_payment(order_id: str, background_tasks: BackgroundTasks):
+async def mock_payment(order_id: str):
     """Mock payment - always succeeds"""
     try:
         result = await payment_service.mock_pay(order_id)
-        
-        # Start drone simulation in background
-        order = await order_service.get_order(order_id)
-        if order and order.get("drone_id"):
-            background_tasks.add_task(
-                drone_service.simulate_drone_movement,
-                order_id,
-                order["drone_id"]
-            )
-        
         return JSONResponse({
             "success": True,
             "payment": result
         })
+    except OrderTransitionError as e:
+        raise _transition_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.websocket("/ws/orders/{order_id}")
 async def websocket_order_tracking(order_id: str, websocket: WebSocket):
-    """WebSocket for order tracking"""
-    await manager.connect(order_id, websocket)
-    
+    """WebSocket for order tracking.
+
+    Sends the current order once, then relies on the shared order watcher to
+    push updates only when the order changes. Add `?protocol=2` for a snapshot
+    followed by deltas, and `&encoding=msgpack` for binary frames (see
+    app.websocket.protocol).
+    """
+    if not await manager.connect(order_id, websocket, parse_format(websocket.query_params)):
+        return
+
     try:
+        order = await order_service.get_order(order_id)
+        if order:
+            order_watcher.prime(order_id, order)
+            await manager.send_order_snapshot(order_id, websocket, order)
+
+        # Clients only send heartbeat replies: note them and wait for the close.
         while True:
-            # Get latest order info
-            order = await order_service.get_order(order_id)
-            
-            if order:
-                # Send order update
-                await manager.broadcast_order_update(order_id, order)
-            
-            # Send update every 2 seconds
-            await asyncio.sleep(2)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            manager.touch(order_id, websocket)
     except WebSocketDisconnect:
         manager.disconnect(order_id, websocket)
     except Exception as e:
         manager.disconnect(order_id, websocket)
         print(f"WebSocket error: {e}")
+    finally:
+        order_watcher.forget(order_id)
+
+
+@router.get("/sse/orders/{order_id}")
+async def sse_order_tracking(order_id: str, request: Request, last_event_id: str | None = None):
+    """Server-Sent Events alternative to the tracking WebSocket.
+
+    Streams the protocol 2 messages (snapshot, then deltas) as events. On
+    reconnect, `Last-Event-ID` (or `?last_event_id=`) replays the missed
+    deltas from the order's ring buffer instead of a new snapshot.
+    """
+    _parse_object_id(order_id, field_name="order_id")
+    order = await order_service.get_order(order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    stream = manager.open_stream(order_id, request.client.host if request.client else "unknown")
+    if stream is None:
+        raise HTTPException(status_code=503, detail="Too many tracking connections", headers={"Retry-After": "5"})
+    order_watcher.prime(order_id, order)
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    await manager.resume_or_snapshot(order_id, stream, resume_from, order)
+
+    async def events():
+        try:
+            async for frame in stream.frames():
+                yield frame
+        finally:
+            manager.disconnect(order_id, stream)
+            order_watcher.forget(order_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # No proxy buffering, or events would arrive in bursts.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ============= RESTAURANT ROUTES =============
 @router.post("/restaurant/menu")
 async def create_menu_item(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     description: str | None = Form(None),
     price: float = Form(...),
     image: UploadFile | None = File(None),
     restaurant_id: str | None = Form(None),
+    background: bool = False,
 ):
-    """Create menu item (multipart/form-data with image upload)"""
+    """Create menu item (multipart/form-data with image upload).
+
+    With `background=true` the item is created at once (202, `image_status`
+    PENDING) and `image_url` is filled in when the upload finishes.
+    """
     db = get_db()
 
     if image is None or not image.filename:
@@ -326,20 +535,8 @@ async def create_menu_item(
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
 
-    try:
-        # Ensure the underlying stream is at the beginning.
-        try:
-            image.file.seek(0)
-        except Exception:
-            pass
-
-        image_url = await upload_menu_item_image(image.file, filename=image.filename)
-    except CloudinaryNotConfiguredError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    except RuntimeError as e:
-        raise HTTPException(status_code=502, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Image upload failed: {e}")
+    spooled = await _spool_image(image)
+    image_url = None if background else await _store_image(spooled, MENU_ITEM_FOLDER)
 
     menu_item = {
         "restaurant_id": rid,
@@ -350,11 +547,30 @@ async def create_menu_item(
         "available": True,
         "created_at": None,
     }
+    if background:
+        menu_item["image_status"] = "PENDING"
 
-    result = await db.menu_items.insert_one(menu_item)
+    try:
+        result = await db.menu_items.insert_one(menu_item)
+    except Exception:
+        spooled.close()
+        raise
     menu_item["_id"] = result.inserted_id
-
-    return {"success": True, "item": _serialize_mongo_doc(menu_item)}
+    await _invalidate_menu(rid)
+    search_service.upsert_menu_item(menu_item)
+
+    payload = {"success": True, "item": serialize_doc(menu_item)}
+    if not background:
+        return payload
+    background_tasks.add_task(
+        media_service.store_for_document,
+        spooled,
+        MENU_ITEM_FOLDER,
+        "menu_items",
+        result.inserted_id,
+        on_stored=_menu_item_image_stored,
+    )
+    return FastJSONResponse(payload, status_code=202)
 
 
 @router.put("/restaurant/menu/{item_id}")
@@ -368,11 +584,19 @@ async def update_menu_item(item_id: str, item: MenuItem):
     if "restaurant_id" in update_doc and update_doc["restaurant_id"]:
         update_doc["restaurant_id"] = _parse_object_id(update_doc["restaurant_id"], field_name="restaurant_id")
 
-    await db.menu_items.update_one({"_id": oid}, {"$set": update_doc})
-    updated = await db.menu_items.find_one({"_id": oid})
-    if not updated:
+    # Read the previous version in the same round trip so both the old and the
+    # new restaurant's cached menus can be invalidated.
+    previous = await db.menu_items.find_one_and_update(
+        {"_id": oid},
+        {"$set": update_doc},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not previous:
         raise HTTPException(status_code=404, detail="Menu item not found")
-    return _serialize_mongo_doc(updated)
+    await _invalidate_menu(previous.get("restaurant_id"), update_doc.get("restaurant_id"))
+    updated = {**previous, **update_doc}
+    search_service.upsert_menu_item(updated)
+    return serialize_doc(updated)
 
 
 @router.delete("/restaurant/menu/{item_id}")
@@ -380,18 +604,30 @@ async def delete_menu_item(item_id: str):
     """Delete menu item"""
     db = get_db()
     oid = _parse_object_id(item_id, field_name="item_id")
-    result = await db.menu_items.delete_one({"_id": oid})
-    if result.deleted_count == 0:
+    deleted = await db.menu_items.find_one_and_delete({"_id": oid}, projection={"restaurant_id": 1})
+    if not deleted:
         raise HTTPException(status_code=404, detail="Menu item not found")
+    await _invalidate_menu(deleted.get("restaurant_id"))
+    search_service.remove("menu_item", oid)
     return {"success": True, "message": "Menu item deleted"}
 
 
 @router.get("/restaurant/{restaurant_id}/orders")
-async def get_restaurant_orders(restaurant_id: str):
-    """Get all orders for restaurant"""
+async def get_restaurant_orders(
+    restaurant_id: str,
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+    fields: str | None = None,
+):
+    """Get a restaurant's orders, newest first, one cursor page at a time"""
     try:
-        orders = await order_service.get_restaurant_orders(restaurant_id)
-        return orders
+        projection = parse_fields(fields, ORDER_LIST_PROJECTION)
+        page = await order_service.get_restaurant_orders(restaurant_id, limit, cursor, include_total, projection)
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -405,6 +641,8 @@ async def accept_order(order_id: str):
             "success": True,
             "order": order
         })
+    except OrderTransitionError as e:
+        raise _transition_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -418,6 +656,8 @@ async def update_order_status_route(order_id: str, status: str):
             "success": True,
             "order": order
         })
+    except OrderTransitionError as e:
+        raise _transition_http_error(e)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -433,89 +673,120 @@ async def assign_drone_to_order_legacy(order_id: str, drone_id: str):
 
 @router.post("/orders/{order_id}/assign-drone")
 async def assign_drone_to_order(order_id: str, payload: AssignDroneToOrderRequest):
-    """Restaurant assigns a drone to an order (READY_FOR_PICKUP -> DELIVERING)."""
+    """Restaurant assigns a drone to an order (READY_FOR_PICKUP -> DELIVERING).
+
+    The drone is reserved and the order moved with one conditional write each,
+    so two concurrent assignments can never book the same drone or order.
+    """
     db = get_db()
 
     oid = _parse_object_id(order_id, field_name="order_id")
     did = _parse_object_id(payload.drone_id, field_name="drone_id")
 
-    order = await db.orders.find_one({"_id": oid})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
+    drone = await drone_service.claim_drone(did, oid)
+    if drone is None:
+        current = await db.drones.find_one({"_id": did}, {"status": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Drone not found")
+        raise HTTPException(status_code=409, detail=f"Drone is not available (current: {current.get('status')})")
 
-    if order.get("status") != "READY_FOR_PICKUP":
+    try:
+        updated_order = await transition_order(
+            oid,
+            "DELIVERING",
+            extra_filter={"restaurant_id": drone.get("restaurant_id")},
+            extra_set={"drone_id": str(did), "drone_name": drone.get("name", "")},
+        )
+    except OrderTransitionError as e:
+        await drone_service.release_drone(did, oid)
+        if e.current == "READY_FOR_PICKUP":
+            raise HTTPException(status_code=409, detail="Drone does not belong to this restaurant")
+        if e.not_found:
+            raise _transition_http_error(e)
         raise HTTPException(
             status_code=409,
-            detail=f"Order must be READY_FOR_PICKUP to assign a drone (current: {order.get('status')})",
+            detail=f"Order must be READY_FOR_PICKUP to assign a drone (current: {e.current})",
         )
 
-    drone = await db.drones.find_one({"_id": did})
-    if not drone:
-        raise HTTPException(status_code=404, detail="Drone not found")
-
-    drone_status = drone.get("status")
-    if drone_status == "IDLE":
-        drone_status = "AVAILABLE"
-    if drone_status != "AVAILABLE":
-        raise HTTPException(status_code=409, detail=f"Drone is not available (current: {drone.get('status')})")
-
-    # Ensure drone is assigned to the same restaurant as the order
-    if str(drone.get("restaurant_id") or "") != str(order.get("restaurant_id") or ""):
-        raise HTTPException(status_code=409, detail="Drone does not belong to this restaurant")
-
-    # Update order + drone
-    await db.orders.update_one(
-        {"_id": oid},
-        {
-            "$set": {
-                "drone_id": str(did),
-                "drone_name": drone.get("name", ""),
-                "status": "DELIVERING",
-            }
-        },
-    )
-    await db.drones.update_one({"_id": did}, {"$set": {"status": "BUSY"}})
-
-    updated_order = await db.orders.find_one({"_id": oid})
-    updated_drone = await db.drones.find_one({"_id": did})
+    # Delivery starts now: the shared fleet simulator moves the drone.
+    await drone_service.simulate_drone_movement(order_id, str(did), updated_order)
 
     return {
         "success": True,
-        "order": _serialize_mongo_doc(updated_order),
-        "drone": drone_service._serialize_drone(updated_drone),
+        "order": serialize_doc(updated_order),
+        "drone": drone_service._serialize_drone(drone),
         "message": "🚁 Drone assigned - Delivery started",
     }
 
 
+@router.get("/restaurant/{restaurant_id}/dashboard")
+async def get_restaurant_dashboard(
+    restaurant_id: str,
+    username: str | None = None,
+    role: str | None = None,
+    since: str | None = None,
+    fields: str | None = None,
+):
+    """Restaurant, active orders, menu and available drones in one response.
+
+    Pass the returned `since` back for a refresh: only orders updated after it
+    (completed ones included, so they can be dropped) and the drones come back.
+    """
+    rid = _parse_object_id(restaurant_id, field_name="restaurant_id")
+    # Step back a little so writes in flight while we read are picked up next time.
+    watermark = (datetime.utcnow() - DASHBOARD_SINCE_OVERLAP).isoformat()
+
+    loads = [
+        _restaurant_entry(rid),
+        order_service.get_active_orders(str(rid), since, parse_fields(fields, ORDER_LIST_PROJECTION)),
+        drone_service.get_available_drones(str(rid), DRONE_LIST_PROJECTION),
+    ]
+    if not since:
+        loads.append(_menu_entry(rid))
+    entry, orders, drones, *menu = await asyncio.gather(*loads)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    _check_restaurant_owner(entry, username, role)
+
+    # Splice the cached restaurant / menu bodies in without decoding them.
+    parts = {"since": dumps(watermark), "orders": dumps(orders), "drones": dumps(drones)}
+    if not since:
+        parts["restaurant"] = entry["body"]
+        parts["menu"] = menu[0]["body"]
+    body = b"{" + b",".join(dumps(key) + b":" + value for key, value in parts.items()) + b"}"
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-store"})
+
+
 @router.get("/restaurant/{restaurant_id}/drones")
-async def get_available_drones_for_restaurant(restaurant_id: str):
+async def get_available_drones_for_restaurant(restaurant_id: str, fields: str | None = None):
     """Restaurant fetches AVAILABLE drones assigned to them."""
-    db = get_db()
     rid = _parse_object_id(restaurant_id, field_name="restaurant_id")
 
     # Only drones assigned to this restaurant and currently available.
-    drones = await db.drones.find(
-        {
-            "restaurant_id": str(rid),
-            "status": {"$in": ["AVAILABLE", "IDLE"]},
-        }
-    ).to_list(None)
-
-    return [drone_service._serialize_drone(d) for d in drones]
+    return await drone_service.get_available_drones(str(rid), parse_fields(fields, DRONE_LIST_PROJECTION))
 
 
 # ============= ADMIN ROUTES =============
 @router.post("/admin/restaurants")
 async def create_restaurant(
+    background_tasks: BackgroundTasks,
     name: str = Form(...),
     owner_id: str = Form(...),
     owner_username: str = Form(...),
     description: str | None = Form(None),
     address: str | None = Form(None),
     phone: str | None = Form(None),
+    latitude: float | None = Form(None),
+    longitude: float | None = Form(None),
     image: UploadFile | None = File(None),
+    background: bool = False,
 ):
-    """Create restaurant (multipart/form-data with image upload)."""
+    """Create restaurant (multipart/form-data with image upload).
+
+    With `background=true` the restaurant is created at once (202,
+    `image_status` PENDING) and `image_url` is filled in when the upload
+    finishes.
+    """
     db = get_db()
 
     if not name or not name.strip():
@@ -524,38 +795,45 @@ async def create_restaurant(
         raise HTTPException(status_code=400, detail="owner_id is required")
     if not owner_username or not owner_username.strip():
         raise HTTPException(status_code=400, detail="owner_username is required")
+    if (latitude is None) != (longitude is None) or (
+        latitude is not None and not valid_lat_lon(latitude, longitude)
+    ):
+        raise HTTPException(status_code=400, detail="latitude and longitude must be given together and be valid")
     if image is None or not image.filename:
         raise HTTPException(status_code=400, detail="image file is required")
     if image.content_type and not image.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="image must be an image/* content type")
 
-    try:
-        try:
-            image.file.seek(0)
-        except Exception:
-            pass
-        image_url = await upload_restaurant_image(image.file, filename=image.filename)
-    except CloudinaryNotConfiguredError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Upload failed: {e}")
+    spooled = await _spool_image(image)
+    image_url = None if background else await _store_image(spooled, RESTAURANT_FOLDER)
 
     rest_doc = {
         "name": name,
         "owner_id": owner_id,
         "owner_username": owner_username,
+        "owner_username_lower": normalize_lookup_key(owner_username),
         "description": description or "",
         "address": address or "",
         "phone": phone or "",
         "image_url": image_url,
         "created_at": "",
     }
+    if latitude is not None:
+        rest_doc.update(latitude=latitude, longitude=longitude, location=geo_point(latitude, longitude))
+    if background:
+        rest_doc["image_status"] = "PENDING"
 
     try:
         result = await db.restaurants.insert_one(rest_doc)
     except Exception as e:
+        spooled.close()
         raise HTTPException(status_code=500, detail=f"Failed to create restaurant: {e}")
 
+    # Cached RESTAURANT logins carry a resolved restaurant_id; re-resolve on next login.
+    auth_service.invalidate(owner_username, "RESTAURANT")
+    await catalog_cache.invalidate(f"restaurant:{result.inserted_id}", f"menu:{result.inserted_id}")
+    search_service.upsert_restaurant({"_id": result.inserted_id, **rest_doc})
+
     # Update user's restaurant_id if owner exists (best effort)
     try:
         await db.users.update_one(
@@ -567,19 +845,33 @@ async def create_restaurant(
         print(f"Warning: Could not update user {owner_id}: {user_error}")
 
     response_payload = {"success": True, "restaurant": {"id": str(result.inserted_id), **rest_doc}}
-    return JSONResponse(
-        content=jsonable_encoder(response_payload, custom_encoder={ObjectId: str})
+    if not background:
+        return FastJSONResponse(response_payload)
+    background_tasks.add_task(
+        media_service.store_for_document,
+        spooled,
+        RESTAURANT_FOLDER,
+        "restaurants",
+        result.inserted_id,
+        on_stored=_restaurant_image_stored,
     )
+    return FastJSONResponse(response_payload, status_code=202)
 
 
 @router.get("/admin/restaurants")
-async def get_all_restaurants():
-    """Get all restaurants"""
+async def get_all_restaurants(
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+):
+    """Get restaurants, one cursor page at a time"""
     try:
         db = get_db()
-        restaurants = await db.restaurants.find().to_list(None)
-        return [
-            {
+        page = await paginate(
+            db.restaurants,
+            {},
+            serialize=lambda r: {
                 "id": str(r["_id"]),
                 "name": r.get("name", ""),
                 "owner_id": r.get("owner_id", ""),
@@ -588,9 +880,15 @@ async def get_all_restaurants():
                 "phone": r.get("phone", ""),
                 "image_url": r.get("image_url", ""),
                 "created_at": r.get("created_at", "")
-            }
-            for r in restaurants
-        ]
+            },
+            limit=limit,
+            cursor=cursor,
+            newest_first=False,
+            include_total=include_total,
+        )
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error fetching restaurants: {e}")
         import traceback
@@ -599,6 +897,24 @@ async def get_all_restaurants():
 
 
 
+
+@router.get("/admin/restaurants/export")
+async def export_restaurants(
+    format: str = "ndjson",
+    fields: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+):
+    """Stream every restaurant as NDJSON (default) or a JSON array.
+
+    `fields` is a comma-separated projection; `since` / `until` are ISO 8601
+    bounds on creation time.
+    """
+    return export_response(
+        get_db().restaurants, serialize_doc,
+        fmt=format, fields=fields, since=since, until=until, filename="restaurants",
+    )
+
 @router.post("/admin/drones")
 async def create_drone(payload: AdminCreateDroneRequest):
     """Create drone (ADMIN).
@@ -630,10 +946,7 @@ async def create_drone(payload: AdminCreateDroneRequest):
 
         print("DRONE SAVED:", new_drone.get("id"))
         payload_out = {"message": "Drone created successfully", "drone": new_drone}
-        return JSONResponse(
-            status_code=201,
-            content=jsonable_encoder(payload_out, custom_encoder={ObjectId: str}),
-        )
+        return FastJSONResponse(status_code=201, content=payload_out)
     except HTTPException:
         # Validation errors: guaranteed no DB write happened before these.
         raise
@@ -669,59 +982,175 @@ async def admin_assign_drone(payload: AdminAssignDroneRequest):
     return {"success": True, "drone": drone_service._serialize_drone(updated_drone)}
 
 
+@router.post("/admin/dispatch/run")
+async def run_dispatch_batch():
+    """Run one auto-dispatch batch now (ADMIN); normally it runs on a timer"""
+    assigned = await dispatch_service.dispatch_once()
+    return {
+        "success": True,
+        "assigned": [{"order_id": order_id, "drone_id": drone_id} for order_id, drone_id in assigned],
+    }
+
+
+@router.get("/admin/overview")
+async def get_admin_overview():
+    """Counts by status, recent orders, fleet utilization and per-restaurant summaries (ADMIN)"""
+    try:
+        return FastJSONResponse(await overview_service.get_overview())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/admin/tracking/stats")
+async def tracking_stats():
+    """Tracking connections on this worker: counts, limits and queued/sent bytes (ADMIN)"""
+    return manager.stats()
+
+
 @router.get("/admin/drones")
-async def get_all_drones():
-    """Get all drones"""
+async def get_all_drones(
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+):
+    """Get drones, one cursor page at a time"""
     try:
-        drones = await drone_service.get_all_drones()
-        return JSONResponse(
-            content=jsonable_encoder(drones, custom_encoder={ObjectId: str})
-        )
+        page = await drone_service.get_all_drones(limit, cursor, include_total)
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/admin/drones/restaurant/{restaurant_id}")
-async def get_restaurant_drones(restaurant_id: str):
-    """Get drones for restaurant"""
+async def get_restaurant_drones(
+    restaurant_id: str,
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+):
+    """Get a restaurant's drones, one cursor page at a time"""
     try:
-        drones = await drone_service.get_restaurant_drones(restaurant_id)
-        return JSONResponse(
-            content=jsonable_encoder(drones, custom_encoder={ObjectId: str})
-        )
+        page = await drone_service.get_restaurant_drones(restaurant_id, limit, cursor, include_total)
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/admin/drones/export")
+async def export_drones(
+    format: str = "ndjson",
+    fields: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+):
+    """Stream every drone as NDJSON (default) or a JSON array"""
+    return export_response(
+        get_db().drones, drone_service._serialize_drone,
+        fmt=format, fields=fields, since=since, until=until, filename="drones",
+    )
+
+
 @router.get("/admin/users")
-async def get_all_users():
-    """Get all users"""
+async def get_all_users(
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+):
+    """Get users, one cursor page at a time"""
     try:
         db = get_db()
-        users = await db.users.find().to_list(None)
-        return [
-            {
+        page = await paginate(
+            db.users,
+            {},
+            serialize=lambda u: {
                 "id": str(u["_id"]),
                 "username": u.get("username"),
                 "role": u.get("role"),
                 "restaurant_id": u.get("restaurant_id")
-            }
-            for u in users
-        ]
+            },
+            limit=limit,
+            cursor=cursor,
+            newest_first=False,
+            projection={"username": 1, "role": 1, "restaurant_id": 1},
+            include_total=include_total,
+        )
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/admin/users/export")
+async def export_users(
+    format: str = "ndjson",
+    fields: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+):
+    """Stream every user as NDJSON (default) or a JSON array"""
+    return export_response(
+        get_db().users, serialize_doc,
+        fmt=format, fields=fields, since=since, until=until, filename="users",
+    )
+
+
 @router.get("/admin/orders")
-async def get_all_orders():
-    """Get all orders (system overview)"""
+async def get_all_orders(
+    request: Request,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: str | None = None,
+    include_total: bool = False,
+    fields: str | None = None,
+):
+    """Get orders across the system, newest first, one cursor page at a time"""
     try:
-        orders = await order_service.get_all_orders()
-        return orders
+        projection = parse_fields(fields, ORDER_LIST_PROJECTION)
+        page = await order_service.get_all_orders(limit, cursor, include_total, projection)
+        return FastJSONResponse(with_links(page, request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.get("/admin/orders/export")
+async def export_orders(
+    format: str = "ndjson",
+    fields: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+):
+    """Stream every order as NDJSON (default) or a JSON array (nightly reconciliation)"""
+    return export_response(
+        get_db().orders, OrderService._serialize_order,
+        fmt=format, fields=fields, since=since, until=until, filename="orders",
+    )
+
+
+# ============= MEDIA ROUTES =============
+@router.api_route("/media/{path:path}", methods=["GET", "HEAD"])
+async def get_media(path: str, request: Request):
+    """Serve an image stored by the local storage backend (MEDIA_STORAGE=local).
+
+    Files are content-addressed, so they are cached for a year as immutable;
+    supports `Range` and `If-None-Match`.
+    """
+    storage = media_service.storage
+    stored = storage.resolve(path) if isinstance(storage, LocalStorage) else None
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    file_path, content_hash = stored
+    return MediaFileResponse(request, file_path, content_hash, path)
+
+
 # Health check
 @router.get("/health")
 async def health_check():
@@ -0,0 +1,212 @@
+"""Caching helpers.
+
+- TTLCache: a bounded in-process LRU map whose entries also expire after a
+  fixed time. It is not shared between worker processes.
+- TieredCache: a pluggable read-through cache (in-process tier plus an
+  optional shared MongoDB tier) for data invalidated by write routes.
+- json_cache_entry / conditional_json_response: cache pre-encoded JSON bodies
+  with an ETag and answer ``If-None-Match`` with 304.
+"""
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Hashable, Optional
+
+from fastapi import Request, Response
+
+from app.core.database import get_db
+from app.core.serialization import dumps
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value, or ``default`` if missing or expired"""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CacheBackend(ABC):
+    """Async key/value store used as one tier of a TieredCache"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """In-process LRU/TTL tier (per worker)"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._cache.set(key, value, ttl=min(ttl, self._cache.ttl))
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._cache.delete(key)
+
+
+class MongoCacheBackend(CacheBackend):
+    """Shared tier stored in the ``cache_entries`` collection.
+
+    Expired entries are removed by the TTL index on ``expires_at`` (see
+    app.core.indexes); reads also ignore entries past their expiry. Values must
+    be BSON-encodable.
+    """
+
+    collection_name = "cache_entries"
+
+    async def get(self, key: str) -> Optional[Any]:
+        doc = await get_db()[self.collection_name].find_one(
+            {"_id": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"value": 1},
+        )
+        return doc["value"] if doc else None
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await get_db()[self.collection_name].replace_one(
+            {"_id": key},
+            {"value": value, "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True,
+        )
+
+    async def delete(self, *keys: str):
+        await get_db()[self.collection_name].delete_many({"_id": {"$in": list(keys)}})
+
+
+class TieredCache:
+    """Read-through cache: in-process tier in front of an optional shared tier.
+
+    Invalidation deletes from both tiers. Other workers' in-process tiers are
+    not notified, so their staleness is bounded by the local TTL.
+    """
+
+    def __init__(self, namespace: str, local: CacheBackend, shared: Optional[CacheBackend] = None, ttl: float = 300.0):
+        self.namespace = namespace
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        full_key = self._key(key)
+        value = await self.local.get(full_key)
+        if value is None and self.shared is not None:
+            try:
+                value = await self.shared.get(full_key)
+            except Exception as e:
+                print(f"⚠️  Shared cache read failed ({full_key}): {e}")
+                value = None
+            if value is not None:
+                await self.local.set(full_key, value, self.ttl)
+        return value
+
+    async def set(self, key: str, value: Any):
+        full_key = self._key(key)
+        await self.local.set(full_key, value, self.ttl)
+        if self.shared is not None:
+            try:
+                await self.shared.set(full_key, value, self.ttl)
+            except Exception as e:
+                print(f"⚠️  Shared cache write failed ({full_key}): {e}")
+
+    async def invalidate(self, *keys: str):
+        full_keys = [self._key(key) for key in keys]
+        await self.local.delete(*full_keys)
+        if self.shared is not None:
+            try:
+                await self.shared.delete(*full_keys)
+            except Exception as e:
+                print(f"⚠️  Shared cache invalidation failed ({', '.join(full_keys)}): {e}")
+
+
+def build_cache(namespace: str, maxsize: int = 1024) -> TieredCache:
+    """Create a TieredCache configured from the environment.
+
+    - CACHE_BACKEND: ``local`` (default) or ``mongo`` to add the shared tier
+    - CACHE_LOCAL_TTL_SECONDS: in-process tier TTL (default 30)
+    - CACHE_TTL_SECONDS: shared tier TTL (default 300)
+    """
+    local_ttl = float(os.getenv("CACHE_LOCAL_TTL_SECONDS", "30"))
+    ttl = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+    shared = MongoCacheBackend() if os.getenv("CACHE_BACKEND", "local").strip().lower() == "mongo" else None
+    return TieredCache(namespace, LocalCacheBackend(maxsize=maxsize, ttl=local_ttl), shared, ttl=max(ttl, local_ttl))
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an ``If-None-Match`` header value matches ``etag``"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match.
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def json_cache_entry(payload: Any, **extra: Any) -> Dict[str, Any]:
+    """Encode a payload once; the entry stores the body, its ETag and ``extra``"""
+    body = dumps(payload)
+    return {"body": body, "etag": make_etag(body), **extra}
+
+
+def conditional_json_response(request: Request, entry: Dict[str, Any]) -> Response:
+    """Serve a cache entry, or 304 if the client already has this version"""
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
@@ -5,25 +5,29 @@ Reads credentials from environment variables:
 - CLOUDINARY_API_KEY
 - CLOUDINARY_API_SECRET
 
-Keeps upload logic in one place so routes stay simple.
+Keeps upload logic in one place; used by the Cloudinary storage backend
+(app.core.storage). The SDK is configured once; ``upload_image`` is blocking
+and meant to run on the media service's upload executor.
 """
 
 from __future__ import annotations
 
 import os
-from typing import Any, Dict
+from functools import lru_cache
+from typing import Optional
 
 import cloudinary
 import cloudinary.uploader
 from cloudinary.exceptions import Error as CloudinaryError
-from starlette.concurrency import run_in_threadpool
 
 
 class CloudinaryNotConfiguredError(RuntimeError):
     pass
 
 
+@lru_cache(maxsize=None)
 def _configure_cloudinary_from_env() -> None:
+    # Cached once it succeeds; a missing credential raises (and is re-checked) on every call.
     cloud_name = os.getenv("CLOUDINARY_CLOUD_NAME")
     api_key = os.getenv("CLOUDINARY_API_KEY")
     api_secret = os.getenv("CLOUDINARY_API_SECRET")
@@ -41,60 +45,33 @@ def _configure_cloudinary_from_env() -> None:
     )
 
 
-async def upload_menu_item_image(file_obj, filename: str) -> str:
-    """Upload a menu item image to Cloudinary and return the secure URL.
-
-    file_obj should be a binary file-like object (e.g., UploadFile.file).
-    """
-
+def ensure_configured() -> None:
+    """Raise CloudinaryNotConfiguredError unless credentials are set"""
     _configure_cloudinary_from_env()
 
-    def _upload_sync() -> Dict[str, Any]:
-        # Note: Cloudinary SDK upload is synchronous.
-        return cloudinary.uploader.upload(
-            file_obj,
-            folder="fastfood/menu_items",
-            resource_type="image",
-            use_filename=True,
-            unique_filename=True,
-            overwrite=False,
-        )
 
-    try:
-        result = await run_in_threadpool(_upload_sync)
-    except CloudinaryNotConfiguredError:
-        raise
-    except CloudinaryError as e:
-        raise RuntimeError(f"Cloudinary upload failed: {e}") from e
-    except Exception as e:
-        raise RuntimeError(f"Cloudinary upload failed: {e}") from e
-
-    url = result.get("secure_url") or result.get("url")
-    if not url:
-        raise RuntimeError("Cloudinary upload did not return a URL")
-
-    return str(url)
+def upload_image(file_obj, *, folder: str, public_id: Optional[str] = None) -> str:
+    """Upload an image (blocking) and return its secure URL.
 
+    file_obj should be a binary file-like object. With ``public_id`` (a content
+    hash) an image already stored under that id is not overwritten.
 
-async def upload_restaurant_image(file_obj, filename: str) -> str:
-    """Upload a restaurant image to Cloudinary and return the secure URL."""
-
+    Raises:
+        CloudinaryNotConfiguredError: if credentials are missing.
+        RuntimeError: if the upload fails.
+    """
     _configure_cloudinary_from_env()
 
-    def _upload_sync() -> Dict[str, Any]:
-        return cloudinary.uploader.upload(
+    try:
+        result = cloudinary.uploader.upload(
             file_obj,
-            folder="fastfood/restaurants",
+            folder=folder,
             resource_type="image",
-            use_filename=True,
-            unique_filename=True,
+            public_id=public_id,
+            use_filename=public_id is None,
+            unique_filename=public_id is None,
             overwrite=False,
         )
-
-    try:
-        result = await run_in_threadpool(_upload_sync)
-    except CloudinaryNotConfiguredError:
-        raise
     except CloudinaryError as e:
         raise RuntimeError(f"Cloudinary upload failed: {e}") from e
     except Exception as e:
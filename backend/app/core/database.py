@@ -2,23 +2,46 @@
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 import os
 from dotenv import load_dotenv
+from app.core.indexes import ensure_indexes
+from app.core.migrations import run_migrations
 
 load_dotenv()
 
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
 DB_NAME = os.getenv("DB_NAME", "foodfast")
+# Set to 0 to skip index bootstrap (e.g. when the DB user lacks createIndex).
+ENSURE_INDEXES = os.getenv("DB_ENSURE_INDEXES", "1") != "0"
+# Set to 0 to run migrations manually with `python -m app.core.migrations`.
+RUN_MIGRATIONS = os.getenv("DB_RUN_MIGRATIONS", "1") != "0"
 
 client: AsyncIOMotorClient = None
 db: AsyncIOMotorDatabase = None
 
 
-async def connect_db():
-    """Connect to MongoDB"""
+async def connect_db(apply_indexes: bool = ENSURE_INDEXES, apply_migrations: bool = RUN_MIGRATIONS):
+    """Connect to MongoDB, apply the index registry and pending migrations"""
     global client, db
     client = AsyncIOMotorClient(MONGODB_URL)
     db = client[DB_NAME]
     print(f"✅ Connected to MongoDB: {DB_NAME}")
 
+    if apply_indexes:
+        try:
+            drift = await ensure_indexes(db)
+        except Exception as e:
+            print(f"⚠️  Index bootstrap failed: {e}")
+        else:
+            if drift["conflicting"]:
+                print(f"⚠️  Index drift (conflicting): {', '.join(drift['conflicting'])}")
+            if drift["unexpected"]:
+                print(f"ℹ️  Indexes not in registry: {', '.join(drift['unexpected'])}")
+
+    if apply_migrations:
+        try:
+            await run_migrations(db)
+        except Exception as e:
+            print(f"⚠️  Migrations failed: {e}")
+
 
 async def close_db():
     """Close MongoDB connection"""
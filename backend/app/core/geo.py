@@ -0,0 +1,148 @@
+"""Great-circle geometry for drone routing.
+
+Positions are (latitude, longitude) in degrees; distances are in metres on a
+spherical Earth, which is well within the accuracy the simulation needs.
+
+Documents store their position twice: ``latitude`` / ``longitude`` floats
+(read by the simulator and clients) and a GeoJSON ``location`` point for the
+``2dsphere`` indexes (note GeoJSON's ``[longitude, latitude]`` order).
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# Points published per route so clients can animate along the great circle.
+MAX_ROUTE_WAYPOINTS = 16
+
+LatLon = Tuple[float, float]
+
+
+def geo_point(lat: float, lon: float) -> Dict[str, object]:
+    """GeoJSON point for a ``location`` field"""
+    return {"type": "Point", "coordinates": [float(lon), float(lat)]}
+
+
+def valid_lat_lon(lat: float, lon: float) -> bool:
+    return -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+
+
+def haversine_m(start: LatLon, end: LatLon) -> float:
+    """Great-circle distance between two points in metres"""
+    lat1, lon1 = map(math.radians, start)
+    lat2, lon2 = map(math.radians, end)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def interpolate(start: LatLon, end: LatLon, fraction: float) -> LatLon:
+    """Point ``fraction`` of the way along the great circle from start to end"""
+    fraction = max(0.0, min(1.0, fraction))
+    lat1, lon1 = map(math.radians, start)
+    lat2, lon2 = map(math.radians, end)
+
+    # Angular distance between the two points.
+    delta = 2 * math.asin(
+        min(1.0, math.sqrt(
+            math.sin((lat2 - lat1) / 2) ** 2
+            + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        ))
+    )
+    if delta < 1e-12:
+        return start
+
+    a = math.sin((1 - fraction) * delta) / math.sin(delta)
+    b = math.sin(fraction * delta) / math.sin(delta)
+    x = a * math.cos(lat1) * math.cos(lon1) + b * math.cos(lat2) * math.cos(lon2)
+    y = a * math.cos(lat1) * math.sin(lon1) + b * math.cos(lat2) * math.sin(lon2)
+    z = a * math.sin(lat1) + b * math.sin(lat2)
+    return math.degrees(math.atan2(z, math.hypot(x, y))), math.degrees(math.atan2(y, x))
+
+
+def waypoints(start: LatLon, end: LatLon, duration_s: float, count: int) -> List[List[float]]:
+    """``count`` + 1 evenly spaced ``[lat, lon, seconds_after_departure]`` points"""
+    count = max(1, count)
+    points = []
+    for i in range(count + 1):
+        lat, lon = interpolate(start, end, i / count)
+        points.append([round(lat, 7), round(lon, 7), round(duration_s * i / count, 3)])
+    return points
+
+
+def plan_route(
+    start: LatLon,
+    end: LatLon,
+    *,
+    speed_mps: float,
+    tick_seconds: float,
+    departed_at: Optional[datetime] = None,
+) -> Dict[str, object]:
+    """Plan a straight great-circle flight.
+
+    The number of simulation steps follows from distance, speed and tick rate
+    (at least one step), and the ETA is precomputed from the step count. The
+    timed waypoints let clients interpolate the position themselves.
+    """
+    departed_at = departed_at or datetime.utcnow()
+    distance_m = haversine_m(start, end)
+    steps = max(1, math.ceil(distance_m / (speed_mps * tick_seconds)))
+    duration_s = steps * tick_seconds
+    eta = departed_at + timedelta(seconds=duration_s)
+    return {
+        "start_lat": start[0],
+        "start_lon": start[1],
+        "end_lat": end[0],
+        "end_lon": end[1],
+        "distance_m": round(distance_m, 1),
+        "speed_mps": speed_mps,
+        "tick_seconds": tick_seconds,
+        "steps": steps,
+        "departed_at": departed_at.isoformat(),
+        "eta": eta.isoformat(),
+        "waypoints": waypoints(start, end, duration_s, min(steps, MAX_ROUTE_WAYPOINTS)),
+    }
+
+
+def _offset_m(point: LatLon, start: LatLon, end: LatLon) -> float:
+    """Distance from ``point`` to the segment start-end (local flat projection)"""
+    scale = math.cos(math.radians(start[0]))
+    px, py = (point[1] - start[1]) * scale, point[0] - start[0]
+    ex, ey = (end[1] - start[1]) * scale, end[0] - start[0]
+    length2 = ex * ex + ey * ey
+    t = 0.0 if length2 == 0 else max(0.0, min(1.0, (px * ex + py * ey) / length2))
+    degrees = math.hypot(px - t * ex, py - t * ey)
+    return math.radians(degrees) * EARTH_RADIUS_M
+
+
+def simplify(points: List[list], tolerance_m: float, max_points: int) -> List[list]:
+    """Downsample a ``[lat, lon, ...]`` polyline for display.
+
+    Ramer-Douglas-Peucker drops points within ``tolerance_m`` of the line
+    through their neighbours; if more than ``max_points`` remain, an even
+    stride over them is kept. The first and last points always survive.
+    """
+    if len(points) <= 2:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        worst, worst_index = 0.0, None
+        for i in range(first + 1, last):
+            offset = _offset_m(points[i], points[first], points[last])
+            if offset > worst:
+                worst, worst_index = offset, i
+        if worst_index is not None and worst > tolerance_m:
+            keep[worst_index] = True
+            stack.extend(((first, worst_index), (worst_index, last)))
+
+    kept = [point for point, flag in zip(points, keep) if flag]
+    if len(kept) > max_points >= 2:
+        stride = (len(kept) - 1) / (max_points - 1)
+        kept = [kept[round(i * stride)] for i in range(max_points)]
+    return kept
@@ -0,0 +1,323 @@
+"""Declarative MongoDB index registry.
+
+Every collection the services query is listed here together with the indexes
+its hot query shapes need. ``connect_db`` applies the registry on startup and
+reports drift (missing, conflicting or unexpected indexes). Collections that
+need creation options (e.g. time-series) are created first, before anything
+else implicitly creates them as plain collections.
+
+Configuration (environment variables):
+- TELEMETRY_RETENTION_DAYS: how long drone telemetry is kept (default 30)
+
+CLI (run from the backend directory):
+    python -m app.core.indexes apply     # create missing indexes
+    python -m app.core.indexes check     # report drift only
+    python -m app.core.indexes explain   # print explain() plans for every query shape
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, IndexModel
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+TELEMETRY_RETENTION_DAYS = int(os.getenv("TELEMETRY_RETENTION_DAYS", "30"))
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """One index on one collection"""
+    collection: str
+    keys: Tuple[Tuple[str, Any], ...]
+    name: str
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    def to_model(self) -> IndexModel:
+        return IndexModel(list(self.keys), name=self.name, **self.options)
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    """A query the services issue, used by the explain CLI"""
+    source: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Tuple[str, int]]] = None
+    collation: Optional[Dict[str, Any]] = None
+
+
+# Indexes earlier versions created that the registry has replaced.
+OBSOLETE_INDEXES: List[Tuple[str, str]] = [
+    ("restaurants", "owner_username_1_ci"),
+    ("users", "username_1_role_1_ci"),
+]
+
+
+# Collections created with options (they cannot be converted later).
+COLLECTIONS: Dict[str, Dict[str, Any]] = {
+    # Drone positions, bucketed by drone/order (see TelemetryService).
+    "drone_telemetry": {
+        "timeseries": {"timeField": "ts", "metaField": "meta", "granularity": "seconds"},
+        "expireAfterSeconds": TELEMETRY_RETENTION_DAYS * 86400,
+    },
+}
+
+
+INDEXES: List[IndexSpec] = [
+    # OrderService list endpoints filter by owner and return newest first.
+    IndexSpec("orders", (("customer_id", ASCENDING), ("_id", DESCENDING)), "customer_id_1__id_-1"),
+    IndexSpec("orders", (("restaurant_id", ASCENDING), ("_id", DESCENDING)), "restaurant_id_1__id_-1"),
+    IndexSpec("orders", (("status", ASCENDING),), "status_1"),
+    # Restaurant dashboard: active orders by recency, and incremental refreshes.
+    IndexSpec(
+        "orders",
+        (("restaurant_id", ASCENDING), ("status", ASCENDING), ("updated_at", DESCENDING)),
+        "restaurant_id_1_status_1_updated_at_-1",
+    ),
+    IndexSpec("orders", (("restaurant_id", ASCENDING), ("updated_at", DESCENDING)), "restaurant_id_1_updated_at_-1"),
+    # Order watcher polling for all recent changes (shared tracking backplane).
+    IndexSpec("orders", (("updated_at", ASCENDING),), "updated_at_1"),
+    # Restaurant dashboard: available drones for a restaurant.
+    IndexSpec("drones", (("restaurant_id", ASCENDING), ("status", ASCENDING)), "restaurant_id_1_status_1"),
+    # Nearest available drones ($geoNear on location, filtered by status / restaurant).
+    IndexSpec(
+        "drones",
+        (("location", GEOSPHERE), ("status", ASCENDING), ("restaurant_id", ASCENDING)),
+        "location_2dsphere_status_1_restaurant_id_1",
+    ),
+    IndexSpec("menu_items", (("restaurant_id", ASCENDING),), "restaurant_id_1"),
+    # Nearby restaurants ($geoNear).
+    IndexSpec("restaurants", (("location", GEOSPHERE),), "location_2dsphere"),
+    # Login and ownership lookups match on normalized (lowercased) usernames.
+    IndexSpec("restaurants", (("owner_username_lower", ASCENDING),), "owner_username_lower_1"),
+    IndexSpec("users", (("username_lower", ASCENDING), ("role", ASCENDING)), "username_lower_1_role_1"),
+    # Track replay: one delivery's samples in time order.
+    IndexSpec("drone_telemetry", (("meta.order_id", ASCENDING), ("ts", ASCENDING)), "meta.order_id_1_ts_1"),
+    # Shared cache tier: expired entries are purged by the server.
+    IndexSpec("cache_entries", (("expires_at", ASCENDING),), "expires_at_ttl", {"expireAfterSeconds": 0}),
+]
+
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("OrderService.get_order", "orders", {"_id": ObjectId()}),
+    QueryShape("OrderService.get_customer_orders", "orders", {"customer_id": "<customer_id>"}),
+    QueryShape("OrderService.get_restaurant_orders", "orders", {"restaurant_id": "<restaurant_id>"}),
+    QueryShape("OrderService.get_all_orders", "orders", {}),
+    QueryShape(
+        "OrderService.get_active_orders",
+        "orders",
+        {"restaurant_id": "<restaurant_id>", "status": {"$in": ["PENDING", "PREPARING"]}},
+        [("updated_at", DESCENDING)],
+    ),
+    QueryShape(
+        "OrderService.get_active_orders (since)",
+        "orders",
+        {"restaurant_id": "<restaurant_id>", "updated_at": {"$gt": "<watermark>"}},
+        [("updated_at", DESCENDING)],
+    ),
+    QueryShape("OrderWatcher._poll_all", "orders", {"updated_at": {"$gt": "<watermark>"}}),
+    QueryShape("TelemetryService.track", "drone_telemetry", {"meta.order_id": ObjectId()}, [("ts", ASCENDING)]),
+    QueryShape("DroneService.get_drone", "drones", {"_id": ObjectId()}),
+    QueryShape("DroneService.get_restaurant_drones", "drones", {"restaurant_id": "<restaurant_id>"}),
+    QueryShape(
+        "DroneService.get_available_drones",
+        "drones",
+        {"restaurant_id": "<restaurant_id>", "status": {"$in": ["AVAILABLE", "IDLE"]}},
+    ),
+    QueryShape("DroneService.get_all_drones", "drones", {}),
+    QueryShape(
+        "DroneService.nearest_available_drones",
+        "drones",
+        {
+            "location": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [106.66, 10.76]}}},
+            "status": {"$in": ["AVAILABLE", "IDLE"]},
+            "restaurant_id": "<restaurant_id>",
+        },
+    ),
+    QueryShape(
+        "pagination.paginate_near (restaurants)",
+        "restaurants",
+        {"location": {"$nearSphere": {"$geometry": {"type": "Point", "coordinates": [106.66, 10.76]}, "$maxDistance": 5000}}},
+    ),
+    QueryShape(
+        "routes.get_restaurant_menu",
+        "menu_items",
+        {"restaurant_id": {"$in": [ObjectId(), "<restaurant_id>"]}},
+    ),
+    QueryShape("AuthService.login (user)", "users", {"username_lower": "<username>", "role": "CUSTOMER"}),
+    QueryShape("AuthService.login (restaurant)", "restaurants", {"owner_username_lower": "<username>"}),
+    QueryShape("AuthService.get_user", "users", {"_id": ObjectId()}),
+]
+
+
+def _normalize_key(key: Any) -> List[Tuple[str, Any]]:
+    return [(k, int(v) if isinstance(v, (int, float)) else v) for k, v in key]
+
+
+def _group_by_collection() -> Dict[str, List[IndexSpec]]:
+    by_collection: Dict[str, List[IndexSpec]] = {}
+    for spec in INDEXES:
+        by_collection.setdefault(spec.collection, []).append(spec)
+    return by_collection
+
+
+def _index_matches(spec: IndexSpec, info: Dict[str, Any]) -> bool:
+    if _normalize_key(info.get("key", [])) != _normalize_key(spec.keys):
+        return False
+    for option, expected in spec.options.items():
+        actual = info.get(option)
+        if option == "collation" and isinstance(actual, dict):
+            # The server expands collation with defaults; only compare what we set.
+            actual = {k: actual.get(k) for k in expected}
+        if actual != expected:
+            return False
+    return True
+
+
+async def check_index_drift(db) -> Dict[str, List[str]]:
+    """Compare the registry against the live indexes.
+
+    Returns a dict with ``missing``, ``conflicting`` and ``unexpected`` lists of
+    ``collection.index_name`` strings.
+    """
+    report: Dict[str, List[str]] = {"missing": [], "conflicting": [], "unexpected": []}
+
+    for collection, specs in _group_by_collection().items():
+        existing = await db[collection].index_information()
+        for spec in specs:
+            info = existing.get(spec.name)
+            if info is None:
+                report["missing"].append(f"{collection}.{spec.name}")
+            elif not _index_matches(spec, info):
+                report["conflicting"].append(f"{collection}.{spec.name}")
+
+        expected_names = {spec.name for spec in specs} | {"_id_"}
+        for name in existing:
+            if name not in expected_names:
+                report["unexpected"].append(f"{collection}.{name}")
+
+    return report
+
+
+async def ensure_collections(db):
+    """Create the collections in COLLECTIONS that do not exist yet"""
+    existing = set(await db.list_collection_names())
+    for name, options in COLLECTIONS.items():
+        if name in existing:
+            continue
+        try:
+            await db.create_collection(name, **options)
+            print(f"📦 Created collection {name}")
+        except CollectionInvalid:
+            pass  # created concurrently by another worker
+        except OperationFailure as e:
+            # e.g. a server without time-series support: it is created as a plain collection on first write.
+            print(f"⚠️  Collection {name} not created with options: {e}")
+
+
+async def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create any missing registry indexes, drop obsolete ones, return the remaining drift"""
+    await ensure_collections(db)
+    for collection, name in OBSOLETE_INDEXES:
+        try:
+            if name in await db[collection].index_information():
+                await db[collection].drop_index(name)
+                print(f"🧹 Dropped obsolete index {collection}.{name}")
+        except OperationFailure as e:
+            print(f"⚠️  Could not drop obsolete index {collection}.{name}: {e}")
+
+    for collection, specs in _group_by_collection().items():
+        for spec in specs:
+            try:
+                await db[collection].create_indexes([spec.to_model()])
+            except OperationFailure as e:
+                # Same name with different options: leave it for an operator to fix.
+                print(f"⚠️  Index {collection}.{spec.name} not applied: {e}")
+
+    return await check_index_drift(db)
+
+
+def _summarize_plan(plan: Dict[str, Any]) -> str:
+    """Render a winning plan as STAGE(index) <- STAGE(index) ..."""
+    stages = []
+    node: Optional[Dict[str, Any]] = plan
+    while node:
+        stage = node.get("stage", "?")
+        if node.get("indexName"):
+            stage = f"{stage}({node['indexName']})"
+        stages.append(stage)
+        node = node.get("inputStage") or (node.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+
+async def explain_query_shapes(db) -> List[Dict[str, Any]]:
+    """Run explain() for every registered query shape"""
+    results = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(shape.sort)
+        if shape.collation:
+            cursor = cursor.collation(shape.collation)
+        explained = await cursor.explain()
+
+        planner = explained.get("queryPlanner", {})
+        winning = planner.get("winningPlan", {})
+        # Slot-based engine wraps the classic plan under queryPlan.
+        winning = winning.get("queryPlan", winning)
+        stats = explained.get("executionStats", {})
+        results.append(
+            {
+                "source": shape.source,
+                "collection": shape.collection,
+                "plan": _summarize_plan(winning),
+                "docs_examined": stats.get("totalDocsExamined"),
+                "keys_examined": stats.get("totalKeysExamined"),
+                "returned": stats.get("nReturned"),
+            }
+        )
+    return results
+
+
+def _print_drift(report: Dict[str, List[str]]):
+    if not any(report.values()):
+        print("✅ Indexes match the registry")
+        return
+    for kind, names in report.items():
+        for name in names:
+            print(f"⚠️  {kind}: {name}")
+
+
+async def _main(command: str) -> int:
+    from app.core.database import close_db, connect_db, get_db
+
+    await connect_db(apply_indexes=False)
+    try:
+        db = get_db()
+        if command == "apply":
+            _print_drift(await ensure_indexes(db))
+        elif command == "check":
+            report = await check_index_drift(db)
+            _print_drift(report)
+            return 1 if report["missing"] or report["conflicting"] else 0
+        elif command == "explain":
+            for row in await explain_query_shapes(db):
+                print(f"{row['source']:<45} {row['collection']:<12} {row['plan']}")
+                print(
+                    f"{'':<45} docs={row['docs_examined']} keys={row['keys_examined']} "
+                    f"returned={row['returned']}"
+                )
+        else:
+            print(__doc__)
+            return 2
+        return 0
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "")))
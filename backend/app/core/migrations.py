@@ -0,0 +1,127 @@
+"""One-off data migrations.
+
+Each migration runs once per database; applied ids are recorded in the
+``migrations`` collection. ``connect_db`` runs pending migrations on startup.
+
+CLI (run from the backend directory):
+    python -m app.core.migrations          # run pending migrations
+    python -m app.core.migrations --force  # re-run every migration
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.geo import geo_point, valid_lat_lon
+
+_BATCH_SIZE = 500
+
+
+def normalize_lookup_key(value: str | None) -> str:
+    """Canonical form of a username used for case-insensitive equality lookups"""
+    return (value or "").strip().lower()
+
+
+async def _backfill_field(collection, source: str, target: str, extra: Callable[[dict], dict] | None = None) -> int:
+    """Set ``target`` to the normalized ``source`` on documents that lack it"""
+    updated = 0
+    ops: List[UpdateOne] = []
+    projection = {source: 1, "role": 1}
+
+    async for doc in collection.find({target: {"$exists": False}}, projection, batch_size=_BATCH_SIZE):
+        changes = {target: normalize_lookup_key(doc.get(source))}
+        if extra:
+            changes.update(extra(doc))
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+        if len(ops) >= _BATCH_SIZE:
+            updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+
+    if ops:
+        updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+    return updated
+
+
+async def backfill_lookup_keys(db) -> Dict[str, int]:
+    """Add ``users.username_lower`` and ``restaurants.owner_username_lower``.
+
+    Also upper-cases ``users.role`` so login can match it with plain equality.
+    """
+    users = await _backfill_field(
+        db.users,
+        "username",
+        "username_lower",
+        extra=lambda doc: {"role": (doc.get("role") or "").strip().upper()},
+    )
+    restaurants = await _backfill_field(db.restaurants, "owner_username", "owner_username_lower")
+    return {"users": users, "restaurants": restaurants}
+
+
+async def _backfill_location(collection) -> int:
+    """Set the GeoJSON ``location`` from ``latitude`` / ``longitude`` where it is missing"""
+    updated = 0
+    ops: List[UpdateOne] = []
+    query = {"location": {"$exists": False}, "latitude": {"$type": "number"}, "longitude": {"$type": "number"}}
+
+    async for doc in collection.find(query, {"latitude": 1, "longitude": 1}, batch_size=_BATCH_SIZE):
+        if not valid_lat_lon(doc["latitude"], doc["longitude"]):
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"location": geo_point(doc["latitude"], doc["longitude"])}}))
+        if len(ops) >= _BATCH_SIZE:
+            updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+
+    if ops:
+        updated += (await collection.bulk_write(ops, ordered=False)).modified_count
+    return updated
+
+
+async def backfill_locations(db) -> Dict[str, int]:
+    """Add GeoJSON ``location`` points to restaurants and drones (2dsphere indexes)"""
+    return {
+        "restaurants": await _backfill_location(db.restaurants),
+        "drones": await _backfill_location(db.drones),
+    }
+
+
+MIGRATIONS: List[Tuple[str, Callable[..., Awaitable[Dict[str, int]]]]] = [
+    ("0001_backfill_lookup_keys", backfill_lookup_keys),
+    ("0002_backfill_locations", backfill_locations),
+]
+
+
+async def run_migrations(db, force: bool = False) -> List[str]:
+    """Run every migration that has not been applied yet; return the ids run"""
+    applied = []
+    for migration_id, migrate in MIGRATIONS:
+        if not force and await db.migrations.find_one({"_id": migration_id}, {"_id": 1}):
+            continue
+
+        result = await migrate(db)
+        await db.migrations.update_one(
+            {"_id": migration_id},
+            {"$set": {"applied_at": datetime.utcnow().isoformat(), "result": result}},
+            upsert=True,
+        )
+        print(f"🛠️  Migration {migration_id} applied: {result}")
+        applied.append(migration_id)
+    return applied
+
+
+async def _main(force: bool) -> int:
+    from app.core.database import close_db, connect_db, get_db
+
+    await connect_db(apply_indexes=False, apply_migrations=False)
+    try:
+        applied = await run_migrations(get_db(), force=force)
+        if not applied:
+            print("✅ No pending migrations")
+        return 0
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main("--force" in sys.argv[1:])))
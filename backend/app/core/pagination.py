@@ -0,0 +1,240 @@
+"""Keyset (cursor) pagination over ``_id``.
+
+ObjectIds are monotonically increasing with creation time, so paging on
+``_id`` gives stable creation-ordered pages that use the ``_id`` suffix of the
+compound list indexes instead of ``skip()``. Cursor tokens are opaque to
+clients: url-safe base64 of the boundary id and the paging direction.
+
+Totals are optional. An unfiltered collection uses the collection metadata
+count; filtered counts are cached for a short time instead of running
+``count_documents`` on every page.
+
+``paginate_near`` pages ``$geoNear`` results by distance instead.
+
+List endpoints take a ``fields=a,b,c`` sparse fieldset (see parse_fields),
+applied as the ``find`` projection.
+
+With ``raw_batches`` a page is read with ``find_raw_batches`` and decoded in
+bulk by the BSON C extension instead of document by document.
+"""
+import base64
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Request
+from pymongo import ASCENDING, DESCENDING
+
+from app.core.cache import TTLCache
+from app.core.serialization import decode_raw_batches
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+COUNT_CACHE_TTL_SECONDS = float(os.getenv("COUNT_CACHE_TTL_SECONDS", "30"))
+_count_cache = TTLCache(maxsize=1024, ttl=COUNT_CACHE_TTL_SECONDS)
+
+
+def _encode_token(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_token(token: str) -> Dict[str, Any]:
+    padded = token + "=" * (-len(token) % 4)
+    data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    if not isinstance(data, dict):
+        raise ValueError(token)
+    return data
+
+
+def encode_cursor(boundary_id: ObjectId, direction: str) -> str:
+    """Build an opaque token; direction is ``next`` or ``prev``"""
+    return _encode_token({"id": str(boundary_id), "d": direction})
+
+
+def decode_cursor(token: str) -> tuple[ObjectId, str]:
+    """Parse a cursor token.
+
+    Raises:
+        HTTPException(400): if the token is malformed.
+    """
+    try:
+        data = _decode_token(token)
+        direction = data["d"]
+        if direction not in ("next", "prev"):
+            raise ValueError(direction)
+        return ObjectId(data["id"]), direction
+    except (InvalidId, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], default: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Projection for a ``fields=`` parameter.
+
+    Omitted -> ``default``; ``*`` -> whole documents (``None``); otherwise only
+    the listed fields (``id`` is always returned).
+
+    Raises:
+        HTTPException(400): on an operator (``$``-prefixed) field name.
+    """
+    names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    if not names:
+        return default
+    if names == ["*"]:
+        return None
+    if any("$" in name for name in names):
+        raise HTTPException(status_code=400, detail="Invalid fields")
+    return {name: 1 for name in names if name not in ("id", "_id")} or {"_id": 1}
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_LIMIT))
+
+
+async def count_total(collection, query: Dict[str, Any]) -> int:
+    """Estimated count for whole collections, short-lived cached count otherwise"""
+    if not query:
+        return await collection.estimated_document_count()
+
+    key = (collection.name, json.dumps(query, sort_keys=True, default=str))
+    total = _count_cache.get(key)
+    if total is None:
+        total = await collection.count_documents(query)
+        _count_cache.set(key, total)
+    return total
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    *,
+    serialize: Callable[[Dict[str, Any]], Dict[str, Any]],
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+    newest_first: bool = True,
+    projection: Optional[Dict[str, Any]] = None,
+    include_total: bool = False,
+    raw_batches: bool = False,
+) -> Dict[str, Any]:
+    """Fetch one page of ``query`` ordered by ``_id``.
+
+    Returns ``{"data", "limit", "next_cursor", "prev_cursor"}`` plus ``total``
+    when asked for. ``query`` must not constrain ``_id`` itself.
+    """
+    limit = clamp_limit(limit)
+    forward_op, backward_op = ("$lt", "$gt") if newest_first else ("$gt", "$lt")
+    forward_sort = DESCENDING if newest_first else ASCENDING
+
+    direction = "next"
+    page_query = query
+    if cursor:
+        boundary, direction = decode_cursor(cursor)
+        op = forward_op if direction == "next" else backward_op
+        page_query = {**query, "_id": {op: boundary}}
+
+    sort = forward_sort if direction == "next" else -forward_sort
+    docs: List[Dict[str, Any]]
+    if raw_batches:
+        docs = await decode_raw_batches(
+            collection.find_raw_batches(page_query, projection).sort("_id", sort).limit(limit + 1)
+        )
+    else:
+        docs = await (
+            collection.find(page_query, projection).sort("_id", sort).limit(limit + 1).to_list(limit + 1)
+        )
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if direction == "prev":
+        docs.reverse()
+
+    # Going forward there is a previous page iff we came from a cursor; going
+    # back there is always a next page (the one we came from).
+    has_next = has_more if direction == "next" else True
+    has_prev = bool(cursor) if direction == "next" else has_more
+
+    next_cursor = encode_cursor(docs[-1]["_id"], "next") if docs and has_next else None
+    prev_cursor = encode_cursor(docs[0]["_id"], "prev") if docs and has_prev else None
+
+    page: Dict[str, Any] = {
+        "data": [serialize(doc) for doc in docs],
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+    if include_total:
+        page["total"] = await count_total(collection, query)
+    return page
+
+
+async def paginate_near(
+    collection,
+    point: Dict[str, Any],
+    *,
+    max_distance_m: float,
+    serialize: Callable[[Dict[str, Any]], Dict[str, Any]],
+    query: Optional[Dict[str, Any]] = None,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Fetch one page of documents within ``max_distance_m`` of ``point``, nearest first.
+
+    Uses ``$geoNear`` (needs a 2dsphere index) and keyset paging on
+    ``(distance, _id)``: a cursor resumes at its row's distance
+    (``minDistance``) and skips what was already returned. Rows carry
+    ``distance_m``. Cursors only go forward (``prev_cursor`` is always None).
+
+    Raises:
+        HTTPException(400): if the cursor is malformed.
+    """
+    limit = clamp_limit(limit)
+    geo_near: Dict[str, Any] = {
+        "near": point,
+        "distanceField": "distance_m",
+        "maxDistance": max_distance_m,
+        "spherical": True,
+        "query": query or {},
+    }
+    pipeline: List[Dict[str, Any]] = [{"$geoNear": geo_near}]
+    if cursor:
+        try:
+            data = _decode_token(cursor)
+            last_distance, last_id = float(data["m"]), ObjectId(data["id"])
+        except (InvalidId, KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        geo_near["minDistance"] = last_distance
+        pipeline.append({
+            "$match": {
+                "$or": [
+                    {"distance_m": {"$gt": last_distance}},
+                    {"distance_m": last_distance, "_id": {"$gt": last_id}},
+                ]
+            }
+        })
+    pipeline += [{"$sort": {"distance_m": 1, "_id": 1}}, {"$limit": limit + 1}]
+    if projection:
+        pipeline.append({"$project": {**projection, "distance_m": 1}})
+
+    docs = await collection.aggregate(pipeline).to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = (
+        _encode_token({"m": docs[-1]["distance_m"], "id": str(docs[-1]["_id"])}) if docs and has_more else None
+    )
+    return {
+        "data": [serialize(doc) for doc in docs],
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "prev_cursor": None,
+    }
+
+
+def with_links(page: Dict[str, Any], request: Request) -> Dict[str, Any]:
+    """Add absolute ``next`` / ``prev`` URLs for the page's cursors"""
+    for key in ("next", "prev"):
+        token = page.get(f"{key}_cursor")
+        page[key] = str(request.url.include_query_params(cursor=token)) if token else None
+    return page
@@ -0,0 +1,83 @@
+"""Serialization of MongoDB documents to JSON.
+
+- serialize_doc: one pass over a document that renames ``_id`` to ``id`` and
+  converts ObjectId / datetime values (at any depth) to strings.
+- dumps: JSON bytes via orjson when it is installed (optional), else the
+  standard library; both understand ObjectId and datetime natively.
+- FastJSONResponse: a JSONResponse rendered with ``dumps``. Returning it from
+  a route also skips FastAPI's ``jsonable_encoder`` walk of the payload.
+- decode_raw_batches: documents from a ``find_raw_batches`` cursor, decoded
+  batch by batch by the BSON C extension.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List
+
+import bson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _convert(value: Any) -> Any:
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, dict):
+        return {key: _convert(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_convert(item) for item in value]
+    if isinstance(value, (ObjectId, datetime, date)):
+        return _default(value)
+    return value
+
+
+def serialize_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-ready copy of a document: ``_id`` -> ``id``, ObjectId/datetime -> str"""
+    if not doc:
+        return doc
+    out: Dict[str, Any] = {}
+    for key, value in doc.items():
+        if key == "_id":
+            out["id"] = str(value)
+        else:
+            out[key] = value if isinstance(value, _SCALARS) else _convert(value)
+    return out
+
+
+if orjson is not None:
+    def dumps(payload: Any) -> bytes:
+        """Compact UTF-8 JSON"""
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(payload: Any) -> bytes:
+        """Compact UTF-8 JSON"""
+        return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered in one pass (orjson when available)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def decode_raw_batches(cursor) -> List[Dict[str, Any]]:
+    """Documents of a ``find_raw_batches`` cursor, decoded in bulk"""
+    docs: List[Dict[str, Any]] = []
+    async for batch in cursor:
+        docs.extend(bson.decode_all(batch))
+    return docs
@@ -0,0 +1,231 @@
+"""Media storage backends.
+
+Images are stored under their content hash (see app.services.media_service)
+by one of:
+
+- CloudinaryStorage: uploads to Cloudinary (see app.core.cloudinary);
+- LocalStorage: content-addressed files under a local directory, served by
+  the API itself at ``/media/...`` (no external service, no per-image network
+  round trip).
+
+Local files are written by streaming the upload spool into a temporary file
+next to the target and renaming it into place, so readers never see partial
+files. They are served with ``MediaFileResponse``: byte ranges, an ETag (the
+content hash) and year-long immutable cache headers. The body goes out via
+the ASGI ``zerocopysend`` extension (sendfile) when the server offers it,
+via ``X-Accel-Redirect`` when a fronting nginx is configured, and otherwise
+from an mmap of the file.
+
+Configuration (environment variables):
+- MEDIA_STORAGE: ``cloudinary`` (default) or ``local``
+- MEDIA_LOCAL_ROOT: directory of the local backend (default ``media``)
+- MEDIA_PUBLIC_URL: URL prefix of locally stored images (default http://localhost:8000/media)
+- MEDIA_ACCEL_REDIRECT: internal nginx location to hand file bodies to, e.g. ``/_media/`` (default off)
+"""
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+
+from app.core.cache import etag_matches
+
+MEDIA_STORAGE = os.getenv("MEDIA_STORAGE", "cloudinary").lower()
+MEDIA_LOCAL_ROOT = os.getenv("MEDIA_LOCAL_ROOT", "media")
+MEDIA_PUBLIC_URL = os.getenv("MEDIA_PUBLIC_URL", "http://localhost:8000/media")
+MEDIA_ACCEL_REDIRECT = os.getenv("MEDIA_ACCEL_REDIRECT", "")
+
+MENU_ITEM_FOLDER = "fastfood/menu_items"
+RESTAURANT_FOLDER = "fastfood/restaurants"
+
+_COPY_CHUNK_SIZE = 1024 * 1024
+_SEND_CHUNK_SIZE = 256 * 1024
+_IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Served types; anything else (e.g. SVG, which can carry scripts) is stored without an extension.
+_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+}
+_CONTENT_TYPES = {ext: content_type for content_type, ext in _EXTENSIONS.items()}
+_LOCAL_PATH_RE = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z]+)?$")
+
+
+class StorageNotConfiguredError(RuntimeError):
+    pass
+
+
+class StorageBackend(ABC):
+    """Where uploaded images go. ``save`` is blocking (run it off the event loop)."""
+
+    name = "base"
+
+    def check_configured(self):
+        """Raise StorageNotConfiguredError if uploads cannot succeed"""
+
+    @abstractmethod
+    def save(self, file_obj, *, key: str, folder: str, content_type: Optional[str]) -> str:
+        """Store ``file_obj`` under content hash ``key``; returns its public URL"""
+
+
+class CloudinaryStorage(StorageBackend):
+    name = "cloudinary"
+
+    def check_configured(self):
+        from app.core.cloudinary import CloudinaryNotConfiguredError, ensure_configured
+
+        try:
+            ensure_configured()
+        except CloudinaryNotConfiguredError as e:
+            raise StorageNotConfiguredError(str(e)) from e
+
+    def save(self, file_obj, *, key: str, folder: str, content_type: Optional[str]) -> str:
+        from app.core.cloudinary import upload_image
+
+        self.check_configured()
+        return upload_image(file_obj, folder=folder, public_id=key)
+
+
+class LocalStorage(StorageBackend):
+    """Content-addressed files: ``<root>/ab/cd/<sha256><ext>``"""
+
+    name = "local"
+
+    def __init__(self, root: str = MEDIA_LOCAL_ROOT, public_url: str = MEDIA_PUBLIC_URL):
+        self.root = os.path.abspath(root)
+        self.public_url = public_url.rstrip("/")
+
+    def check_configured(self):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except OSError as e:
+            raise StorageNotConfiguredError(f"Media directory {self.root} is not usable: {e}") from e
+
+    def save(self, file_obj, *, key: str, folder: str, content_type: Optional[str]) -> str:
+        relative = f"{key[:2]}/{key[2:4]}/{key}{_EXTENSIONS.get(content_type or '', '')}"
+        path = os.path.join(self.root, relative)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            tmp = tempfile.NamedTemporaryFile(dir=directory, prefix=".upload-", delete=False)
+            try:
+                with tmp:
+                    shutil.copyfileobj(file_obj, tmp, _COPY_CHUNK_SIZE)
+                os.chmod(tmp.name, 0o644)
+                os.replace(tmp.name, path)
+            except BaseException:
+                os.unlink(tmp.name)
+                raise
+        return f"{self.public_url}/{relative}"
+
+    def resolve(self, relative: str) -> Optional[Tuple[str, str]]:
+        """``(absolute path, content hash)`` of a stored file, or None"""
+        match = _LOCAL_PATH_RE.match(relative)
+        if not match:
+            return None
+        path = os.path.join(self.root, relative)
+        return (path, match.group(1)) if os.path.isfile(path) else None
+
+
+def build_storage() -> StorageBackend:
+    """The backend selected by MEDIA_STORAGE"""
+    if MEDIA_STORAGE == "local":
+        return LocalStorage()
+    if MEDIA_STORAGE != "cloudinary":
+        print(f"⚠️  Unknown MEDIA_STORAGE={MEDIA_STORAGE!r}, using cloudinary")
+    return CloudinaryStorage()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """``(start, end)`` (inclusive) of a single ``bytes=`` range, None to send everything.
+
+    Raises:
+        ValueError: if the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        # Multiple ranges are rare for images; answering with the whole file is allowed.
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            suffix = int(last)
+            start, end = (max(0, size - suffix), size - 1) if suffix > 0 else (size, size - 1)
+    except ValueError:
+        # Malformed ranges are ignored.
+        return None
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class MediaFileResponse(Response):
+    """A stored file with range, ETag and immutable caching support"""
+
+    def __init__(self, request: Request, path: str, etag: str, relative: str):
+        self.path = path
+        self.offset = 0
+        self.count = 0
+        stat = os.stat(path)
+        etag = f'"{etag}"'
+        headers = {"ETag": etag, "Cache-Control": _IMMUTABLE, "Accept-Ranges": "bytes", "X-Content-Type-Options": "nosniff"}
+        media_type = _CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream")
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            super().__init__(status_code=304, headers=headers)
+            return
+
+        status_code = 200
+        start, end = 0, stat.st_size - 1
+        if_range = request.headers.get("if-range")
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(request.headers.get("range"), stat.st_size)
+            except ValueError:
+                headers["Content-Range"] = f"bytes */{stat.st_size}"
+                super().__init__(status_code=416, headers=headers)
+                return
+            if byte_range is not None:
+                status_code = 206
+                start, end = byte_range
+                headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+
+        self.offset, self.count = start, end - start + 1
+        if MEDIA_ACCEL_REDIRECT:
+            # nginx serves the file (with sendfile) and applies the Range itself.
+            headers["X-Accel-Redirect"] = MEDIA_ACCEL_REDIRECT.rstrip("/") + "/" + relative
+            self.count = 0
+            super().__init__(headers=headers, media_type=media_type)
+            return
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.headers["content-length"] = str(self.count)
+        if request.method == "HEAD":
+            self.count = 0
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.count <= 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as file:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": self.offset, "count": self.count})
+                return
+            # Slices of a read-only mmap come straight from the page cache (files are local and immutable).
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                position, end = self.offset, self.offset + self.count
+                while position < end:
+                    chunk_end = min(position + _SEND_CHUNK_SIZE, end)
+                    await send({"type": "http.response.body", "body": mapped[position:chunk_end], "more_body": chunk_end < end})
+                    position = chunk_end
@@ -0,0 +1,118 @@
+"""Streaming JSON exports straight from a Motor cursor.
+
+Documents are pulled in bounded batches, encoded one at a time and written to
+the response as they arrive, so memory stays flat regardless of how many
+documents the export covers.
+
+Formats:
+- ``ndjson``: one JSON document per line (``application/x-ndjson``)
+- ``json``: a single JSON array (``application/json``)
+"""
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.pagination import parse_fields
+from app.core.serialization import dumps
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Flush to the socket once this many encoded bytes are buffered.
+_FLUSH_BYTES = 64 * 1024
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def _encode(doc: Dict[str, Any]) -> bytes:
+    return dumps(doc)
+
+
+async def iter_export(cursor, serialize: Callable[[Dict[str, Any]], Dict[str, Any]], fmt: str) -> AsyncIterator[bytes]:
+    """Yield encoded chunks for every document the cursor returns"""
+    ndjson = fmt == "ndjson"
+    separator = b"\n" if ndjson else b","
+    buffer: List[bytes] = [] if ndjson else [b"["]
+    buffered = 0
+    first = True
+
+    try:
+        async for doc in cursor:
+            encoded = _encode(serialize(doc))
+            if ndjson:
+                buffer.append(encoded + separator)
+            else:
+                buffer.append(encoded if first else separator + encoded)
+            first = False
+            buffered += len(encoded) + 1
+            if buffered >= _FLUSH_BYTES:
+                yield b"".join(buffer)
+                buffer, buffered = [], 0
+
+        if not ndjson:
+            buffer.append(b"]")
+        if buffer:
+            yield b"".join(buffer)
+    finally:
+        # Kill the server-side cursor if the client went away mid-export.
+        await cursor.close()
+
+
+def _parse_bound(value: str, *, field_name: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field_name} (expected ISO 8601 date/time)")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def created_range_query(since: Optional[str], until: Optional[str]) -> Dict[str, Any]:
+    """Filter on creation time through ``_id`` (ObjectIds embed their creation time).
+
+    Raises:
+        HTTPException(400): if a bound is not an ISO 8601 date/time.
+    """
+    bounds: Dict[str, Any] = {}
+    if since:
+        bounds["$gte"] = ObjectId.from_datetime(_parse_bound(since, field_name="since"))
+    if until:
+        bounds["$lt"] = ObjectId.from_datetime(_parse_bound(until, field_name="until"))
+    return {"_id": bounds} if bounds else {}
+
+
+def export_response(
+    collection,
+    serialize: Callable[[Dict[str, Any]], Dict[str, Any]],
+    *,
+    fmt: str = "ndjson",
+    fields: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    filename: str = "export",
+) -> StreamingResponse:
+    """Build a StreamingResponse exporting ``collection`` in ``_id`` order.
+
+    Raises:
+        HTTPException(400): on an unknown format, invalid fields or invalid date bounds.
+    """
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_MEDIA_TYPES)}")
+
+    cursor = (
+        collection.find(created_range_query(since, until), parse_fields(fields))
+        .sort("_id", 1)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    extension = "ndjson" if fmt == "ndjson" else "json"
+    return StreamingResponse(
+        iter_export(cursor, serialize, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
@@ -18,6 +18,9 @@ class OrderCreate(BaseModel):
     items: List[OrderItem] = Field(..., min_length=1)
     total_price: float = Field(..., ge=0)
     delivery_address: str = Field(..., min_length=1)
+    # Optional drop-off coordinates; the demo location is used when omitted.
+    delivery_lat: Optional[float] = Field(None, ge=-90, le=90)
+    delivery_lon: Optional[float] = Field(None, ge=-180, le=180)
 
     model_config = ConfigDict(
         extra="forbid",
@@ -57,6 +60,8 @@ class Order(BaseModel):
     delivery_lon: float = 106.660172
     drone_lat: float = 10.762622
     drone_lon: float = 106.660172
+    route: Optional[dict] = None  # Planned great-circle flight, set when delivery starts
+    eta: Optional[str] = None
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -1,57 +1,74 @@
 """Simple auth service - NO JWT, NO password hashing"""
+from app.core.cache import TTLCache
 from app.core.database import get_db
+from app.core.migrations import normalize_lookup_key
 from app.models.user import User, LoginRequest
 from bson import ObjectId
 from datetime import datetime
-import re
+import os
+
+LOGIN_CACHE_SIZE = int(os.getenv("LOGIN_CACHE_SIZE", "10000"))
+LOGIN_CACHE_TTL_SECONDS = float(os.getenv("LOGIN_CACHE_TTL_SECONDS", "300"))
 
 
 class AuthService:
     """Simple login service"""
 
+    def __init__(self):
+        # (username_lower, role) -> {"id": ..., "restaurant_id": ...}
+        self._login_cache = TTLCache(maxsize=LOGIN_CACHE_SIZE, ttl=LOGIN_CACHE_TTL_SECONDS)
+
+    def invalidate(self, username: str, role: str | None = None):
+        """Drop cached logins for a username (all roles unless one is given)"""
+        username_lower = normalize_lookup_key(username)
+        roles = [role.strip().upper()] if role else ["CUSTOMER", "RESTAURANT", "ADMIN"]
+        for r in roles:
+            self._login_cache.delete((username_lower, r))
+
     async def login(self, request: LoginRequest) -> dict:
         """Login user - simple, no password validation"""
-        db = get_db()
-
         username = (request.username or "").strip()
+        username_lower = normalize_lookup_key(username)
         role = (request.role or "").strip().upper()
 
         print("LOGIN:", username, "ROLE:", role)
-        
+
+        cache_key = (username_lower, role)
+        cached = self._login_cache.get(cache_key)
+        if cached is not None:
+            return {"id": cached["id"], "username": username, "role": role, "restaurant_id": cached["restaurant_id"]}
+
+        db = get_db()
+
         # Check if user exists
-        user = await db.users.find_one({
-            "username": {"$regex": f"^{re.escape(username)}$", "$options": "i"},
-            "role": {"$regex": f"^{re.escape(role)}$", "$options": "i"},
-        })
-        
+        user = await db.users.find_one({"username_lower": username_lower, "role": role})
+
         if not user:
             # Create new user
             new_user = {
                 "username": username,
+                "username_lower": username_lower,
                 "role": role,
                 "restaurant_id": None,
                 "created_at": datetime.utcnow().isoformat(),
             }
             result = await db.users.insert_one(new_user)
             user = {"_id": result.inserted_id, **new_user}
-        else:
-            # Normalize stored values (helps prevent role-casing bugs)
-            updates = {}
-            if user.get("username") != username:
-                updates["username"] = username
-            if (user.get("role") or "").upper() != role:
-                updates["role"] = role
-            if updates:
-                await db.users.update_one({"_id": user["_id"]}, {"$set": updates})
-                user.update(updates)
+            self.invalidate(username, role)
+        elif user.get("username") != username:
+            # Keep the display casing the user last logged in with
+            await db.users.update_one({"_id": user["_id"]}, {"$set": {"username": username}})
+            user["username"] = username
+            self.invalidate(username, role)
 
         # For RESTAURANT users, find the restaurant where they are the owner
         restaurant_id = None
         if (user.get("role") or "").upper() == "RESTAURANT":
             # Query for existing restaurant with matching owner_username
-            restaurant = await db.restaurants.find_one({
-                "owner_username": {"$regex": f"^{re.escape(username)}$", "$options": "i"}
-            })
+            restaurant = await db.restaurants.find_one(
+                {"owner_username_lower": username_lower},
+                {"_id": 1},
+            )
             
             print("LOGIN RESTAURANT:", username, "FOUND:", restaurant)
             
@@ -72,6 +89,8 @@ class AuthService:
                     {"$set": {"restaurant_id": restaurant_id}},
                 )
 
+        self._login_cache.set(cache_key, {"id": str(user["_id"]), "restaurant_id": restaurant_id})
+
         return {
             "id": str(user["_id"]),
             "username": username,
@@ -0,0 +1,292 @@
+"""Batch drone dispatcher.
+
+Every few seconds the dispatcher collects all ``READY_FOR_PICKUP`` orders and,
+per restaurant, the ``AVAILABLE`` drones nearest its pickup point (``$geoNear``
+on the drones' ``location``), matches them per restaurant, and commits every
+assignment with bulk writes, instead of waiting for a restaurant to assign
+each order by hand.
+
+Commit protocol (a fixed number of round trips per batch, whatever its size):
+1. Claim the matched drones with one conditional ``bulk_write`` that stamps
+   them with the batch id.
+2. Read back which drones the batch actually claimed (``_id $in`` + batch id).
+3. Move the matching orders to ``DELIVERING`` with one conditional
+   ``bulk_write`` that writes the planned route and ETA.
+4. If some orders were taken elsewhere in the meantime, release their drones.
+
+If a step fails, every drone the batch claimed for an order that did not
+reach ``DELIVERING`` is released before the error propagates.
+
+Configuration (environment variables):
+- AUTO_DISPATCH_ENABLED: set to 0 to keep manual assignment only
+- DISPATCH_INTERVAL_SECONDS: batch interval (default 5)
+- DISPATCH_BATCH_SIZE: max orders considered per batch (default 500)
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from app.core.database import get_db
+from app.core.geo import haversine_m
+from app.services.drone_service import AVAILABLE_STATUSES, DroneService
+from app.services.fleet_simulator import fleet_simulator
+
+AUTO_DISPATCH_ENABLED = os.getenv("AUTO_DISPATCH_ENABLED", "1") != "0"
+DISPATCH_INTERVAL_SECONDS = float(os.getenv("DISPATCH_INTERVAL_SECONDS", "5"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "500"))
+
+
+def _coords(doc: Optional[dict], lat_key: str = "latitude", lon_key: str = "longitude") -> Optional[Tuple[float, float]]:
+    if doc and doc.get(lat_key) is not None and doc.get(lon_key) is not None:
+        return float(doc[lat_key]), float(doc[lon_key])
+    return None
+
+
+def match_nearest(orders: List[dict], drones: List[dict], pickup: Tuple[float, float]) -> List[Tuple[dict, dict]]:
+    """Pair one restaurant's orders with its drones.
+
+    Every order of a restaurant shares the same pickup point, so the cost of a
+    pairing depends only on the drone. Giving the oldest orders the drones
+    closest to the pickup point is then an optimal assignment, and needs no
+    general (e.g. Hungarian) matching.
+    """
+    ranked = sorted(drones, key=lambda d: haversine_m(_coords(d) or pickup, pickup))
+    oldest_first = sorted(orders, key=lambda o: o["_id"])
+    return list(zip(oldest_first, ranked))
+
+
+class DispatchService:
+    """Periodically auto-assign drones to ready orders in one batch"""
+
+    def __init__(self, drone_service: DroneService, interval: float = DISPATCH_INTERVAL_SECONDS):
+        self.drone_service = drone_service
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the dispatch loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                assigned = await self.dispatch_once()
+                if assigned:
+                    print(f"🚁 Dispatcher assigned {len(assigned)} orders")
+            except Exception as e:
+                print(f"⚠️  Dispatch batch failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def dispatch_once(self) -> List[Tuple[str, str]]:
+        """Run one batch; returns the committed (order_id, drone_id) pairs"""
+        db = get_db()
+
+        orders = await db.orders.find(
+            {"status": "READY_FOR_PICKUP"},
+            {"restaurant_id": 1, "delivery_lat": 1, "delivery_lon": 1, "drone_lat": 1, "drone_lon": 1},
+        ).sort("_id", 1).limit(DISPATCH_BATCH_SIZE).to_list(DISPATCH_BATCH_SIZE)
+        if not orders:
+            return []
+
+        restaurant_ids = sorted({str(o.get("restaurant_id")) for o in orders if o.get("restaurant_id")})
+        restaurant_oids = []
+        for rid in restaurant_ids:
+            try:
+                restaurant_oids.append(ObjectId(rid))
+            except (InvalidId, TypeError):
+                continue
+        restaurants = {
+            str(r["_id"]): r
+            for r in await db.restaurants.find(
+                {"_id": {"$in": restaurant_oids}}, {"latitude": 1, "longitude": 1}
+            ).to_list(None)
+        }
+
+        drones = await self._candidate_drones(orders, restaurant_ids, restaurants)
+        if not drones:
+            return []
+
+        pairs = self._match(orders, drones, restaurants)
+        if not pairs:
+            return []
+        return await self._commit(pairs, restaurants)
+
+    async def _candidate_drones(self, orders: List[dict], restaurant_ids: List[str], restaurants: Dict[str, dict]) -> List[dict]:
+        """Available drones to match, per restaurant.
+
+        Restaurants with coordinates get the drones nearest their pickup point,
+        one per waiting order (``$geoNear``); the others every available drone.
+        """
+        waiting: Dict[str, int] = {}
+        for order in orders:
+            rid = str(order.get("restaurant_id"))
+            waiting[rid] = waiting.get(rid, 0) + 1
+
+        located = [rid for rid in restaurant_ids if _coords(restaurants.get(rid))]
+        unlocated = [rid for rid in restaurant_ids if rid not in located]
+        batches = await asyncio.gather(*(
+            self.drone_service.nearest_available_drones(_coords(restaurants[rid]), rid, limit=waiting[rid])
+            for rid in located
+        ))
+        drones = [drone for batch in batches for drone in batch]
+        if unlocated:
+            drones += await get_db().drones.find(
+                {"restaurant_id": {"$in": unlocated}, "status": {"$in": AVAILABLE_STATUSES}},
+                {"name": 1, "restaurant_id": 1, "latitude": 1, "longitude": 1},
+            ).to_list(None)
+        return drones
+
+    def _match(self, orders: List[dict], drones: List[dict], restaurants: Dict[str, dict]) -> List[Tuple[dict, dict]]:
+        orders_by_restaurant: Dict[str, List[dict]] = {}
+        for order in orders:
+            orders_by_restaurant.setdefault(str(order.get("restaurant_id")), []).append(order)
+        drones_by_restaurant: Dict[str, List[dict]] = {}
+        for drone in drones:
+            drones_by_restaurant.setdefault(str(drone.get("restaurant_id")), []).append(drone)
+
+        pairs: List[Tuple[dict, dict]] = []
+        for rid, restaurant_orders in orders_by_restaurant.items():
+            restaurant_drones = drones_by_restaurant.get(rid)
+            if not restaurant_drones:
+                continue
+            pickup = _coords(restaurants.get(rid)) or _coords(restaurant_orders[0], "drone_lat", "drone_lon")
+            pairs.extend(match_nearest(restaurant_orders, restaurant_drones, pickup or (0.0, 0.0)))
+        return pairs
+
+    async def _commit(self, pairs: List[Tuple[dict, dict]], restaurants: Dict[str, dict]) -> List[Tuple[str, str]]:
+        db = get_db()
+        batch_id = ObjectId()
+
+        try:
+            # 1. Claim drones (only those still available).
+            await db.drones.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": drone["_id"], "status": {"$in": AVAILABLE_STATUSES}},
+                        {"$set": {"status": "BUSY", "dispatch_batch": batch_id, "current_order": order["_id"]}},
+                    )
+                    for order, drone in pairs
+                ],
+                ordered=False,
+            )
+
+            # 2. Which claims won?
+            claimed = {
+                d["_id"]
+                for d in await db.drones.find(
+                    {"_id": {"$in": [drone["_id"] for _, drone in pairs]}, "dispatch_batch": batch_id},
+                    {"_id": 1},
+                ).to_list(None)
+            }
+            pairs = [(order, drone) for order, drone in pairs if drone["_id"] in claimed]
+            if not pairs:
+                await self._clear_batch(batch_id)
+                return []
+
+            # 3. Start the deliveries (only orders still ready), with their routes.
+            now = datetime.utcnow()
+            routes = {}
+            order_ops = []
+            for order, drone in pairs:
+                start = (
+                    _coords(restaurants.get(str(order.get("restaurant_id"))))
+                    or _coords(drone)
+                    or _coords(order, "drone_lat", "drone_lon")
+                )
+                route = self.drone_service.plan_route(start, (float(order["delivery_lat"]), float(order["delivery_lon"])))
+                routes[order["_id"]] = route
+                order_ops.append(
+                    UpdateOne(
+                        {"_id": order["_id"], "status": "READY_FOR_PICKUP"},
+                        {
+                            "$set": {
+                                "status": "DELIVERING",
+                                "drone_id": str(drone["_id"]),
+                                "drone_name": drone.get("name", ""),
+                                "drone_lat": start[0],
+                                "drone_lon": start[1],
+                                "route": route,
+                                "eta": route["eta"],
+                                "dispatch_batch": batch_id,
+                                "updated_at": now.isoformat(),
+                            }
+                        },
+                    )
+                )
+            result = await db.orders.bulk_write(order_ops, ordered=False)
+
+            # 4. Release drones whose order was assigned elsewhere meanwhile.
+            if result.modified_count < len(order_ops):
+                started = {
+                    o["_id"]
+                    for o in await db.orders.find(
+                        {"_id": {"$in": [order["_id"] for order, _ in pairs]}, "dispatch_batch": batch_id},
+                        {"_id": 1},
+                    ).to_list(None)
+                }
+                lost = [(order, drone) for order, drone in pairs if order["_id"] not in started]
+                await db.drones.bulk_write(
+                    [
+                        UpdateOne(
+                            {"_id": drone["_id"], "dispatch_batch": batch_id},
+                            {"$set": {"status": "AVAILABLE"}, "$unset": {"dispatch_batch": "", "current_order": ""}},
+                        )
+                        for _, drone in lost
+                    ],
+                    ordered=False,
+                )
+                pairs = [(order, drone) for order, drone in pairs if order["_id"] in started]
+
+            await self._clear_batch(batch_id)
+        except Exception:
+            await self._rollback(batch_id)
+            raise
+
+        committed = []
+        for order, drone in pairs:
+            fleet_simulator.add(order["_id"], drone["_id"], routes[order["_id"]])
+            committed.append((str(order["_id"]), str(drone["_id"])))
+        return committed
+
+    async def _clear_batch(self, batch_id: ObjectId):
+        await get_db().drones.update_many({"dispatch_batch": batch_id}, {"$unset": {"dispatch_batch": ""}})
+
+    async def _rollback(self, batch_id: ObjectId):
+        """Free the drones a failed commit claimed for orders it did not start (best-effort)"""
+        db = get_db()
+        try:
+            started = [
+                ObjectId(o["drone_id"])
+                for o in await db.orders.find(
+                    {"dispatch_batch": batch_id, "status": "DELIVERING"}, {"drone_id": 1}
+                ).to_list(None)
+                if ObjectId.is_valid(o.get("drone_id"))
+            ]
+            await db.drones.update_many(
+                {"dispatch_batch": batch_id, "status": "BUSY", "_id": {"$nin": started}},
+                {"$set": {"status": "AVAILABLE"}, "$unset": {"dispatch_batch": "", "current_order": ""}},
+            )
+            await self._clear_batch(batch_id)
+            # Deliveries that did start still need their flights.
+            await fleet_simulator.recover()
+        except Exception as e:
+            print(f"⚠️  Could not roll back dispatch batch {batch_id}: {e}")
+
+
+# Global dispatcher
+dispatch_service = DispatchService(DroneService())
@@ -1,9 +1,16 @@
 """Drone management and fake movement service"""
 from app.core.database import get_db
+from app.core.pagination import DEFAULT_PAGE_LIMIT, paginate
+from app.core.geo import geo_point, plan_route
+from app.core.serialization import serialize_doc
+from app.services.fleet_simulator import DRONE_SPEED_MPS, drone_release, fleet_simulator
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+from pymongo import ReturnDocument
 from typing import Optional, List
-import asyncio
+
+AVAILABLE_STATUSES = ["AVAILABLE", "IDLE"]
 
 
 class DroneService:
@@ -13,15 +20,7 @@ class DroneService:
         if not drone:
             return drone
 
-        drone_id = drone.get("_id")
-        serialized = {k: v for k, v in drone.items() if k != "_id"}
-        if drone_id is not None:
-            serialized["id"] = str(drone_id)
-
-        # Ensure MongoDB ObjectId fields are JSON-serializable
-        restaurant_id = serialized.get("restaurant_id")
-        if isinstance(restaurant_id, ObjectId):
-            serialized["restaurant_id"] = str(restaurant_id)
+        serialized = serialize_doc(drone)
 
         # Backward-compat: older records may have status=IDLE
         if serialized.get("status") == "IDLE":
@@ -38,6 +37,7 @@ class DroneService:
             "status": "AVAILABLE",
             "latitude": 10.762622,
             "longitude": 106.660172,
+            "location": geo_point(10.762622, 106.660172),
             "created_at": datetime.utcnow().isoformat()
         }
         
@@ -57,19 +57,42 @@ class DroneService:
         
         return self._serialize_drone(drone)
 
-    async def get_restaurant_drones(self, restaurant_id: str) -> List[dict]:
-        """Get all drones for a restaurant"""
+    async def get_restaurant_drones(
+        self,
+        restaurant_id: str,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+    ) -> dict:
+        """Get one page of a restaurant's drones"""
         db = get_db()
-        drones = await db.drones.find({"restaurant_id": restaurant_id}).to_list(None)
-        
-        return [self._serialize_drone(drone) for drone in drones]
+        return await paginate(
+            db.drones,
+            {"restaurant_id": restaurant_id},
+            serialize=self._serialize_drone,
+            limit=limit,
+            cursor=cursor,
+            newest_first=False,
+            include_total=include_total,
+        )
 
-    async def get_all_drones(self) -> List[dict]:
-        """Get all drones (ADMIN)"""
+    async def get_all_drones(
+        self,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+    ) -> dict:
+        """Get one page of all drones (ADMIN)"""
         db = get_db()
-        drones = await db.drones.find().to_list(None)
-        
-        return [self._serialize_drone(drone) for drone in drones]
+        return await paginate(
+            db.drones,
+            {},
+            serialize=self._serialize_drone,
+            limit=limit,
+            cursor=cursor,
+            newest_first=False,
+            include_total=include_total,
+        )
 
     async def update_drone_status(self, drone_id: str, status: str) -> dict:
         """Update drone status"""
@@ -82,47 +105,114 @@ class DroneService:
         
         return await self.get_drone(drone_id)
 
-    async def simulate_drone_movement(self, order_id: str, drone_id: str):
-        """Simulate fake drone movement for delivery"""
+    async def get_available_drones(self, restaurant_id: str, projection: Optional[dict] = None) -> List[dict]:
+        """Drones assigned to a restaurant that are free to take an order"""
         db = get_db()
-        
-        # Simulate 20 steps of movement
-        for step in range(20):
-            # Get current order
-            order = await db.orders.find_one({"_id": ObjectId(order_id)})
-            if not order or order.get("status") != "DELIVERING":
-                break
-            
-            # Update drone position
-            new_lat = order["drone_lat"] + 0.0005
-            new_lon = order["drone_lon"] + 0.0005
-            
+        drones = await db.drones.find(
+            {"restaurant_id": restaurant_id, "status": {"$in": AVAILABLE_STATUSES}},
+            projection,
+        ).to_list(None)
+        return [self._serialize_drone(d) for d in drones]
+
+    async def nearest_available_drones(
+        self,
+        point: tuple,
+        restaurant_id: str | None = None,
+        limit: int = 1,
+        max_distance_m: float | None = None,
+    ) -> List[dict]:
+        """Available drones closest to ``point`` (lat, lon), nearest first, each with ``distance_m``.
+
+        Drones without a ``location`` are not considered.
+        """
+        db = get_db()
+        query = {"status": {"$in": AVAILABLE_STATUSES}}
+        if restaurant_id is not None:
+            query["restaurant_id"] = restaurant_id
+        geo_near = {"near": geo_point(*point), "distanceField": "distance_m", "spherical": True, "query": query}
+        if max_distance_m is not None:
+            geo_near["maxDistance"] = max_distance_m
+        return await db.drones.aggregate([{"$geoNear": geo_near}, {"$limit": limit}]).to_list(limit)
+
+    async def claim_drone(self, drone_id: ObjectId, order_id: Optional[ObjectId] = None) -> Optional[dict]:
+        """Atomically reserve an available drone (-> BUSY) for ``order_id``; None if it is missing or taken"""
+        db = get_db()
+        return await db.drones.find_one_and_update(
+            {"_id": drone_id, "status": {"$in": AVAILABLE_STATUSES}},
+            {"$set": {"status": "BUSY", "current_order": order_id}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def release_drone(self, drone_id: ObjectId, order_id: Optional[ObjectId] = None, **changes) -> bool:
+        """Make a drone BUSY with ``order_id`` AVAILABLE again.
+
+        No-op if something else already freed it or it was claimed for another
+        order since; same conditional release as the fleet simulator's.
+        """
+        db = get_db()
+        result = await db.drones.update_one(*drone_release(drone_id, order_id, **changes))
+        return result.modified_count == 1
+
+    def plan_route(self, start: tuple, end: tuple) -> dict:
+        """Great-circle route from start to end at the configured drone speed.
+
+        Step count follows from distance, speed and the fleet tick rate; the
+        returned dict also carries `departed_at` and the precomputed `eta`.
+        """
+        return plan_route(start, end, speed_mps=DRONE_SPEED_MPS, tick_seconds=fleet_simulator.tick_seconds)
+
+    async def _departure_point(self, order: dict, drone_id: str | None) -> tuple:
+        """Where the drone takes off: the restaurant if it has coordinates, else the drone itself"""
+        db = get_db()
+
+        try:
+            restaurant = await db.restaurants.find_one(
+                {"_id": ObjectId(order.get("restaurant_id"))},
+                {"latitude": 1, "longitude": 1},
+            )
+        except (InvalidId, TypeError):
+            restaurant = None
+        if restaurant and restaurant.get("latitude") is not None and restaurant.get("longitude") is not None:
+            return float(restaurant["latitude"]), float(restaurant["longitude"])
+
+        try:
+            drone = await db.drones.find_one({"_id": ObjectId(drone_id)}, {"latitude": 1, "longitude": 1})
+        except (InvalidId, TypeError):
+            drone = None
+        if drone and drone.get("latitude") is not None and drone.get("longitude") is not None:
+            return float(drone["latitude"]), float(drone["longitude"])
+
+        return float(order["drone_lat"]), float(order["drone_lon"])
+
+    async def simulate_drone_movement(self, order_id: str, drone_id: str, order: Optional[dict] = None):
+        """Plan the delivery route, store it (with ETA) on the order and hand it to the fleet simulator.
+
+        Pass the DELIVERING order document when the caller already has it to
+        skip re-reading it.
+        """
+        db = get_db()
+        oid = ObjectId(order_id)
+
+        if order is None:
+            order = await db.orders.find_one({"_id": oid, "status": "DELIVERING"})
+        if not order or order.get("status") != "DELIVERING":
+            return
+
+        route = order.get("route")
+        if not route:
+            start = await self._departure_point(order, drone_id)
+            route = self.plan_route(start, (float(order["delivery_lat"]), float(order["delivery_lon"])))
             await db.orders.update_one(
-                {"_id": ObjectId(order_id)},
+                {"_id": oid, "status": "DELIVERING"},
                 {
                     "$set": {
-                        "drone_lat": new_lat,
-                        "drone_lon": new_lon,
-                        "updated_at": datetime.utcnow().isoformat()
+                        "route": route,
+                        "eta": route["eta"],
+                        "drone_lat": start[0],
+                        "drone_lon": start[1],
+                        "updated_at": datetime.utcnow().isoformat(),
                     }
-                }
+                },
             )
-            
-            await asyncio.sleep(2)  # Move every 2 seconds
-        
-        # Mark order as completed
-        await db.orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {
-                "$set": {
-                    "status": "COMPLETED",
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-            }
-        )
-        
-        # Mark drone as idle
-        await db.drones.update_one(
-            {"_id": ObjectId(drone_id)},
-            {"$set": {"status": "AVAILABLE"}}
-        )
+
+        fleet_simulator.add(oid, drone_id, route)
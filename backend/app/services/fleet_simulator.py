@@ -0,0 +1,243 @@
+"""Central drone fleet simulator.
+
+One ticker advances every in-flight delivery per tick, instead of one
+background task (and two round trips) per delivery every 2 seconds. Positions
+go to the telemetry buffer (see ``TelemetryService``), which flushes them in
+batches; the ticker itself only writes completed deliveries, with a single
+``bulk_write``. In-flight deliveries are kept in memory; on startup and then
+every FLEET_RECOVER_SECONDS the ticker enrolls every ``DELIVERING`` order it
+is not flying yet, so deliveries survive restarts and deliveries started on
+workers without the simulator are flown too.
+
+Drones fly the great-circle route planned when the delivery starts (see
+``DroneService.simulate_drone_movement``); the route, step count and ETA are
+stored on the order so a restarted ticker resumes at the right position.
+
+Configuration (environment variables):
+- FLEET_SIMULATOR_ENABLED: set to 0 to disable (e.g. on all but one worker)
+- FLEET_TICK_SECONDS: tick interval (default 2)
+- FLEET_RECOVER_SECONDS: interval of the scan for untracked deliveries (default 10)
+- DRONE_SPEED_MPS: cruise speed used to plan routes (default 15)
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from app.core.database import get_db
+from app.core.geo import geo_point, interpolate, plan_route
+from app.services.telemetry_service import telemetry_service
+
+FLEET_SIMULATOR_ENABLED = os.getenv("FLEET_SIMULATOR_ENABLED", "1") != "0"
+FLEET_TICK_SECONDS = float(os.getenv("FLEET_TICK_SECONDS", "2"))
+FLEET_RECOVER_SECONDS = float(os.getenv("FLEET_RECOVER_SECONDS", "10"))
+DRONE_SPEED_MPS = float(os.getenv("DRONE_SPEED_MPS", "15"))
+
+_FLIGHT_PROJECTION = {"drone_id": 1, "drone_lat": 1, "drone_lon": 1, "delivery_lat": 1, "delivery_lon": 1, "route": 1}
+
+
+def drone_release(drone_id: ObjectId, order_id: Optional[ObjectId] = None, **changes) -> Tuple[dict, dict]:
+    """Filter and update that free a drone only while it is still BUSY with ``order_id``.
+
+    The one conditional release shared by DroneService.release_drone and the
+    simulator. A drone freed elsewhere (e.g. by /orders/{id}/complete) and
+    claimed for another order meanwhile carries that order in
+    ``current_order``, so it is left alone. Drones claimed before
+    ``current_order`` existed have none.
+    """
+    query = {"_id": drone_id, "status": "BUSY"}
+    if order_id is not None:
+        query["current_order"] = {"$in": [order_id, None]}
+    return query, {"$set": {"status": "AVAILABLE", **changes}, "$unset": {"current_order": "", "dispatch_batch": ""}}
+
+
+def _to_object_id(value) -> Optional[ObjectId]:
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+class Flight:
+    """An in-flight delivery following a planned route"""
+
+    __slots__ = ("order_id", "drone_id", "start", "end", "steps", "step")
+
+    def __init__(self, order_id: ObjectId, drone_id: Optional[ObjectId], route: dict, step: int = 0):
+        self.order_id = order_id
+        self.drone_id = drone_id
+        self.start = (route["start_lat"], route["start_lon"])
+        self.end = (route["end_lat"], route["end_lon"])
+        self.steps = int(route["steps"])
+        self.step = step
+
+    @property
+    def position(self):
+        return interpolate(self.start, self.end, self.step / self.steps)
+
+
+class FleetSimulator:
+    """Advance every in-flight delivery from one shared ticker"""
+
+    def __init__(self, tick_seconds: float = FLEET_TICK_SECONDS, recover_seconds: float = FLEET_RECOVER_SECONDS):
+        self.tick_seconds = tick_seconds
+        self.recover_seconds = recover_seconds
+        self.flights: Dict[ObjectId, Flight] = {}
+        # Orders whose route cannot be flown; not re-enrolled by ``recover``.
+        self._broken: Set[ObjectId] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the ticker (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the ticker; in-flight deliveries resume from the DB on next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flights.clear()
+
+    def add(self, order_id, drone_id, route: dict):
+        """Fly a DELIVERING order along ``route``, resuming from its departure time"""
+        oid = _to_object_id(order_id)
+        if oid is None or oid in self.flights:
+            return
+
+        departed_at = datetime.fromisoformat(route["departed_at"])
+        tick_seconds = float(route.get("tick_seconds") or self.tick_seconds)
+        elapsed_steps = int((datetime.utcnow() - departed_at).total_seconds() // tick_seconds)
+        step = max(0, min(int(route["steps"]) - 1, elapsed_steps))
+        self.flights[oid] = Flight(oid, _to_object_id(drone_id), route, step)
+
+    def _legacy_route(self, order: dict) -> dict:
+        """Route for a DELIVERING order that started before routes were stored"""
+        return plan_route(
+            (float(order.get("drone_lat") or 0.0), float(order.get("drone_lon") or 0.0)),
+            (float(order.get("delivery_lat") or 0.0), float(order.get("delivery_lon") or 0.0)),
+            speed_mps=DRONE_SPEED_MPS,
+            tick_seconds=self.tick_seconds,
+        )
+
+    async def recover(self) -> int:
+        """Enroll every DELIVERING order not flown yet (after a restart, or started by another worker)"""
+        cursor = get_db().orders.find(
+            {"status": "DELIVERING", "_id": {"$nin": [*self.flights, *self._broken]}},
+            _FLIGHT_PROJECTION,
+        )
+        recovered = 0
+        async for order in cursor:
+            try:
+                self.add(order["_id"], order.get("drone_id"), order.get("route") or self._legacy_route(order))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"⚠️  Skipping delivery {order['_id']} with a malformed route: {e!r}")
+                self._broken.add(order["_id"])
+                continue
+            recovered += 1
+        return recovered
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_recover = loop.time()
+        while True:
+            if loop.time() >= next_recover:
+                # Retried until it succeeds, then repeated to pick up other workers' deliveries.
+                try:
+                    recovered = await self.recover()
+                    if recovered:
+                        print(f"🚁 Fleet simulator enrolled {recovered} deliveries")
+                    next_recover = loop.time() + self.recover_seconds
+                except Exception as e:
+                    print(f"⚠️  Fleet simulator could not enroll deliveries: {e}")
+            try:
+                await self.tick()
+            except Exception as e:
+                print(f"⚠️  Fleet tick failed: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def tick(self):
+        """Advance every flight one step; record positions and persist completions"""
+        if not self.flights:
+            return
+
+        db = get_db()
+        now = datetime.utcnow()
+        order_ops: List[UpdateOne] = []
+        drone_ops: List[UpdateOne] = []
+        finished: List[ObjectId] = []
+
+        for flight in list(self.flights.values()):
+            flight.step += 1
+            try:
+                lat, lon = flight.position
+            except Exception as e:
+                # A bad route must not stall every other delivery.
+                print(f"⚠️  Dropping flight of order {flight.order_id}: {e!r}")
+                self.flights.pop(flight.order_id, None)
+                self._broken.add(flight.order_id)
+                continue
+            telemetry_service.record(flight.order_id, flight.drone_id, lat, lon, now)
+            if flight.step < flight.steps:
+                continue
+
+            finished.append(flight.order_id)
+            # Only complete orders that are still out for delivery.
+            order_ops.append(
+                UpdateOne(
+                    {"_id": flight.order_id, "status": "DELIVERING"},
+                    {"$set": {"drone_lat": lat, "drone_lon": lon, "status": "COMPLETED", "updated_at": now.isoformat()}},
+                )
+            )
+            if flight.drone_id is not None:
+                # The drone waits where it delivered until its next flight.
+                drone_ops.append(
+                    UpdateOne(*drone_release(
+                        flight.drone_id,
+                        flight.order_id,
+                        latitude=lat,
+                        longitude=lon,
+                        location=geo_point(lat, lon),
+                    ))
+                )
+
+        if order_ops:
+            await db.orders.bulk_write(order_ops, ordered=False)
+        for order_id in finished:
+            self.flights.pop(order_id, None)
+
+        # Some orders may have left DELIVERING elsewhere (e.g. completed by the client).
+        drone_ops.extend(await self._drop_stale_flights())
+
+        if drone_ops:
+            await db.drones.bulk_write(drone_ops, ordered=False)
+
+    async def _drop_stale_flights(self) -> List[UpdateOne]:
+        """Forget flights whose order is no longer DELIVERING; return drone releases"""
+        if not self.flights:
+            return []
+        stale = await get_db().orders.find(
+            {"_id": {"$in": list(self.flights)}, "status": {"$ne": "DELIVERING"}},
+            {"_id": 1},
+        ).to_list(None)
+
+        releases = []
+        for doc in stale:
+            flight = self.flights.pop(doc["_id"], None)
+            if flight and flight.drone_id is not None:
+                releases.append(UpdateOne(*drone_release(flight.drone_id, flight.order_id)))
+        return releases
+
+
+# Global fleet simulator
+fleet_simulator = FleetSimulator()
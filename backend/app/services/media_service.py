@@ -0,0 +1,202 @@
+"""Image upload pipeline for menu item and restaurant images.
+
+An upload is first copied to a local spool file while it is hashed (SHA-256),
+then stored under its content hash:
+
+- an image that was stored before is not uploaded again: its URL comes from
+  an in-process cache or the ``media`` collection (``_id`` = hash);
+- concurrent uploads of the same image share one upload;
+- uploads run on a dedicated, bounded thread pool instead of Starlette's
+  request threadpool.
+
+Where images go is up to the storage backend (app.core.storage, MEDIA_STORAGE).
+
+Routes either wait for ``store`` or answer 202 right away and let
+``store_for_document`` fill in the document's ``image_url`` (``image_status``
+goes ``PENDING`` -> ``READY`` / ``FAILED``).
+
+Configuration (environment variables):
+- MEDIA_UPLOAD_CONCURRENCY: uploads in flight at once (default 4)
+- MEDIA_MAX_BYTES: largest accepted image (default 10 MiB)
+- MEDIA_SPOOL_MEMORY_BYTES: spooled bytes kept in memory before using disk (default 1 MiB)
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.database import get_db
+from app.core.storage import StorageBackend, build_storage
+
+MEDIA_UPLOAD_CONCURRENCY = int(os.getenv("MEDIA_UPLOAD_CONCURRENCY", "4"))
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(10 * 1024 * 1024)))
+MEDIA_SPOOL_MEMORY_BYTES = int(os.getenv("MEDIA_SPOOL_MEMORY_BYTES", str(1024 * 1024)))
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLargeError(ValueError):
+    pass
+
+
+class SpooledImage:
+    """A request's image, copied out of the request and hashed"""
+
+    __slots__ = ("file", "sha256", "size", "filename", "content_type")
+
+    def __init__(self, file, sha256: str, size: int, filename: str, content_type: Optional[str]):
+        self.file = file
+        self.sha256 = sha256
+        self.size = size
+        self.filename = filename
+        self.content_type = content_type
+
+    def close(self):
+        self.file.close()
+
+
+def _spool_sync(source, max_bytes: int):
+    try:
+        source.seek(0)
+    except Exception:
+        pass
+    digest = hashlib.sha256()
+    spool = tempfile.SpooledTemporaryFile(max_size=MEDIA_SPOOL_MEMORY_BYTES)
+    size = 0
+    try:
+        while True:
+            chunk = source.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageTooLargeError(f"image is larger than {max_bytes} bytes")
+            digest.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+
+class MediaService:
+    """Hash, deduplicate and upload images on a bounded executor"""
+
+    def __init__(self, storage: Optional[StorageBackend] = None, max_workers: int = MEDIA_UPLOAD_CONCURRENCY):
+        self.storage = storage or build_storage()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media-upload")
+        # sha256 -> URL of images known to be stored
+        self._known = TTLCache(maxsize=4096, ttl=24 * 3600)
+        # sha256 -> upload in progress, shared by concurrent requests
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def check_configured(self):
+        """Raise StorageNotConfiguredError before accepting an upload that could not be stored"""
+        self.storage.check_configured()
+
+    async def spool(self, upload, max_bytes: int = MEDIA_MAX_BYTES) -> SpooledImage:
+        """Copy an UploadFile out of the request, hashing it on the way.
+
+        Raises:
+            ImageTooLargeError: if it is larger than ``max_bytes``.
+        """
+        spool, sha256, size = await run_in_threadpool(_spool_sync, upload.file, max_bytes)
+        return SpooledImage(spool, sha256, size, upload.filename or "", upload.content_type)
+
+    async def store(self, image: SpooledImage, folder: str) -> str:
+        """URL of ``image``, uploading it only if that content was never stored.
+
+        Consumes (closes) the spool file. Raises StorageNotConfiguredError,
+        or whatever the storage backend raises on failure.
+        """
+        url = self._known.get(image.sha256)
+        task = self._inflight.get(image.sha256)
+        if url or task is not None:
+            image.close()
+            if url:
+                return url
+        else:
+            # The upload owns the spool file, so it survives the caller going away.
+            task = asyncio.ensure_future(self._store_new(image, folder))
+            self._inflight[image.sha256] = task
+            task.add_done_callback(lambda _: self._inflight.pop(image.sha256, None))
+        return await asyncio.shield(task)
+
+    async def _store_new(self, image: SpooledImage, folder: str) -> str:
+        db = get_db()
+        try:
+            known = await db.media.find_one({"_id": image.sha256, "backend": self.storage.name}, {"url": 1})
+            if known:
+                url = known["url"]
+            else:
+                loop = asyncio.get_running_loop()
+                url = await loop.run_in_executor(
+                    self._executor,
+                    lambda: self.storage.save(
+                        image.file, key=image.sha256, folder=folder, content_type=image.content_type
+                    ),
+                )
+                await db.media.update_one(
+                    {"_id": image.sha256},
+                    {
+                        "$set": {"url": url, "backend": self.storage.name},
+                        "$setOnInsert": {
+                            "folder": folder,
+                            "size": image.size,
+                            "content_type": image.content_type,
+                            "created_at": datetime.utcnow(),
+                        },
+                    },
+                    upsert=True,
+                )
+        finally:
+            image.close()
+        self._known.set(image.sha256, url)
+        return url
+
+    async def store_for_document(
+        self,
+        image: SpooledImage,
+        folder: str,
+        collection: str,
+        doc_id: Any,
+        on_stored: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+    ):
+        """Background upload: store ``image`` and set the document's ``image_url``.
+
+        ``on_stored`` gets the updated document (e.g. to invalidate caches).
+        A document whose ``image_url`` was set meanwhile is left alone.
+        """
+        db = get_db()
+        try:
+            url = await self.store(image, folder)
+        except Exception as e:
+            print(f"⚠️  Image upload for {collection}/{doc_id} failed: {e}")
+            await db[collection].update_one(
+                {"_id": doc_id, "image_status": "PENDING"},
+                {"$set": {"image_status": "FAILED", "image_error": str(e)}},
+            )
+            return
+
+        updated = await db[collection].find_one_and_update(
+            {"_id": doc_id, "image_url": None},
+            {"$set": {"image_url": url, "image_status": "READY"}, "$unset": {"image_error": ""}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is not None and on_stored is not None:
+            await on_stored(updated)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+# Global upload pipeline
+media_service = MediaService()
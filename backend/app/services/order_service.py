@@ -1,22 +1,52 @@
 """Order management service"""
 from app.core.database import get_db
+from app.core.pagination import DEFAULT_PAGE_LIMIT, paginate
+from app.core.serialization import serialize_doc
 from app.models.order import Order, OrderItem
+from app.services.order_state import ORDER_STATUSES, OrderTransitionError, transition_order
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional
 
+# Statuses a restaurant may set through update_order_status
+RESTAURANT_STATUSES = ("PREPARING", "READY_FOR_PICKUP")
+
+# Orders a restaurant still has to act on (or watch being delivered)
+ACTIVE_ORDER_STATUSES = [status for status in ORDER_STATUSES if status != "COMPLETED"]
+
+# Default projection of order list pages: a summary row with the item count
+# instead of the items themselves (``fields=*`` returns whole orders).
+ORDER_LIST_PROJECTION = {
+    "status": 1,
+    "total": 1,
+    "customer_id": 1,
+    "restaurant_id": 1,
+    "drone_id": 1,
+    "drone_name": 1,
+    "delivery_address": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "item_count": {"$size": {"$ifNull": ["$items", []]}},
+}
+
 
 class OrderService:
     """Service for order operations"""
 
     @staticmethod
     def _serialize_order(doc: dict) -> dict:
-        out = dict(doc)
-        if "_id" in out:
-            out["id"] = str(out.pop("_id"))
-        return out
+        return serialize_doc(doc)
 
-    async def create_order(self, customer_id: str, restaurant_id: str, items: List[OrderItem], total: float, delivery_address: str) -> dict:
+    async def create_order(
+        self,
+        customer_id: str,
+        restaurant_id: str,
+        items: List[OrderItem],
+        total: float,
+        delivery_address: str,
+        delivery_lat: Optional[float] = None,
+        delivery_lon: Optional[float] = None,
+    ) -> dict:
         """Create a new order"""
         db = get_db()
 
@@ -36,8 +66,8 @@ class OrderService:
             "total": total,
             "delivery_address": delivery_address,
             "status": "PENDING",
-            "delivery_lat": 10.762622,
-            "delivery_lon": 106.660172,
+            "delivery_lat": delivery_lat if delivery_lat is not None else 10.762622,
+            "delivery_lon": delivery_lon if delivery_lon is not None else 106.660172,
             "drone_lat": 10.762622,
             "drone_lon": 106.660172,
             "created_at": datetime.utcnow().isoformat(),
@@ -60,35 +90,87 @@ class OrderService:
         
         return self._serialize_order(order)
 
-    async def get_customer_orders(self, customer_id: str) -> List[dict]:
-        """Get all orders for a customer"""
+    async def get_customer_orders(
+        self,
+        customer_id: str,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        projection: Optional[dict] = ORDER_LIST_PROJECTION,
+    ) -> dict:
+        """Get one page of a customer's orders (newest first)"""
         db = get_db()
-        orders = await db.orders.find({"customer_id": customer_id}).to_list(None)
-        
-        return [self._serialize_order(order) for order in orders]
+        return await paginate(
+            db.orders,
+            {"customer_id": customer_id},
+            serialize=self._serialize_order,
+            raw_batches=True,
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+            include_total=include_total,
+        )
 
-    async def get_restaurant_orders(self, restaurant_id: str) -> List[dict]:
-        """Get all orders for a restaurant"""
+    async def get_restaurant_orders(
+        self,
+        restaurant_id: str,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        projection: Optional[dict] = ORDER_LIST_PROJECTION,
+    ) -> dict:
+        """Get one page of a restaurant's orders (newest first)"""
         db = get_db()
-        orders = await db.orders.find({"restaurant_id": restaurant_id}).to_list(None)
-        
-        return [self._serialize_order(order) for order in orders]
+        return await paginate(
+            db.orders,
+            {"restaurant_id": restaurant_id},
+            serialize=self._serialize_order,
+            raw_batches=True,
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+            include_total=include_total,
+        )
 
-    async def update_order_status(self, order_id: str, status: str) -> dict:
-        """Update order status"""
+    async def get_active_orders(
+        self,
+        restaurant_id: str,
+        since: Optional[str] = None,
+        projection: Optional[dict] = ORDER_LIST_PROJECTION,
+    ) -> List[dict]:
+        """A restaurant's active orders, most recently updated first.
+
+        With ``since`` (an ``updated_at`` watermark) returns every order updated
+        after it instead, completed ones included so clients can drop them.
+        """
         db = get_db()
-        
-        await db.orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {
-                "$set": {
-                    "status": status,
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-            }
-        )
-        
-        return await self.get_order(order_id)
+        query = {"restaurant_id": restaurant_id}
+        if since:
+            query["updated_at"] = {"$gt": since}
+        else:
+            query["status"] = {"$in": ACTIVE_ORDER_STATUSES}
+        docs = await db.orders.find(query, projection).sort("updated_at", -1).to_list(None)
+        return [self._serialize_order(doc) for doc in docs]
+
+    async def update_order_status(self, order_id: str, status: str) -> dict:
+        """Move an order one step through the kitchen (PREPARING / READY_FOR_PICKUP).
+
+        Repeating the transition the order already made is a no-op. DELIVERING
+        and COMPLETED have their own routes, which also manage the drone.
+
+        Raises:
+            OrderTransitionError: if the order is missing or not in the right state.
+            ValueError: for any other target status.
+        """
+        if status not in RESTAURANT_STATUSES:
+            raise ValueError(f"Status {status} cannot be set directly")
+        try:
+            order = await transition_order(order_id, status)
+        except OrderTransitionError as e:
+            if e.current != status:
+                raise
+            order = e.order
+        return self._serialize_order(order)
 
     async def assign_drone(self, order_id: str, drone_id: str) -> dict:
         """Assign drone to order"""
@@ -106,9 +188,22 @@ class OrderService:
         
         return await self.get_order(order_id)
 
-    async def get_all_orders(self) -> List[dict]:
-        """Get all orders (ADMIN)"""
+    async def get_all_orders(
+        self,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        cursor: Optional[str] = None,
+        include_total: bool = False,
+        projection: Optional[dict] = ORDER_LIST_PROJECTION,
+    ) -> dict:
+        """Get one page of all orders, newest first (ADMIN)"""
         db = get_db()
-        orders = await db.orders.find().to_list(None)
-        
-        return [self._serialize_order(order) for order in orders]
+        return await paginate(
+            db.orders,
+            {},
+            serialize=self._serialize_order,
+            raw_batches=True,
+            limit=limit,
+            cursor=cursor,
+            projection=projection,
+            include_total=include_total,
+        )
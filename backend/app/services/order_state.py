@@ -0,0 +1,96 @@
+"""Order status state machine.
+
+PENDING -> PREPARING -> READY_FOR_PICKUP -> DELIVERING -> COMPLETED
+
+Every transition is a single conditional ``find_one_and_update`` that only
+matches when the order is in an allowed source state, so concurrent clicks
+cannot both win and the caller gets the updated order back in the same round
+trip. The current state is only read back when a transition is refused, to
+build the error.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.core.database import get_db
+
+ORDER_STATUSES: List[str] = ["PENDING", "PREPARING", "READY_FOR_PICKUP", "DELIVERING", "COMPLETED"]
+
+# target status -> statuses it may be entered from
+TRANSITIONS: Dict[str, List[str]] = {
+    "PREPARING": ["PENDING"],
+    "READY_FOR_PICKUP": ["PREPARING"],
+    "DELIVERING": ["READY_FOR_PICKUP"],
+    "COMPLETED": ["DELIVERING"],
+}
+
+
+class OrderTransitionError(RuntimeError):
+    """A transition was refused.
+
+    ``current`` is the order's status at the time (None if the order does not
+    exist) and ``order`` the current document, so callers can treat a repeat of
+    an already-applied transition as a no-op.
+    """
+
+    def __init__(self, order_id: str, target: str, current: Optional[str], order: Optional[dict] = None, reason: str | None = None):
+        self.order_id = order_id
+        self.target = target
+        self.current = current
+        self.order = order
+        if reason:
+            message = reason
+        elif current is None:
+            message = "Order not found"
+        else:
+            message = f"Cannot move order from {current} to {target}"
+        super().__init__(message)
+
+    @property
+    def not_found(self) -> bool:
+        return self.current is None
+
+
+def allowed_sources(target: str) -> List[str]:
+    if target not in TRANSITIONS:
+        raise ValueError(f"Unknown order status: {target}")
+    return TRANSITIONS[target]
+
+
+async def transition_order(
+    order_id: str | ObjectId,
+    target: str,
+    *,
+    extra_set: Optional[Dict[str, Any]] = None,
+    extra_filter: Optional[Dict[str, Any]] = None,
+) -> dict:
+    """Atomically move an order to ``target`` and return the updated document.
+
+    ``extra_filter`` adds conditions (e.g. the owning restaurant) and
+    ``extra_set`` fields to write together with the status.
+
+    Raises:
+        OrderTransitionError: if the order is missing or not in a source state.
+        ValueError: if ``target`` is not a known status.
+    """
+    db = get_db()
+    oid = order_id if isinstance(order_id, ObjectId) else ObjectId(order_id)
+
+    doc = await db.orders.find_one_and_update(
+        {"_id": oid, "status": {"$in": allowed_sources(target)}, **(extra_filter or {})},
+        {"$set": {"status": target, "updated_at": datetime.utcnow().isoformat(), **(extra_set or {})}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is not None:
+        return doc
+
+    current = await db.orders.find_one({"_id": oid})
+    if current is None:
+        raise OrderTransitionError(str(oid), target, None)
+    status = current.get("status")
+    reason = None
+    if status in allowed_sources(target) and extra_filter:
+        reason = f"Order does not match the required conditions for {target}"
+    raise OrderTransitionError(str(oid), target, status, current, reason)
@@ -0,0 +1,170 @@
+"""Admin overview: system-wide counts and summaries in one request.
+
+Each collection is summarised by a single ``$facet`` aggregation, so the
+server sends counts and a few recent rows instead of whole collections:
+
+- orders: counts and revenue by status, the most recent orders, and
+  per-restaurant order counts / revenue
+- drones: counts by status and per-restaurant fleet size / availability
+- users: counts by role
+
+The three aggregations run concurrently. Detail lists stay on the paginated
+``/admin/*`` endpoints.
+
+Configuration (environment variables):
+- OVERVIEW_RECENT_ORDERS: recent orders included (default 10)
+- OVERVIEW_RESTAURANTS: restaurants summarised, busiest first (default 50)
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from app.core.database import get_db
+from app.core.serialization import serialize_doc
+from app.services.order_service import ORDER_LIST_PROJECTION
+
+OVERVIEW_RECENT_ORDERS = int(os.getenv("OVERVIEW_RECENT_ORDERS", "10"))
+OVERVIEW_RESTAURANTS = int(os.getenv("OVERVIEW_RESTAURANTS", "50"))
+
+_ORDER_DONE = "COMPLETED"
+_DRONE_BUSY = "BUSY"
+# Legacy drone status shown as AVAILABLE (see DroneService._serialize_drone).
+_DRONE_STATUS_ALIASES = {"IDLE": "AVAILABLE"}
+
+
+def _counts(rows: List[dict], aliases: Dict[str, str] | None = None) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for row in rows:
+        key = row["_id"] or "UNKNOWN"
+        key = (aliases or {}).get(key, key)
+        counts[key] = counts.get(key, 0) + row["count"]
+    return counts
+
+
+class OverviewService:
+    """Service for the aggregated admin overview"""
+
+    async def _orders(self) -> dict:
+        pipeline = [
+            {
+                "$facet": {
+                    "by_status": [
+                        {"$group": {"_id": "$status", "count": {"$sum": 1}, "revenue": {"$sum": {"$ifNull": ["$total", 0]}}}},
+                    ],
+                    "recent": [
+                        {"$sort": {"_id": -1}},
+                        {"$limit": OVERVIEW_RECENT_ORDERS},
+                        {"$project": ORDER_LIST_PROJECTION},
+                    ],
+                    "by_restaurant": [
+                        {
+                            "$group": {
+                                "_id": "$restaurant_id",
+                                "orders": {"$sum": 1},
+                                "active_orders": {"$sum": {"$cond": [{"$ne": ["$status", _ORDER_DONE]}, 1, 0]}},
+                                "revenue": {"$sum": {"$ifNull": ["$total", 0]}},
+                            }
+                        },
+                        {"$sort": {"orders": -1}},
+                        {"$limit": OVERVIEW_RESTAURANTS},
+                    ],
+                }
+            }
+        ]
+        return (await get_db().orders.aggregate(pipeline).to_list(1))[0]
+
+    async def _drones(self) -> dict:
+        pipeline = [
+            {
+                "$facet": {
+                    "by_status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+                    "by_restaurant": [
+                        {
+                            "$group": {
+                                "_id": "$restaurant_id",
+                                "drones": {"$sum": 1},
+                                "busy_drones": {"$sum": {"$cond": [{"$eq": ["$status", _DRONE_BUSY]}, 1, 0]}},
+                            }
+                        },
+                    ],
+                }
+            }
+        ]
+        return (await get_db().drones.aggregate(pipeline).to_list(1))[0]
+
+    async def _users(self) -> dict:
+        pipeline = [{"$facet": {"by_role": [{"$group": {"_id": "$role", "count": {"$sum": 1}}}]}}]
+        return (await get_db().users.aggregate(pipeline).to_list(1))[0]
+
+    async def _restaurant_names(self, restaurant_ids: List[str]) -> Dict[str, dict]:
+        oids = []
+        for rid in restaurant_ids:
+            try:
+                oids.append(ObjectId(rid))
+            except (InvalidId, TypeError):
+                continue
+        cursor = get_db().restaurants.find({"_id": {"$in": oids}}, {"name": 1, "owner_username": 1})
+        return {str(r["_id"]): r async for r in cursor}
+
+    async def get_overview(self) -> dict:
+        """Counts by status, recent orders, fleet utilization and per-restaurant summaries"""
+        db = get_db()
+        orders, drones, users, restaurant_count = await asyncio.gather(
+            self._orders(), self._drones(), self._users(), db.restaurants.estimated_document_count()
+        )
+
+        order_counts = _counts(orders["by_status"])
+        drone_counts = _counts(drones["by_status"], _DRONE_STATUS_ALIASES)
+        role_counts = _counts(users["by_role"])
+        drone_total = sum(drone_counts.values())
+        busy = drone_counts.get(_DRONE_BUSY, 0)
+
+        fleets = {str(row["_id"]): row for row in drones["by_restaurant"]}
+        rows = orders["by_restaurant"]
+        names = await self._restaurant_names([str(row["_id"]) for row in rows])
+        restaurants = []
+        for row in rows:
+            rid = str(row["_id"])
+            fleet = fleets.get(rid, {})
+            restaurants.append({
+                "restaurant_id": rid,
+                "name": names.get(rid, {}).get("name"),
+                "owner_username": names.get(rid, {}).get("owner_username"),
+                "orders": row["orders"],
+                "active_orders": row["active_orders"],
+                "revenue": round(row["revenue"], 2),
+                "drones": fleet.get("drones", 0),
+                "busy_drones": fleet.get("busy_drones", 0),
+            })
+
+        return {
+            "generated_at": datetime.utcnow().isoformat(),
+            "orders": {
+                "total": sum(order_counts.values()),
+                "active": sum(n for status, n in order_counts.items() if status != _ORDER_DONE),
+                "by_status": order_counts,
+                "revenue": round(sum(row["revenue"] for row in orders["by_status"]), 2),
+                "recent": [serialize_doc(doc) for doc in orders["recent"]],
+            },
+            "fleet": {
+                "total": drone_total,
+                "by_status": drone_counts,
+                "busy": busy,
+                "utilization": round(busy / drone_total, 3) if drone_total else 0.0,
+            },
+            "users": {
+                "total": sum(role_counts.values()),
+                "by_role": role_counts,
+            },
+            "restaurants": {
+                "total": restaurant_count,
+                "summaries": restaurants,
+            },
+        }
+
+
+overview_service = OverviewService()
@@ -1,27 +1,21 @@
 """Mock payment service - 100% simulated"""
-from app.core.database import get_db
-from bson import ObjectId
-from datetime import datetime
+from app.services.order_state import OrderTransitionError, transition_order
 
 
 class PaymentService:
     """Mock payment - always succeeds"""
 
     async def mock_pay(self, order_id: str) -> dict:
-        """Mock payment - instant success"""
-        db = get_db()
-        
-        # Update order status to PREPARING
-        await db.orders.update_one(
-            {"_id": ObjectId(order_id)},
-            {
-                "$set": {
-                    "status": "PREPARING",
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-            }
-        )
-        
+        """Mock payment - instant success (PENDING -> PREPARING).
+
+        Paying again for an order that is already PREPARING is a no-op.
+        """
+        try:
+            await transition_order(order_id, "PREPARING")
+        except OrderTransitionError as e:
+            if e.current != "PREPARING":
+                raise
+
         return {
             "order_id": order_id,
             "status": "PAID",
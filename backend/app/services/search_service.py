@@ -0,0 +1,407 @@
+"""Search and autocomplete over restaurants and menu items.
+
+An in-process inverted index over restaurant and menu item names and
+descriptions. It is built from MongoDB at startup and then kept current by the
+restaurant and menu write routes (``upsert_*`` / ``remove``), so a query never
+touches the database:
+
+- every whitespace-separated query word must match (AND);
+- the last word also matches as a prefix (from two characters), for
+  autocomplete;
+- hits are ranked by where the words matched (name over description), with a
+  bonus for names starting with the query.
+
+Terms are kept sorted, so a prefix is expanded with a binary search instead of
+a scan of the vocabulary. Other workers' writes are picked up by a periodic
+full rebuild.
+
+Configuration (environment variables):
+- SEARCH_REBUILD_SECONDS: full rebuild interval, 0 to disable (default 300)
+- SEARCH_MAX_PREFIX_TERMS: terms a prefix may expand to (default 200)
+"""
+import asyncio
+import heapq
+import os
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from pymongo.errors import PyMongoError
+
+from app.core.database import get_db
+
+SEARCH_REBUILD_SECONDS = float(os.getenv("SEARCH_REBUILD_SECONDS", "300"))
+SEARCH_MAX_PREFIX_TERMS = int(os.getenv("SEARCH_MAX_PREFIX_TERMS", "200"))
+
+SEARCH_KINDS = ("restaurant", "menu_item")
+MAX_SEARCH_LIMIT = 50
+
+# Term weight per field; a term found in both fields gets both weights.
+_FIELD_WEIGHTS = (("name", 3.0), ("description", 1.0))
+# Prefix matches score a little below whole-word matches.
+_PREFIX_FACTOR = 0.8
+_NAME_PREFIX_BONUS = 2.0
+_MIN_PREFIX_LENGTH = 2
+# A prefix expanding to more terms than this is merged into one dict per query.
+_MERGE_LOOKUP_TERMS = 4
+# Name-prefix matches scored ahead of the postings walk, at most.
+_MAX_NAME_PREFIXED = 256
+# Filter terms; query words are [a-z0-9] only, so they never match these.
+_KIND_TERM = "\x00kind:"
+_RESTAURANT_TERM = "\x00restaurant:"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+DocKey = Tuple[str, str]
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-folded words of ``text``"""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return _WORD_RE.findall(folded)
+
+
+class SearchIndex:
+    """Inverted index: term -> {doc key: weight}, plus the same postings in impact order.
+
+    Impact-ordered postings (heaviest weight, then shortest name first) let a
+    query stop reading as soon as no remaining document can enter the top
+    ``limit``, instead of scoring every document containing a common word.
+    The kind and the restaurant of a document are indexed as zero-weight
+    filter terms, so scoped searches walk the scope's postings only.
+    """
+
+    def __init__(self):
+        self.docs: Dict[DocKey, dict] = {}
+        self._postings: Dict[str, Dict[DocKey, float]] = {}
+        self._ranked: Dict[str, List[Tuple[float, int, DocKey]]] = {}
+        # Per document: name length and term weights (to find its postings again).
+        self._doc_terms: Dict[DocKey, Tuple[int, Dict[str, float]]] = {}
+        # Normalized names, and the same sorted, for the name-prefix bonus.
+        self._names: Dict[DocKey, str] = {}
+        self._name_order: List[Tuple[str, DocKey]] = []
+        self._terms: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, kind: str, doc_id: str, record: dict, *, bulk: bool = False):
+        """Index (or re-index) one document; ``record`` is what search returns.
+
+        With ``bulk`` (initial load of distinct documents) postings are only
+        appended; call ``finish_bulk`` before using the index.
+        """
+        key = (kind, doc_id)
+        if not bulk:
+            self.remove(kind, doc_id)
+
+        weights: Dict[str, float] = {_KIND_TERM + kind: 0.0}
+        if record.get("restaurant_id"):
+            weights[_RESTAURANT_TERM + record["restaurant_id"]] = 0.0
+        for field, weight in _FIELD_WEIGHTS:
+            for term in set(tokenize(record.get(field))):
+                weights[term] = weights.get(term, 0.0) + weight
+
+        name_len = len(record.get("name") or "")
+        for term, weight in weights.items():
+            posting = self._postings.get(term)
+            if posting is None:
+                posting = self._postings[term] = {}
+                self._ranked[term] = []
+                if bulk:
+                    self._terms.append(term)
+                else:
+                    insort(self._terms, term)
+            posting[key] = weight
+            if bulk:
+                self._ranked[term].append((-weight, name_len, key))
+            else:
+                insort(self._ranked[term], (-weight, name_len, key))
+
+        self.docs[key] = {"type": kind, "id": doc_id, **record}
+        self._names[key] = name = " ".join(tokenize(record.get("name")))
+        if bulk:
+            self._name_order.append((name, key))
+        else:
+            insort(self._name_order, (name, key))
+        self._doc_terms[key] = (name_len, weights)
+
+    def finish_bulk(self):
+        self._terms.sort()
+        self._name_order.sort()
+        for ranked in self._ranked.values():
+            ranked.sort()
+
+    def remove(self, kind: str, doc_id: str):
+        key = (kind, doc_id)
+        if key not in self.docs:
+            return
+        del self.docs[key]
+        name = self._names.pop(key)
+        del self._name_order[bisect_left(self._name_order, (name, key))]
+        name_len, weights = self._doc_terms.pop(key)
+        for term, weight in weights.items():
+            posting, ranked = self._postings[term], self._ranked[term]
+            del posting[key]
+            del ranked[bisect_left(ranked, (-weight, name_len, key))]
+            if not posting:
+                del self._postings[term], self._ranked[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _expand(self, word: str, prefix: bool) -> List[Tuple[str, float]]:
+        """Index terms a query word matches, with the factor applied to their weights"""
+        terms = [(word, 1.0)] if word in self._postings else []
+        if prefix and len(word) >= _MIN_PREFIX_LENGTH:
+            i = bisect_left(self._terms, word)
+            while i < len(self._terms) and self._terms[i].startswith(word) and len(terms) < SEARCH_MAX_PREFIX_TERMS:
+                if self._terms[i] != word:
+                    terms.append((self._terms[i], _PREFIX_FACTOR))
+                i += 1
+        return terms
+
+    def _name_prefixed(self, phrase: str) -> Optional[List[DocKey]]:
+        """Docs whose name starts with ``phrase``; None if there are too many to list"""
+        keys = []
+        i = bisect_left(self._name_order, (phrase,))
+        while i < len(self._name_order) and self._name_order[i][0].startswith(phrase):
+            if len(keys) == _MAX_NAME_PREFIXED:
+                return None
+            keys.append(self._name_order[i][1])
+            i += 1
+        return keys
+
+    def _lookup(self, terms: List[Tuple[str, float]]) -> Callable[[DocKey], Optional[float]]:
+        """Doc -> weight for a word that is not walked (None if the doc lacks it)"""
+        if len(terms) == 1 and terms[0][1] == 1.0:
+            return self._postings[terms[0][0]].get
+        if len(terms) > _MERGE_LOOKUP_TERMS:
+            merged: Dict[DocKey, float] = {}
+            for term, factor in terms:
+                for key, weight in self._postings[term].items():
+                    if weight * factor > merged.get(key, -1.0):
+                        merged[key] = weight * factor
+            return merged.get
+
+        postings = [(self._postings[term], factor) for term, factor in terms]
+
+        def best(key: DocKey) -> Optional[float]:
+            weights = [posting[key] * factor for posting, factor in postings if key in posting]
+            return max(weights) if weights else None
+
+        return best
+
+    def _stream(self, terms: List[Tuple[str, float]]) -> Iterator[Tuple[float, int, DocKey]]:
+        """Postings of ``terms`` merged in impact order (best weight of each doc first)"""
+        if len(terms) == 1 and terms[0][1] == 1.0:
+            return iter(self._ranked[terms[0][0]])
+        return heapq.merge(*(
+            ((negative * factor, name_len, key) for negative, name_len, key in self._ranked[term])
+            for term, factor in terms
+        ))
+
+    def search(
+        self,
+        q: str,
+        *,
+        kinds: Iterable[str] = SEARCH_KINDS,
+        restaurant_id: Optional[str] = None,
+        limit: int = 20,
+    ) -> List[dict]:
+        """Best ``limit`` records matching every word of ``q``, with a ``score``"""
+        words = tokenize(q)
+        if not words or limit < 1:
+            return []
+        required = [self._expand(word, prefix=(i == len(words) - 1)) for i, word in enumerate(words)]
+        kinds = set(kinds)
+        if kinds != set(SEARCH_KINDS):
+            if len(kinds) != 1:
+                return []
+            required.append([(_KIND_TERM + kinds.pop(), 1.0)])
+        if restaurant_id:
+            required.append([(_RESTAURANT_TERM + restaurant_id, 1.0)])
+        if not all(required):
+            return []
+
+        # Walk the smallest posting set; look the document up in the others.
+        required.sort(key=lambda terms: sum(len(self._postings[term]) for term, _ in terms))
+        driver, others = required[0], required[1:]
+        others_max = sum(max(-self._ranked[term][0][0] * factor for term, factor in terms) for terms in others)
+        lookups = [self._lookup(terms) for terms in others]
+        top: List[Tuple[float, int, DocKey]] = []
+
+        def offer(key: DocKey, score: float):
+            for lookup in lookups:
+                weight = lookup(key)
+                if weight is None:
+                    return
+                score += weight
+            if self._names[key].startswith(phrase):
+                score += _NAME_PREFIX_BONUS
+            hit = (score, -self._doc_terms[key][0], key)
+            if len(top) < limit:
+                heapq.heappush(top, hit)
+            elif hit > top[0]:
+                heapq.heapreplace(top, hit)
+
+        # Score the (few) documents eligible for the name bonus up front, so the
+        # walk's stopping bound need not allow for it.
+        phrase = " ".join(words)
+        seen: Set[DocKey] = set()
+        bonus = _NAME_PREFIX_BONUS
+        prefixed = self._name_prefixed(phrase)
+        if prefixed is not None:
+            driver_weight = self._lookup(driver)
+            for key in prefixed:
+                weight = driver_weight(key)
+                if weight is not None:
+                    offer(key, weight)
+            seen.update(prefixed)
+            bonus = 0.0
+
+        for negative, _, key in self._stream(driver):
+            if len(top) == limit and top[0][0] >= -negative + others_max + bonus:
+                break
+            if key not in seen:
+                seen.add(key)
+                offer(key, -negative)
+
+        results = []
+        for score, _, key in sorted(top, reverse=True):
+            record = dict(self.docs[key], score=round(score, 3))
+            if key[0] == "menu_item":
+                restaurant = self.docs.get(("restaurant", record.get("restaurant_id") or ""))
+                record["restaurant_name"] = restaurant.get("name") if restaurant else None
+            results.append(record)
+        return results
+
+
+def _restaurant_record(doc: dict) -> dict:
+    return {
+        "name": doc.get("name") or "",
+        "description": doc.get("description") or "",
+        "image_url": doc.get("image_url"),
+    }
+
+
+def _menu_item_record(doc: dict) -> dict:
+    return {
+        "name": doc.get("name") or "",
+        "description": doc.get("description") or "",
+        "restaurant_id": str(doc["restaurant_id"]) if doc.get("restaurant_id") else None,
+        "price": doc.get("price"),
+        "image_url": doc.get("image_url"),
+        "available": doc.get("available", True),
+    }
+
+
+class SearchService:
+    """Owns the search index: builds it, keeps it current, answers queries"""
+
+    def __init__(self, rebuild_seconds: float = SEARCH_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self._index: Optional[SearchIndex] = None
+        # Writes seen while a rebuild is reading the collections, replayed onto the new index.
+        self._replay: Optional[List[Tuple[str, str, Optional[dict]]]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def start(self):
+        """Build the index in the background and keep rebuilding it (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.rebuild()
+            except PyMongoError as e:
+                print(f"⚠️  Search index build failed: {e}")
+                if not self.ready:
+                    await asyncio.sleep(5)
+                    continue
+            if self.rebuild_seconds <= 0:
+                return
+            await asyncio.sleep(self.rebuild_seconds)
+
+    async def rebuild(self):
+        """Build a fresh index from MongoDB and swap it in"""
+        db = get_db()
+        index = SearchIndex()
+        self._replay = []
+        try:
+            async for doc in db.restaurants.find({}, {"name": 1, "description": 1, "image_url": 1}):
+                index.add("restaurant", str(doc["_id"]), _restaurant_record(doc), bulk=True)
+            menu_projection = {"name": 1, "description": 1, "restaurant_id": 1, "price": 1, "image_url": 1, "available": 1}
+            async for doc in db.menu_items.find({}, menu_projection).batch_size(1000):
+                index.add("menu_item", str(doc["_id"]), _menu_item_record(doc), bulk=True)
+            index.finish_bulk()
+            for kind, doc_id, record in self._replay:
+                if record is None:
+                    index.remove(kind, doc_id)
+                else:
+                    index.add(kind, doc_id, record)
+        finally:
+            self._replay = None
+
+        first = self._index is None
+        self._index = index
+        if first:
+            print(f"🔎 Search index ready ({len(index)} documents)")
+
+    def _apply(self, kind: str, doc_id: str, record: Optional[dict]):
+        if self._replay is not None:
+            self._replay.append((kind, doc_id, record))
+        if self._index is None:
+            return
+        if record is None:
+            self._index.remove(kind, doc_id)
+        else:
+            self._index.add(kind, doc_id, record)
+
+    def upsert_restaurant(self, doc: dict):
+        self._apply("restaurant", str(doc["_id"]), _restaurant_record(doc))
+
+    def upsert_menu_item(self, doc: dict):
+        self._apply("menu_item", str(doc["_id"]), _menu_item_record(doc))
+
+    def remove(self, kind: str, doc_id: Any):
+        self._apply(kind, str(doc_id), None)
+
+    def search(self, q: str, **kwargs) -> List[dict]:
+        """Ranked hits (see SearchIndex.search); [] until the index is built"""
+        if self._index is None:
+            return []
+        return self._index.search(q, **kwargs)
+
+    def suggest(self, q: str, limit: int = 8) -> List[dict]:
+        """Distinct names completing ``q``, best first"""
+        suggestions, seen = [], set()
+        for hit in self.search(q, limit=limit * 3):
+            name = hit["name"].strip()
+            if name.lower() in seen:
+                continue
+            seen.add(name.lower())
+            suggestions.append({"text": name, "type": hit["type"], "id": hit["id"], "restaurant_id": hit.get("restaurant_id")})
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+# Global search index
+search_service = SearchService()
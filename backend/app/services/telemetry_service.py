@@ -0,0 +1,176 @@
+"""Write-behind drone telemetry.
+
+The fleet simulator records each drone position here instead of rewriting the
+order document every tick. Samples are buffered in memory and flushed in
+batches:
+
+- every sample goes to the ``drone_telemetry`` time-series collection with
+  one ``insert_many`` per flush;
+- each order still in flight gets its last known position (``drone_lat``,
+  ``drone_lon``, ``updated_at``) with one ``bulk_write`` per flush.
+
+Samples of a drone closer together than TELEMETRY_MIN_INTERVAL_SECONDS are
+coalesced (the newer one replaces the older). ``track`` returns a delivery's
+path as a downsampled polyline for replay.
+
+Delivery is at least once: a failed flush keeps its samples for the next one,
+and a write that failed after the server applied it (e.g. a timeout) stores
+them twice. Each sample gets its ``_id`` when it is buffered, so ``track``
+drops such duplicates (time-series collections do not enforce ``_id``
+uniqueness).
+
+Configuration (environment variables):
+- TELEMETRY_FLUSH_SECONDS: flush interval (default 5)
+- TELEMETRY_MIN_INTERVAL_SECONDS: minimum spacing of stored samples per drone (default 2)
+- TELEMETRY_MAX_BUFFER: buffered samples that trigger an early flush (default 10000)
+- TELEMETRY_TRACK_TOLERANCE_M: replay simplification tolerance in metres (default 5)
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.core.database import get_db
+from app.core.geo import simplify
+
+TELEMETRY_FLUSH_SECONDS = float(os.getenv("TELEMETRY_FLUSH_SECONDS", "5"))
+TELEMETRY_MIN_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_MIN_INTERVAL_SECONDS", "2"))
+TELEMETRY_MAX_BUFFER = int(os.getenv("TELEMETRY_MAX_BUFFER", "10000"))
+TELEMETRY_TRACK_TOLERANCE_M = float(os.getenv("TELEMETRY_TRACK_TOLERANCE_M", "5"))
+
+TELEMETRY_COLLECTION = "drone_telemetry"
+MAX_TRACK_POINTS = 1000
+
+
+class TelemetryService:
+    """Buffer drone positions and flush them in batches"""
+
+    def __init__(self, flush_seconds: float = TELEMETRY_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._samples: List[dict] = []
+        # Last buffered sample per drone with the time its coalescing window opened,
+        # and per order (last known position).
+        self._by_drone: Dict[ObjectId, Tuple[dict, datetime]] = {}
+        self._by_order: Dict[ObjectId, dict] = {}
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flusher (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write out whatever is still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"⚠️  Final telemetry flush failed: {e}")
+
+    def record(self, order_id: ObjectId, drone_id: Optional[ObjectId], lat: float, lon: float, ts: datetime):
+        """Buffer one position of the drone flying ``order_id``"""
+        key = drone_id or order_id
+        previous = self._by_drone.get(key)
+        if previous is not None:
+            sample, window_start = previous
+            if sample["meta"]["order_id"] == order_id and (ts - window_start).total_seconds() < TELEMETRY_MIN_INTERVAL_SECONDS:
+                sample.update(ts=ts, lat=lat, lon=lon)
+                return
+
+        sample = {"_id": ObjectId(), "ts": ts, "meta": {"order_id": order_id, "drone_id": drone_id}, "lat": lat, "lon": lon}
+        self._samples.append(sample)
+        self._by_drone[key] = (sample, ts)
+        self._by_order[order_id] = sample
+        if len(self._samples) >= TELEMETRY_MAX_BUFFER:
+            self._full.set()
+
+    def pending(self, order_id: ObjectId) -> List[dict]:
+        """Buffered (not yet flushed) samples of one order"""
+        return [sample for sample in self._samples if sample["meta"]["order_id"] == order_id]
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"⚠️  Telemetry flush failed: {e}")
+
+    async def flush(self):
+        """Write buffered samples and last known positions"""
+        self._full.clear()
+        samples, self._samples = self._samples, []
+        latest, self._by_order = self._by_order, {}
+        self._by_drone = {}
+        if not samples and not latest:
+            return
+
+        db = get_db()
+        try:
+            if samples:
+                await db[TELEMETRY_COLLECTION].insert_many(samples, ordered=False)
+        except BulkWriteError as e:
+            # Only the samples that were not written.
+            self._requeue([samples[error["index"]] for error in e.details.get("writeErrors", [])], latest)
+            raise
+        except PyMongoError:
+            # Some may have been written anyway; track() drops the duplicates.
+            self._requeue(samples, latest)
+            raise
+
+        # Only orders that are still out for delivery; completion writes its own final position.
+        ops = [
+            UpdateOne(
+                {"_id": order_id, "status": "DELIVERING"},
+                {"$set": {"drone_lat": s["lat"], "drone_lon": s["lon"], "updated_at": s["ts"].isoformat()}},
+            )
+            for order_id, s in latest.items()
+        ]
+        try:
+            await db.orders.bulk_write(ops, ordered=False)
+        except PyMongoError:
+            self._requeue([], latest)
+            raise
+
+    def _requeue(self, samples: List[dict], latest: Dict[ObjectId, dict]):
+        """Keep unwritten samples (up to the buffer limit) and positions for the next flush"""
+        self._samples = (samples + self._samples)[-TELEMETRY_MAX_BUFFER:]
+        for order_id, sample in latest.items():
+            # A position recorded since the failed flush is newer.
+            self._by_order.setdefault(order_id, sample)
+
+    async def track(self, order_id: ObjectId, max_points: int = 200) -> dict:
+        """A delivery's recorded path: ``[lat, lon, iso_time]`` points, downsampled"""
+        cursor = get_db()[TELEMETRY_COLLECTION].find(
+            {"meta.order_id": order_id}, {"_id": 1, "ts": 1, "lat": 1, "lon": 1}
+        ).sort("ts", 1)
+        samples = await cursor.to_list(None)
+        samples.extend(self.pending(order_id))
+
+        # Samples stored twice by a retried flush (or stored and still buffered) count once.
+        unique = {s["_id"]: s for s in samples}
+        points = [[s["lat"], s["lon"], s["ts"].isoformat()] for s in sorted(unique.values(), key=lambda s: s["ts"])]
+        max_points = max(2, min(max_points, MAX_TRACK_POINTS))
+        return {
+            "order_id": str(order_id),
+            "samples": len(points),
+            "points": simplify(points, TELEMETRY_TRACK_TOLERANCE_M, max_points),
+        }
+
+
+# Global telemetry buffer
+telemetry_service = TelemetryService()
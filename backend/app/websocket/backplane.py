@@ -0,0 +1,204 @@
+"""Pub/sub backplane between the order watcher and ConnectionManager.
+
+Tracking updates are published once and delivered by every worker that holds
+a subscriber for the order:
+
+- LocalBackplane: in-process delivery, for a single worker (default).
+- MongoBackplane: updates are appended to a capped collection that every
+  worker tails with a tailable cursor, so sockets held by any uvicorn worker
+  (or host) receive them without adding a new service.
+
+Only one worker publishes to the shared backplane at a time: the holder of a
+lease in ``backplane_leases`` (see ``acquire_publisher``). Each lease
+takeover bumps an epoch, and events carry ``seq`` = epoch << 32 + a counter,
+so the sequence keeps increasing in insertion order across publishers. A
+tailer whose cursor died resumes after the last ``seq`` it delivered (ObjectIds
+from different workers are not ordered within a second).
+
+Configuration (environment variables):
+- TRACKING_BACKPLANE: ``local`` (default) or ``mongo``
+- TRACKING_EVENTS_MAX_BYTES: size of the capped ``order_events`` collection
+  (default 16 MiB); it only has to cover a few seconds of updates
+- TRACKING_PUBLISHER_LEASE_SECONDS: publisher lease duration (default 10);
+  another worker takes over this long after the publisher disappears
+"""
+import asyncio
+import os
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from pymongo import CursorType, ReturnDocument
+from pymongo.errors import CollectionInvalid, DuplicateKeyError, PyMongoError
+
+from app.core.database import get_db
+
+TRACKING_BACKPLANE = os.getenv("TRACKING_BACKPLANE", "local").strip().lower()
+TRACKING_EVENTS_MAX_BYTES = int(os.getenv("TRACKING_EVENTS_MAX_BYTES", str(16 * 1024 * 1024)))
+TRACKING_PUBLISHER_LEASE_SECONDS = float(os.getenv("TRACKING_PUBLISHER_LEASE_SECONDS", "10"))
+
+Handler = Callable[[str, Any], Awaitable[None]]
+
+# How long to wait before re-opening the tailable cursor (empty collection or error).
+_RETAIL_BACKOFF_SECONDS = 1.0
+
+
+class Backplane(ABC):
+    """Publish order updates; deliver them to this worker's handler"""
+
+    # True when updates published here reach other workers too.
+    shared = False
+
+    @abstractmethod
+    async def start(self, handler: Handler):
+        ...
+
+    @abstractmethod
+    async def stop(self):
+        ...
+
+    @abstractmethod
+    async def publish(self, order_id: str, message: Any):
+        ...
+
+    async def acquire_publisher(self) -> bool:
+        """Take or renew the right to publish; False while another worker holds it"""
+        return True
+
+    async def release_publisher(self):
+        """Give up the right to publish (on shutdown)"""
+
+
+class LocalBackplane(Backplane):
+    """Deliver updates straight to the local handler"""
+
+    def __init__(self):
+        self._handler: Optional[Handler] = None
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+
+    async def stop(self):
+        self._handler = None
+
+    async def publish(self, order_id: str, message: Any):
+        if self._handler is not None:
+            await self._handler(order_id, message)
+
+
+class MongoBackplane(Backplane):
+    """Capped collection + tailable cursor shared by all workers"""
+
+    shared = True
+    collection_name = "order_events"
+    lease_collection_name = "backplane_leases"
+
+    def __init__(self, max_bytes: int = TRACKING_EVENTS_MAX_BYTES, lease_seconds: float = TRACKING_PUBLISHER_LEASE_SECONDS):
+        self.max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self.worker_id = uuid.uuid4().hex
+        self._handler: Optional[Handler] = None
+        self._task: Optional[asyncio.Task] = None
+        # Epoch of the publisher lease while this worker holds it, and the events published under it.
+        self._epoch: Optional[int] = None
+        self._count = 0
+        self._publish_lock = asyncio.Lock()
+
+    async def start(self, handler: Handler):
+        self._handler = handler
+        await self._ensure_collection()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._tail(await self._last_seq()))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._handler = None
+
+    async def publish(self, order_id: str, message: Any):
+        async with self._publish_lock:
+            # Inserted one at a time, so insertion order follows seq.
+            if self._epoch is None:
+                print(f"⚠️  Not the tracking publisher, dropping update for {order_id}")
+                return
+            self._count += 1
+            seq = (self._epoch << 32) + self._count
+            await get_db()[self.collection_name].insert_one({"seq": seq, "order_id": order_id, "message": message})
+
+    async def acquire_publisher(self) -> bool:
+        leases = get_db()[self.lease_collection_name]
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        if self._epoch is not None:
+            renewed = await leases.update_one(
+                {"_id": self.collection_name, "owner": self.worker_id, "epoch": self._epoch},
+                {"$set": {"expires_at": expires_at}},
+            )
+            if renewed.matched_count:
+                return True
+            self._epoch = None
+
+        try:
+            lease = await leases.find_one_and_update(
+                {"_id": self.collection_name, "expires_at": {"$lt": now}},
+                {"$set": {"owner": self.worker_id, "expires_at": expires_at}, "$inc": {"epoch": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False  # held by another worker
+        self._epoch, self._count = lease["epoch"], 0
+        return True
+
+    async def release_publisher(self):
+        if self._epoch is None:
+            return
+        self._epoch = None
+        await get_db()[self.lease_collection_name].update_one(
+            {"_id": self.collection_name, "owner": self.worker_id},
+            {"$set": {"expires_at": datetime.utcnow()}},
+        )
+
+    async def _ensure_collection(self):
+        db = get_db()
+        try:
+            await db.create_collection(self.collection_name, capped=True, size=self.max_bytes)
+            print(f"📣 Created capped collection {self.collection_name} ({self.max_bytes} bytes)")
+        except CollectionInvalid:
+            pass  # already exists (created by another worker)
+
+    async def _last_seq(self) -> int:
+        last = await get_db()[self.collection_name].find(
+            {"seq": {"$exists": True}}, {"seq": 1}
+        ).sort("$natural", -1).limit(1).to_list(1)
+        return last[0]["seq"] if last else 0
+
+    async def _tail(self, last_seq: int):
+        """Deliver every event published after ``last_seq``, in insertion order"""
+        collection = get_db()[self.collection_name]
+        while True:
+            try:
+                cursor = collection.find({"seq": {"$gt": last_seq}}, cursor_type=CursorType.TAILABLE_AWAIT)
+                async for event in cursor:
+                    last_seq = event["seq"]
+                    try:
+                        await self._handler(event["order_id"], event["message"])
+                    except Exception as e:
+                        print(f"⚠️  Tracking event delivery failed ({event['order_id']}): {e}")
+            except PyMongoError as e:
+                print(f"⚠️  Tracking backplane interrupted: {e}")
+            # A tailable cursor dies on an empty collection or after a failover.
+            await asyncio.sleep(_RETAIL_BACKOFF_SECONDS)
+
+
+def build_backplane() -> Backplane:
+    """Create the backplane selected by TRACKING_BACKPLANE"""
+    if TRACKING_BACKPLANE == "mongo":
+        return MongoBackplane()
+    return LocalBackplane()
@@ -1,44 +1,536 @@
-"""WebSocket connection manager for order tracking"""
-from typing import Set, Dict
+"""Connection manager for order tracking (WebSocket and Server-Sent Events).
+
+Each watched order id gets one ``OrderChannel``: a single fan-out task that is
+started with the first subscriber and cancelled when the last one leaves.
+Updates published for the order are coalesced (only the latest is kept) and
+handed to every subscriber's bounded send queue; each connection drains its
+own queue in its own sender task, so sends run concurrently and one slow
+client never holds up the others. A client whose queue overflows, or whose
+send times out, is evicted.
+
+Subscribers pick a wire format (see app.websocket.protocol): legacy clients
+get the full order every time, protocol 2 clients a snapshot and then deltas
+(without the position ticks of a planned delivery, which they interpolate).
+The channel diffs each update against the previous one and encodes it once
+per format, whatever the number of subscribers.
+
+Updates travel through a backplane (see app.websocket.backplane), so with a
+shared backplane an update published by one worker reaches the subscribers
+held by every worker.
+
+Server-Sent Events clients (see ``open_stream``) subscribe to the same
+channels. Each channel keeps a small ring buffer of recent deltas, so a client
+reconnecting with ``Last-Event-ID`` only gets what it missed.
+
+Lifecycle: connections over the per-worker, per-order or per-client limits
+are refused before the handshake is accepted. Protocol 2 WebSockets get an
+application ping every heartbeat and are reaped when they stay silent (dead
+peers after a network switch); legacy sockets rely on the server's transport
+pings. Each connection accounts the bytes it has queued and sent (see
+``stats``). On shutdown ``drain`` refuses new connections and closes the open
+ones with a reconnect hint (1012 / an SSE ``reconnect`` event).
+
+Configuration (environment variables):
+- WS_SEND_QUEUE_SIZE: pending messages allowed per connection (default 16)
+- WS_SEND_TIMEOUT_SECONDS: max time for a single send (default 10)
+- TRACKING_REPLAY_EVENTS: deltas buffered per order for resume (default 64)
+- TRACKING_RESUME_SECONDS: how long an unwatched order's buffer is kept (default 120)
+- SSE_KEEPALIVE_SECONDS: idle interval between SSE keep-alive comments (default 15)
+- TRACKING_MAX_CONNECTIONS: connections per worker (default 10000)
+- TRACKING_MAX_PER_ORDER: connections per order (default 200)
+- TRACKING_MAX_PER_CLIENT: connections per client address (default 20)
+- WS_HEARTBEAT_SECONDS: ping interval for protocol 2 WebSockets (default 20)
+- WS_IDLE_TIMEOUT_SECONDS: reap protocol 2 WebSockets silent for this long (default 60)
+"""
+import asyncio
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
 from fastapi import WebSocket
-import json
-from app.core.database import get_db
-from bson import ObjectId
+
+from app.core.cache import TTLCache
+from app.websocket.backplane import Backplane, build_backplane
+from app.websocket.protocol import (
+    LEGACY_FORMAT,
+    PING_MESSAGE,
+    PROTOCOL_VERSION,
+    SSE_FORMAT,
+    V2_FORMAT,
+    Frame,
+    TrackingFormat,
+    delta_message,
+    diff,
+    encode,
+    plan_changes,
+    snapshot_message,
+)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "16"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+TRACKING_REPLAY_EVENTS = int(os.getenv("TRACKING_REPLAY_EVENTS", "64"))
+TRACKING_RESUME_SECONDS = float(os.getenv("TRACKING_RESUME_SECONDS", "120"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+# Reconnect delay suggested to EventSource clients.
+SSE_RETRY_MS = 3000
+TRACKING_MAX_CONNECTIONS = int(os.getenv("TRACKING_MAX_CONNECTIONS", "10000"))
+TRACKING_MAX_PER_ORDER = int(os.getenv("TRACKING_MAX_PER_ORDER", "200"))
+TRACKING_MAX_PER_CLIENT = int(os.getenv("TRACKING_MAX_PER_CLIENT", "20"))
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "20"))
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT_SECONDS", "60"))
+
+# WebSocket close codes
+IDLE_CLOSE_CODE = 1001  # going away: no sign of life from the client
+LIMIT_CLOSE_CODE = 1008  # policy: too many connections
+RESTART_CLOSE_CODE = 1012  # service restart: reconnect shortly
+SLOW_CONSUMER_CLOSE_CODE = 1013  # try again later: could not keep up
+
+
+class Subscriber(ABC):
+    """One client connection with its own bounded queue of encoded frames"""
+
+    def __init__(self, client: str, fmt: TrackingFormat = LEGACY_FORMAT, queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.client = client
+        self.fmt = fmt
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        # Accounting: bytes waiting in the queue, and sent so far.
+        self.queued_bytes = 0
+        self.sent_bytes = 0
+        self.sent_messages = 0
+
+    def offer(self, frame: Frame) -> bool:
+        """Queue a frame without waiting; False if the client is too far behind"""
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        self.queued_bytes += len(frame)
+        return True
+
+    def _sent(self, frame: Frame):
+        self.queued_bytes -= len(frame)
+        self.sent_bytes += len(frame)
+        self.sent_messages += 1
+
+    def touch(self):
+        """Record a sign of life from the client"""
+        self.last_seen = time.monotonic()
+
+    @abstractmethod
+    def close(self, code: Optional[int] = None):
+        ...
+
+
+class WebSocketSubscriber(Subscriber):
+    """A WebSocket, drained by its own sender task"""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        evict: Callable[[Hashable], None],
+        client: str,
+        fmt: TrackingFormat = LEGACY_FORMAT,
+        queue_size: int = WS_SEND_QUEUE_SIZE,
+    ):
+        super().__init__(client, fmt, queue_size)
+        self.websocket = websocket
+        self._evict = evict
+        self._task = asyncio.create_task(self._drain())
+
+    async def _drain(self):
+        while True:
+            frame = await self.queue.get()
+            send = self.websocket.send_bytes if isinstance(frame, bytes) else self.websocket.send_text
+            try:
+                await asyncio.wait_for(send(frame), WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error sending WebSocket message: {type(e).__name__} {e}")
+                self._evict(self.websocket)
+                return
+            self._sent(frame)
+
+    def close(self, code: Optional[int] = None):
+        """Stop sending; with ``code``, also close the socket"""
+        self._task.cancel()
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+
+    async def _close_socket(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+
+class StreamSubscriber(Subscriber):
+    """An HTTP stream (SSE): the response body iterates ``frames()``"""
+
+    def __init__(self, client: str, fmt: TrackingFormat = SSE_FORMAT, queue_size: int = WS_SEND_QUEUE_SIZE):
+        super().__init__(client, fmt, queue_size)
+
+    async def frames(self):
+        """Yield queued frames until closed, and an SSE comment when idle to keep proxies from timing out"""
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(self.queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if frame is None:
+                return
+            self._sent(frame)
+            yield frame
+
+    def close(self, code: Optional[int] = None):
+        """End the stream (after dropping anything still queued).
+
+        On a restart the client is told to reconnect (EventSource would
+        anyway, but this lets it do so without waiting for a read error).
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queued_bytes = 0
+        if code == RESTART_CLOSE_CODE:
+            self.queue.put_nowait(f"retry: {SSE_RETRY_MS}\nevent: reconnect\ndata: {{}}\n\n")
+        self.queue.put_nowait(None)
+
+
+class OrderChannel:
+    """Subscribers of one order id and the task that fans updates out to them.
+
+    The channel also keeps its last state, sequence number and a ring buffer
+    of recent protocol 2 deltas, so reconnecting clients can resume.
+    """
+
+    def __init__(self, order_id: str, evict: Callable[[Hashable], None], state: Optional[tuple] = None):
+        self.order_id = order_id
+        # Keyed by the WebSocket, or by the subscriber itself for streams.
+        self.subscribers: Dict[Hashable, Subscriber] = {}
+        self._evict = evict
+        # Last order state sent out and its sequence number (protocol 2).
+        self.last: Optional[Dict[str, Any]] = None
+        self.seq = 0
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=TRACKING_REPLAY_EVENTS)
+        # Identifies this sequence (it is per worker and restarts with the channel).
+        self.stream_id = uuid.uuid4().hex[:12]
+        if state is not None:
+            self.stream_id, self.last, self.seq, self.history = state
+        self._latest: Any = None
+        self._pending = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def state(self) -> tuple:
+        return self.stream_id, self.last, self.seq, self.history
+
+    def subscribe(self, key: Hashable, subscriber: Subscriber):
+        self.subscribers[key] = subscriber
+
+    def offer(self, key: Hashable, frame: Frame):
+        """Queue a frame for one subscriber, evicting it if it is too far behind"""
+        subscriber = self.subscribers.get(key)
+        if subscriber is not None and not subscriber.offer(frame):
+            print(f"🐢 Evicting slow tracking consumer: {self.order_id}")
+            self._evict(key)
+
+    def encode(self, message: Dict[str, Any], fmt: TrackingFormat) -> Frame:
+        return encode(message, fmt, self.stream_id)
+
+    def resume(self, key: Hashable, last_event_id: str) -> bool:
+        """Queue the deltas after ``last_event_id``; False if they are no longer buffered"""
+        subscriber = self.subscribers.get(key)
+        stream_id, _, seq = last_event_id.rpartition("-")
+        if subscriber is None or self.last is None or stream_id != self.stream_id or not seq.isdigit():
+            return False
+        last_seq = int(seq)
+        if last_seq > self.seq:
+            return False
+        missed = [message for message in self.history if message["seq"] > last_seq]
+        if len(missed) != self.seq - last_seq:
+            return False
+        for message in missed:
+            self.offer(key, self.encode(message, subscriber.fmt))
+        return True
+
+    def send_snapshot(self, key: Hashable, order: Dict[str, Any]):
+        """Queue the channel's current state for a new subscriber.
+
+        ``order`` (freshly read) only seeds a channel that has not sent anything
+        yet; otherwise the snapshot must be the state later deltas apply to.
+        """
+        subscriber = self.subscribers.get(key)
+        if subscriber is None:
+            return
+        if self.last is None:
+            self.last = order
+        self.offer(key, self.encode(snapshot_message(self.last, self.seq, subscriber.fmt), subscriber.fmt))
+
+    def publish(self, message: Any):
+        """Replace any not-yet-delivered update with ``message``"""
+        self._latest = message
+        self._pending.set()
+
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            self._pending.clear()
+            order, self._latest = self._latest, None
+            build = self._prepare(order)
+            if build is None:
+                continue
+            # Encode once per wire format, not once per subscriber.
+            frames: Dict[TrackingFormat, Optional[Frame]] = {}
+            for websocket, subscriber in list(self.subscribers.items()):
+                if subscriber.fmt not in frames:
+                    frames[subscriber.fmt] = build(subscriber.fmt)
+                if frames[subscriber.fmt] is not None:
+                    self.offer(websocket, frames[subscriber.fmt])
+
+    def _prepare(self, order: Dict[str, Any]) -> Optional[Callable[[TrackingFormat], Optional[Frame]]]:
+        """Advance the channel state to ``order``; return a frame builder (None if nothing changed).
+
+        The builder returns None for formats that have nothing to send.
+        """
+        if self.last is None:
+            self.last = order
+            seq = self.seq
+            return lambda fmt: self.encode(snapshot_message(order, seq, fmt), fmt)
+
+        changed, removed = diff(self.last, order)
+        if not changed and not removed:
+            return None
+        self.last = order
+        changed, removed = plan_changes(order, changed, removed)
+        if not changed and not removed:
+            # Only the interpolated position moved: legacy clients still need it.
+            return lambda fmt: self.encode(order, fmt) if fmt.version < PROTOCOL_VERSION else None
+
+        self.seq += 1
+        seq = self.seq
+        self.history.append(delta_message(order, changed, removed, seq, V2_FORMAT))
+        return lambda fmt: self.encode(delta_message(order, changed, removed, seq, fmt), fmt)
+
+    def remove(self, key: Hashable, close_code: Optional[int] = None):
+        subscriber = self.subscribers.pop(key, None)
+        if subscriber is not None:
+            subscriber.close(close_code)
+
+    def close(self):
+        self._task.cancel()
+        for key in list(self.subscribers):
+            self.remove(key)
 
 
 class ConnectionManager:
-    """Manage WebSocket connections for order tracking"""
+    """Manage WebSocket and event stream connections for order tracking"""
+
+    def __init__(self, backplane: Backplane):
+        self.backplane = backplane
+        self.channels: Dict[str, OrderChannel] = {}
+        # State of recently closed channels, so a client reconnecting to an
+        # order nobody else watches can still resume.
+        self._retired = TTLCache(maxsize=1024, ttl=TRACKING_RESUME_SECONDS)
+        self.accepting = True
+        self.connection_count = 0
+        self._per_client: Dict[str, int] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start receiving updates from the backplane, and the heartbeat"""
+        self.accepting = True
+        await self.backplane.start(self._deliver)
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        await self.backplane.stop()
+        for channel in self.channels.values():
+            channel.close()
+        self.channels.clear()
+        self.connection_count = 0
+        self._per_client.clear()
 
-    def __init__(self):
-        self.active_connections: Dict[str, Set[WebSocket]] = {}
+    async def drain(self):
+        """Refuse new connections and ask every open one to reconnect (to another worker)"""
+        self.accepting = False
+        closed = 0
+        for order_id, channel in list(self.channels.items()):
+            for key in list(channel.subscribers):
+                self.disconnect(order_id, key, RESTART_CLOSE_CODE)
+                closed += 1
+        # Let the close frames / final events go out.
+        await asyncio.sleep(0)
+        print(f"🚪 Tracking drained: closed {closed} connections")
+
+    def _refusal(self, order_id: str, client: str) -> Optional[str]:
+        """Why a new connection must be refused (None if it may connect)"""
+        if not self.accepting:
+            return "server is shutting down"
+        if self.connection_count >= TRACKING_MAX_CONNECTIONS:
+            return "too many connections"
+        channel = self.channels.get(order_id)
+        if channel is not None and len(channel.subscribers) >= TRACKING_MAX_PER_ORDER:
+            return "too many connections for this order"
+        if self._per_client.get(client, 0) >= TRACKING_MAX_PER_CLIENT:
+            return "too many connections from this client"
+        return None
+
+    async def connect(self, order_id: str, websocket: WebSocket, fmt: TrackingFormat = LEGACY_FORMAT) -> bool:
+        """Accept a WebSocket and subscribe it to the order in the given format.
+
+        Returns False (after refusing the handshake, which costs no accept)
+        when a connection limit is reached or the server is draining.
+        """
+        client = websocket.client.host if websocket.client else "unknown"
+        refusal = self._refusal(order_id, client)
+        if refusal:
+            print(f"⛔ WebSocket refused ({refusal}): {order_id}")
+            await websocket.close(code=RESTART_CLOSE_CODE if not self.accepting else LIMIT_CLOSE_CODE)
+            return False
 
-    async def connect(self, order_id: str, websocket: WebSocket):
-        """Accept WebSocket connection"""
         await websocket.accept()
-        
-        if order_id not in self.active_connections:
-            self.active_connections[order_id] = set()
-        
-        self.active_connections[order_id].add(websocket)
+        self._add(order_id, websocket, WebSocketSubscriber(websocket, self._evictor(order_id), client, fmt))
         print(f"✅ WebSocket connected: {order_id}")
+        return True
+
+    def open_stream(self, order_id: str, client: str) -> Optional[StreamSubscriber]:
+        """Subscribe an HTTP event stream to the order (None if refused); pass it to ``disconnect`` when done"""
+        refusal = self._refusal(order_id, client)
+        if refusal:
+            print(f"⛔ Event stream refused ({refusal}): {order_id}")
+            return None
+        subscriber = StreamSubscriber(client)
+        self._add(order_id, subscriber, subscriber)
+        print(f"✅ Event stream opened: {order_id}")
+        return subscriber
+
+    def _add(self, order_id: str, key: Hashable, subscriber: Subscriber):
+        self._channel(order_id).subscribe(key, subscriber)
+        self.connection_count += 1
+        self._per_client[subscriber.client] = self._per_client.get(subscriber.client, 0) + 1
+
+    def _evictor(self, order_id: str) -> Callable[[Hashable], None]:
+        return lambda key: self.disconnect(order_id, key, SLOW_CONSUMER_CLOSE_CODE)
+
+    def touch(self, order_id: str, key: Hashable):
+        """Record that a client sent something (it is alive)"""
+        channel = self.channels.get(order_id)
+        subscriber = channel.subscribers.get(key) if channel else None
+        if subscriber is not None:
+            subscriber.touch()
+
+    async def _heartbeat(self):
+        """Ping protocol 2 WebSockets and reap the ones that stopped answering"""
+        while True:
+            await asyncio.sleep(WS_HEARTBEAT_SECONDS)
+            deadline = time.monotonic() - WS_IDLE_TIMEOUT_SECONDS
+            for order_id, channel in list(self.channels.items()):
+                for key, subscriber in list(channel.subscribers.items()):
+                    if not isinstance(subscriber, WebSocketSubscriber) or subscriber.fmt.version < PROTOCOL_VERSION:
+                        continue
+                    if subscriber.last_seen < deadline:
+                        print(f"💤 Reaping idle WebSocket: {order_id}")
+                        self.disconnect(order_id, key, IDLE_CLOSE_CODE)
+                    else:
+                        channel.offer(key, encode(PING_MESSAGE, subscriber.fmt))
 
-    def disconnect(self, order_id: str, websocket: WebSocket):
-        """Disconnect WebSocket"""
-        if order_id in self.active_connections:
-            self.active_connections[order_id].discard(websocket)
-            if not self.active_connections[order_id]:
-                del self.active_connections[order_id]
-        print(f"❌ WebSocket disconnected: {order_id}")
+    def stats(self) -> Dict[str, Any]:
+        """Connection counts and per-connection memory/traffic accounting"""
+        subscribers = [s for channel in self.channels.values() for s in channel.subscribers.values()]
+        return {
+            "accepting": self.accepting,
+            "connections": self.connection_count,
+            "websockets": sum(isinstance(s, WebSocketSubscriber) for s in subscribers),
+            "streams": sum(isinstance(s, StreamSubscriber) for s in subscribers),
+            "orders": len(self.channels),
+            "clients": len(self._per_client),
+            "queued_bytes": sum(s.queued_bytes for s in subscribers),
+            "max_queued_bytes": max((s.queued_bytes for s in subscribers), default=0),
+            "sent_bytes": sum(s.sent_bytes for s in subscribers),
+            "sent_messages": sum(s.sent_messages for s in subscribers),
+            "limits": {
+                "total": TRACKING_MAX_CONNECTIONS,
+                "per_order": TRACKING_MAX_PER_ORDER,
+                "per_client": TRACKING_MAX_PER_CLIENT,
+            },
+        }
+
+    def _channel(self, order_id: str) -> OrderChannel:
+        channel = self.channels.get(order_id)
+        if channel is None:
+            channel = self.channels[order_id] = OrderChannel(
+                order_id, self._evictor(order_id), self._retired.get(order_id)
+            )
+            self._retired.delete(order_id)
+        return channel
+
+    def disconnect(self, order_id: str, key: Hashable, close_code: Optional[int] = None):
+        """Unsubscribe a WebSocket (or stream); the order's channel stops with its last subscriber"""
+        channel = self.channels.get(order_id)
+        if channel is None or key not in channel.subscribers:
+            return
+        client = channel.subscribers[key].client
+        channel.remove(key, close_code)
+        self.connection_count -= 1
+        if self._per_client.get(client, 0) <= 1:
+            self._per_client.pop(client, None)
+        else:
+            self._per_client[client] -= 1
+        if not channel.subscribers:
+            channel.close()
+            del self.channels[order_id]
+            if channel.last is not None:
+                self._retired.set(order_id, channel.state)
+        print(f"❌ Tracking client disconnected: {order_id}")
+
+    def is_watched(self, order_id: str) -> bool:
+        return order_id in self.channels
+
+    def watched_order_ids(self) -> List[str]:
+        return list(self.channels)
 
     async def broadcast_order_update(self, order_id: str, order_data: dict):
-        """Broadcast order update to all connected clients"""
-        if order_id in self.active_connections:
-            for connection in list(self.active_connections[order_id]):
-                try:
-                    await connection.send_json(order_data)
-                except Exception as e:
-                    print(f"Error sending WebSocket message: {e}")
-                    self.disconnect(order_id, connection)
+        """Publish an order update to everyone watching it, on any worker"""
+        await self.backplane.publish(order_id, order_data)
+
+    async def _deliver(self, order_id: str, order_data: dict):
+        """Backplane handler: hand an update to this worker's subscribers (never blocks on clients)"""
+        channel = self.channels.get(order_id)
+        if channel is not None:
+            channel.publish(order_data)
+
+    async def send_order_snapshot(self, order_id: str, key: Hashable, order_data: dict):
+        """Queue the current order state for a single newly connected client"""
+        channel = self.channels.get(order_id)
+        if channel is not None:
+            channel.send_snapshot(key, order_data)
+
+    async def resume_or_snapshot(self, order_id: str, key: Hashable, last_event_id: Optional[str], order_data: dict):
+        """Replay what a reconnecting client missed, or send a snapshot if that is gone.
+
+        ``order_data`` is the freshly read order; it is also published so a
+        channel restored from an older state catches up.
+        """
+        channel = self.channels.get(order_id)
+        if channel is None:
+            return
+        if not last_event_id or not channel.resume(key, last_event_id):
+            channel.send_snapshot(key, order_data)
+        channel.publish(order_data)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """Send message to specific connection"""
@@ -46,4 +538,4 @@ class ConnectionManager:
 
 
 # Global connection manager
-manager = ConnectionManager()
+manager = ConnectionManager(build_backplane())
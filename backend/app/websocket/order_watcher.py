@@ -0,0 +1,266 @@
+"""Shared order watcher that pushes tracking updates to WebSocket clients.
+
+A single watcher per process replaces the old per-socket polling loop:
+
+- On a replica set it tails the ``orders`` change stream and only pushes an
+  update when an order somebody is watching actually changed.
+- On a standalone mongod (no change streams) it falls back to polling, with
+  every watched order id batched into one ``$in`` query per tick.
+
+With a shared tracking backplane (TRACKING_BACKPLANE=mongo) subscribers may
+be held by any worker, so the watcher publishes every order change instead
+of only the locally watched ones (polling then follows ``updated_at``). Only
+the worker holding the backplane's publisher lease watches; the others wait
+to take over, and every worker still delivers to its own sockets.
+
+Configuration (environment variables):
+- ORDER_WATCH_MODE: ``auto`` (default), ``changestream`` or ``poll``
+- ORDER_WATCH_POLL_SECONDS: polling interval for the fallback (default 2)
+- ORDER_WATCHER_ENABLED: set to 0 to not run the watcher on this worker (not
+  needed to keep a single publisher)
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.database import get_db
+from app.services.order_service import OrderService
+from app.websocket.backplane import TRACKING_PUBLISHER_LEASE_SECONDS
+from app.websocket.manager import ConnectionManager, manager
+
+ORDER_WATCH_MODE = os.getenv("ORDER_WATCH_MODE", "auto").strip().lower()
+ORDER_WATCH_POLL_SECONDS = float(os.getenv("ORDER_WATCH_POLL_SECONDS", "2"))
+ORDER_WATCHER_ENABLED = os.getenv("ORDER_WATCHER_ENABLED", "1") != "0"
+
+# How long to wait before re-opening a change stream after a transient error.
+_RESUME_BACKOFF_SECONDS = 1.0
+
+
+class OrderWatcher:
+    """Watch the orders collection and fan changes out through ConnectionManager"""
+
+    def __init__(self, connection_manager: ConnectionManager, poll_interval: float = ORDER_WATCH_POLL_SECONDS):
+        self.manager = connection_manager
+        self.poll_interval = poll_interval
+        self.mode: Optional[str] = None
+        # Publish every change, not just the orders watched on this worker.
+        self.watch_all = connection_manager.backplane.shared
+        self._task: Optional[asyncio.Task] = None
+        # Last payload pushed per watched order id, used to suppress no-op updates.
+        self._last_sent: Dict[str, Dict[str, Any]] = {}
+
+    def start(self):
+        """Start the background watcher task (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background watcher task (handing the publisher lease over)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if self.watch_all:
+                try:
+                    await self.manager.backplane.release_publisher()
+                except PyMongoError as e:
+                    print(f"⚠️  Could not release the tracking publisher lease: {e}")
+        self._last_sent.clear()
+
+    def prime(self, order_id: str, order: Dict[str, Any]):
+        """Record the snapshot a new subscriber was sent so it is not pushed again"""
+        self._last_sent.setdefault(order_id, order)
+
+    def forget(self, order_id: str):
+        """Drop cached state for an order nobody is watching anymore"""
+        if not self.manager.is_watched(order_id):
+            self._last_sent.pop(order_id, None)
+
+    async def _run(self):
+        if not self.watch_all:
+            await self._watch()
+            return
+
+        # One publisher for every worker: watch only while holding the lease.
+        backplane = self.manager.backplane
+        renew_seconds = TRACKING_PUBLISHER_LEASE_SECONDS / 3
+        while True:
+            if not await self._acquire_publisher(backplane):
+                await asyncio.sleep(renew_seconds)
+                continue
+
+            print("👑 Order watcher: publishing tracking updates for every worker")
+            watch = asyncio.create_task(self._watch())
+            try:
+                while True:
+                    await asyncio.wait({watch}, timeout=renew_seconds)
+                    if watch.done():
+                        watch.result()
+                        return
+                    if not await self._acquire_publisher(backplane):
+                        print("⚠️  Order watcher: lost the publisher lease")
+                        break
+            finally:
+                watch.cancel()
+                try:
+                    await watch
+                except asyncio.CancelledError:
+                    pass
+
+    async def _acquire_publisher(self, backplane) -> bool:
+        try:
+            return await backplane.acquire_publisher()
+        except PyMongoError as e:
+            print(f"⚠️  Order watcher could not renew the publisher lease: {e}")
+            return False
+
+    async def _watch(self):
+        if ORDER_WATCH_MODE in ("auto", "changestream"):
+            try:
+                await self._watch_change_stream()
+                return
+            except OperationFailure as e:
+                if ORDER_WATCH_MODE == "changestream":
+                    print(f"❌ Order change stream unavailable: {e}")
+                    raise
+                print(f"⚠️  Order change stream unavailable ({e.code}), falling back to polling")
+
+        await self._poll_loop()
+
+    async def _watch_change_stream(self):
+        """Tail the orders change stream, resuming after transient errors"""
+        db = get_db()
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        # Without a local copy of every order, let the server attach the document.
+        full_document = "updateLookup" if self.watch_all else None
+        resume_token = None
+        opened = False
+
+        while True:
+            try:
+                async with db.orders.watch(pipeline, resume_after=resume_token, full_document=full_document) as stream:
+                    if not opened:
+                        self.mode = "changestream"
+                        opened = True
+                        print("👀 Order watcher: using change stream")
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        await self._handle_change(change)
+            except OperationFailure:
+                # Not a replica set (or stream not resumable): let the caller decide.
+                if not opened:
+                    raise
+                resume_token = None
+                await asyncio.sleep(_RESUME_BACKOFF_SECONDS)
+            except PyMongoError as e:
+                print(f"⚠️  Order change stream interrupted: {e}")
+                await asyncio.sleep(_RESUME_BACKOFF_SECONDS)
+
+    async def _handle_change(self, change: Dict[str, Any]):
+        order_id = str(change["documentKey"]["_id"])
+        if self.watch_all:
+            doc = change.get("fullDocument")
+            if doc is not None:
+                await self.manager.broadcast_order_update(order_id, OrderService._serialize_order(doc))
+            return
+        if not self.manager.is_watched(order_id):
+            return
+
+        if change["operationType"] in ("insert", "replace"):
+            doc = change.get("fullDocument")
+        else:
+            doc = self._apply_update_description(order_id, change.get("updateDescription") or {})
+
+        if doc is None:
+            # Nothing cached (or a nested update we cannot apply): read it once.
+            doc = await get_db().orders.find_one({"_id": change["documentKey"]["_id"]})
+
+        if doc is not None:
+            await self._push(order_id, OrderService._serialize_order(doc))
+
+    def _apply_update_description(self, order_id: str, description: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Apply a change event's top-level field diff to the last pushed payload"""
+        last = self._last_sent.get(order_id)
+        if last is None:
+            return None
+
+        updated = description.get("updatedFields") or {}
+        removed = description.get("removedFields") or []
+        if description.get("truncatedArrays") or any("." in key for key in [*updated, *removed]):
+            return None
+
+        doc = {k: v for k, v in last.items() if k != "id"}
+        doc["_id"] = ObjectId(order_id)
+        doc.update(updated)
+        for key in removed:
+            doc.pop(key, None)
+        return doc
+
+    async def _poll_loop(self):
+        """Fallback for standalone mongod: one batched ``$in`` query per tick"""
+        self.mode = "poll"
+        print(f"👀 Order watcher: polling every {self.poll_interval}s")
+        if self.watch_all:
+            await self._poll_all()
+            return
+        db = get_db()
+
+        while True:
+            order_ids = self._watched_object_ids()
+            if order_ids:
+                try:
+                    docs = await db.orders.find({"_id": {"$in": order_ids}}).to_list(None)
+                    for doc in docs:
+                        await self._push(str(doc["_id"]), OrderService._serialize_order(doc))
+                except PyMongoError as e:
+                    print(f"⚠️  Order watcher poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _poll_all(self):
+        """Publish every order whose ``updated_at`` moved since the last tick"""
+        db = get_db()
+        watermark = datetime.utcnow().isoformat()
+
+        while True:
+            try:
+                docs = await db.orders.find({"updated_at": {"$gt": watermark}}).sort("updated_at", 1).to_list(None)
+                for doc in docs:
+                    watermark = max(watermark, doc["updated_at"])
+                    await self.manager.broadcast_order_update(str(doc["_id"]), OrderService._serialize_order(doc))
+            except PyMongoError as e:
+                print(f"⚠️  Order watcher poll failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    def _watched_object_ids(self) -> List[ObjectId]:
+        watched = self.manager.watched_order_ids()
+
+        # Forget state for orders whose last viewer left.
+        for stale in set(self._last_sent) - set(watched):
+            self.forget(stale)
+
+        oids = []
+        for order_id in watched:
+            try:
+                oids.append(ObjectId(order_id))
+            except (InvalidId, TypeError):
+                continue
+        return oids
+
+    async def _push(self, order_id: str, order: Dict[str, Any]):
+        """Broadcast the order only if it differs from what was last pushed"""
+        if self._last_sent.get(order_id) == order:
+            return
+        self._last_sent[order_id] = order
+        await self.manager.broadcast_order_update(order_id, order)
+
+
+# Global order watcher
+order_watcher = OrderWatcher(manager)
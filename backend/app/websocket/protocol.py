@@ -0,0 +1,133 @@
+"""Order tracking wire protocol.
+
+Version 1 (default, legacy clients): every message is the full order as JSON.
+
+Version 2 (``/ws/orders/{order_id}?protocol=2``): one full snapshot on
+connect, then only the top-level fields that changed::
+
+    {"v": 2, "type": "snapshot", "seq": 7, "order": {...}}
+    {"v": 2, "type": "delta", "seq": 8, "set": {"drone_lat": ..., "drone_lon": ...}}
+    {"v": 2, "type": "delta", "seq": 9, "set": {...}, "unset": ["eta"]}
+    {"v": 2, "type": "ping"}   (heartbeat: reply with any text, e.g. "pong")
+
+``seq`` increases by one per delta; a client that sees a gap should reconnect
+for a fresh snapshot.
+
+While an order is DELIVERING along a planned ``route`` (start, end, speed,
+departure time, ETA and timed waypoints), clients interpolate the drone
+position themselves: the simulator's per-tick position writes are not sent,
+only changes to the plan (a new route, a new ETA, completion). The snapshot
+carries ``server_time`` so clients can correct for clock skew. Version 2 messages are compact JSON text frames, or
+MessagePack binary frames with ``encoding=msgpack`` (when the optional
+``msgpack`` package is installed; otherwise JSON is used and the snapshot says
+so in its ``encoding`` field).
+
+Server-Sent Events carry the same version 2 messages: each is one event whose
+``event`` is the message type and whose ``id`` ends with its ``seq``, so
+browsers resume with ``Last-Event-ID`` automatically.
+
+Transport compression (permessage-deflate) is negotiated by the ASGI server;
+see WS_PER_MESSAGE_DEFLATE in main.py.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Tuple, Union
+
+from app.core.serialization import dumps
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+PROTOCOL_VERSION = 2
+
+Frame = Union[str, bytes]
+
+_MISSING = object()
+
+# Fields clients derive from the route while a delivery is in flight.
+INTERPOLATED_FIELDS = frozenset({"drone_lat", "drone_lon", "updated_at"})
+
+
+class TrackingFormat(NamedTuple):
+    """What a subscriber receives: protocol version and frame encoding"""
+
+    version: int = 1
+    encoding: str = "json"
+
+
+LEGACY_FORMAT = TrackingFormat()
+V2_FORMAT = TrackingFormat(2, "json")
+SSE_FORMAT = TrackingFormat(2, "sse")
+
+# Heartbeat for version 2 WebSockets; clients answer with any text frame.
+PING_MESSAGE = {"v": PROTOCOL_VERSION, "type": "ping"}
+
+
+def parse_format(params: Dict[str, str]) -> TrackingFormat:
+    """Tracking format requested in the WebSocket query string"""
+    try:
+        version = int(params.get("protocol", "1"))
+    except ValueError:
+        version = 1
+    if version < PROTOCOL_VERSION:
+        return LEGACY_FORMAT
+
+    encoding = params.get("encoding", "json").strip().lower()
+    if encoding != "msgpack" or msgpack is None:
+        encoding = "json"
+    return TrackingFormat(PROTOCOL_VERSION, encoding)
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """Top-level fields set/changed and removed between two order payloads"""
+    changed = {key: value for key, value in new.items() if old.get(key, _MISSING) != value}
+    removed = [key for key in old if key not in new]
+    return changed, removed
+
+
+def plan_changes(order: Dict[str, Any], changed: Dict[str, Any], removed: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """Drop position ticks of a planned delivery from a diff"""
+    if order.get("status") != "DELIVERING" or not order.get("route"):
+        return changed, removed
+    return (
+        {key: value for key, value in changed.items() if key not in INTERPOLATED_FIELDS},
+        [key for key in removed if key not in INTERPOLATED_FIELDS],
+    )
+
+
+def snapshot_message(order: Dict[str, Any], seq: int, fmt: TrackingFormat) -> Dict[str, Any]:
+    if fmt.version < PROTOCOL_VERSION:
+        return order
+    return {
+        "v": PROTOCOL_VERSION,
+        "type": "snapshot",
+        "seq": seq,
+        "encoding": fmt.encoding,
+        "server_time": datetime.utcnow().isoformat(),
+        "order": order,
+    }
+
+
+def delta_message(order: Dict[str, Any], changed: Dict[str, Any], removed: List[str], seq: int, fmt: TrackingFormat) -> Dict[str, Any]:
+    if fmt.version < PROTOCOL_VERSION:
+        return order
+    message = {"v": PROTOCOL_VERSION, "type": "delta", "seq": seq, "set": changed}
+    if removed:
+        message["unset"] = removed
+    return message
+
+
+def encode(message: Dict[str, Any], fmt: TrackingFormat, stream_id: str = "") -> Frame:
+    """Text frame (JSON or an SSE event) or binary frame (MessagePack).
+
+    ``stream_id`` prefixes SSE event ids (``<stream_id>-<seq>``) so a resume
+    is only attempted against the same sequence.
+    """
+    if fmt.encoding == "msgpack":
+        return msgpack.packb(message, default=str)
+    data = dumps(message).decode()
+    if fmt.encoding == "sse":
+        event_id = f"{stream_id}-{message['seq']}" if stream_id else message["seq"]
+        return f"id: {event_id}\nevent: {message['type']}\ndata: {data}\n\n"
+    return data
@@ -1,14 +1,28 @@
 """FastAPI main application for FastFood delivery system"""
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.database import connect_db, close_db
+from app.core.serialization import FastJSONResponse
 from app.api.routes import router
+from app.websocket.manager import manager
+from app.websocket.order_watcher import ORDER_WATCHER_ENABLED, order_watcher
+from app.services.fleet_simulator import FLEET_SIMULATOR_ENABLED, fleet_simulator
+from app.services.telemetry_service import telemetry_service
+from app.services.search_service import search_service
+from app.services.media_service import media_service
+from app.services.dispatch_service import AUTO_DISPATCH_ENABLED, dispatch_service
+
+# Compress WebSocket frames when the client offers permessage-deflate.
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "1") != "0"
 
 # Create FastAPI app
 app = FastAPI(
     title="FastFood Delivery API",
     description="Demo drone food delivery system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
 
 # Add CORS middleware
@@ -35,16 +49,34 @@ app.include_router(router)
 async def startup_event():
     """Connect to MongoDB on startup"""
     await connect_db()
+    await manager.start()
+    search_service.start()
+    if ORDER_WATCHER_ENABLED:
+        order_watcher.start()
+    if FLEET_SIMULATOR_ENABLED:
+        telemetry_service.start()
+        fleet_simulator.start()
+    if AUTO_DISPATCH_ENABLED:
+        dispatch_service.start()
     print("🚀 FastFood API started")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close MongoDB connection on shutdown"""
+    # Stop taking tracking connections and tell clients to reconnect elsewhere.
+    await manager.drain()
+    await dispatch_service.stop()
+    await fleet_simulator.stop()
+    await telemetry_service.stop()
+    await order_watcher.stop()
+    await search_service.stop()
+    media_service.close()
+    await manager.stop()
     await close_db()
     print("🛑 FastFood API stopped")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True, ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from app.services.search_service import SEARCH_KINDS, SearchIndex, tokenize
+
+VOCABULARY = [
+    "pizza", "pizzeria", "pepperoni", "spicy", "spice", "chicken", "chick",
+    "noodle", "noodles", "nori", "burger", "bun", "salad", "salsa", "taco", "tacos",
+]
+RESTAURANT_IDS = [f"r{i}" for i in range(5)]
+
+
+def _words(rng, low, high):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(low, high)))
+
+
+def _docs(rng, count):
+    docs = []
+    for rid in RESTAURANT_IDS:
+        docs.append(("restaurant", rid, {"name": _words(rng, 1, 3), "description": _words(rng, 0, 5)}))
+    for i in range(count):
+        docs.append((
+            "menu_item",
+            f"m{i}",
+            {
+                "name": _words(rng, 1, 3).title(),
+                "description": _words(rng, 0, 5),
+                "restaurant_id": rng.choice(RESTAURANT_IDS),
+            },
+        ))
+    return docs
+
+
+def _brute_force(docs, q, kinds, restaurant_id):
+    """doc key -> score of every match, scoring each document from scratch"""
+    words = tokenize(q)
+    phrase = " ".join(words)
+    scores = {}
+    for kind, doc_id, record in docs:
+        if kind not in kinds or (restaurant_id and record.get("restaurant_id") != restaurant_id):
+            continue
+        weights = {}
+        for field, weight in (("name", 3.0), ("description", 1.0)):
+            for term in set(tokenize(record.get(field))):
+                weights[term] = weights.get(term, 0.0) + weight
+        score = 0.0
+        for i, word in enumerate(words):
+            matches = [weight for term, weight in weights.items() if term == word]
+            if i == len(words) - 1 and len(word) >= 2:
+                matches += [weight * 0.8 for term, weight in weights.items() if term != word and term.startswith(word)]
+            if not matches:
+                break
+            score += max(matches)
+        else:
+            if " ".join(tokenize(record["name"])).startswith(phrase):
+                score += 2.0
+            scores[(kind, doc_id)] = score
+    return scores
+
+
+def _query(rng):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.5:
+        words[-1] = words[-1][:rng.randint(2, len(words[-1]))]
+    return " ".join(words)
+
+
+def _build(docs, bulk):
+    index = SearchIndex()
+    for kind, doc_id, record in docs:
+        index.add(kind, doc_id, record, bulk=bulk)
+    if bulk:
+        index.finish_bulk()
+    return index
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_search_matches_brute_force(bulk):
+    rng = random.Random(7)
+    docs = _docs(rng, 300)
+    index = _build(docs, bulk)
+
+    for _ in range(500):
+        q = _query(rng)
+        kinds = rng.choice([SEARCH_KINDS, ("restaurant",), ("menu_item",)])
+        restaurant_id = rng.choice([None, None, rng.choice(RESTAURANT_IDS)])
+        limit = rng.randint(1, 10)
+
+        expected = _brute_force(docs, q, kinds, restaurant_id)
+        results = index.search(q, kinds=kinds, restaurant_id=restaurant_id, limit=limit)
+
+        best = sorted((round(score, 3) for score in expected.values()), reverse=True)[:limit]
+        assert [r["score"] for r in results] == best, q
+        for r in results:
+            assert round(expected[(r["type"], r["id"])], 3) == r["score"], q
+
+
+def test_prefix_only_match_scores_below_whole_word():
+    index = SearchIndex()
+    index.add("menu_item", "1", {"name": "Pepperoni Pizza", "description": "", "restaurant_id": "r0"})
+
+    assert index.search("pizza")[0]["score"] == 3.0
+    assert index.search("piz")[0]["score"] == 2.4
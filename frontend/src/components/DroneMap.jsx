@@ -23,7 +23,23 @@ function clamp01(x) {
   return Math.max(0, Math.min(1, x));
 }
 
-function DroneMap({ startLat, startLng, endLat, endLng, progress }) {
+// Position at fraction `t` of a planned flight: `waypoints` are
+// [lat, lng, secondsAfterDeparture] points published with the route.
+export function positionAlong(waypoints, t) {
+  const duration = waypoints[waypoints.length - 1][2];
+  const at = clamp01(t) * duration;
+  for (let i = 1; i < waypoints.length; i += 1) {
+    const [lat0, lng0, t0] = waypoints[i - 1];
+    const [lat1, lng1, t1] = waypoints[i];
+    if (at <= t1 || i === waypoints.length - 1) {
+      const f = t1 > t0 ? clamp01((at - t0) / (t1 - t0)) : 1;
+      return [lerp(lat0, lat1, f), lerp(lng0, lng1, f)];
+    }
+  }
+  return [waypoints[0][0], waypoints[0][1]];
+}
+
+function DroneMap({ startLat, startLng, endLat, endLng, progress, waypoints }) {
   const sLat = Number(startLat);
   const sLng = Number(startLng);
   const rawELat = Number(endLat);
@@ -38,23 +54,26 @@ function DroneMap({ startLat, startLng, endLat, endLng, progress }) {
   // Demo safeguard: if start/end are identical, nudge the end point a bit so
   // the polyline and movement are visible.
   const samePoint = sLat === rawELat && sLng === rawELng;
+  const hasPlan = !samePoint && Array.isArray(waypoints) && waypoints.length >= 2;
   const eLat = samePoint ? sLat + 0.01 : rawELat;
   const eLng = samePoint ? sLng + 0.01 : rawELng;
 
   // Required: t = progress / 100
   const t = clamp01(Number(progress) / 100);
 
-  // Required linear interpolation (guarantees 100% => exactly at destination)
-  const droneLat = lerp(sLat, eLat, t);
-  const droneLng = lerp(sLng, eLng, t);
-  const dronePos = [droneLat, droneLng];
+  // Follow the planned great-circle waypoints when the server sent them,
+  // otherwise interpolate linearly (100% => exactly at destination).
+  const dronePos = hasPlan ? positionAlong(waypoints, t) : [lerp(sLat, eLat, t), lerp(sLng, eLng, t)];
 
   const polylinePositions = useMemo(() => {
+    if (hasPlan) {
+      return waypoints.map(([lat, lng]) => [lat, lng]);
+    }
     return [
       [sLat, sLng],
       [eLat, eLng],
     ];
-  }, [sLat, sLng, eLat, eLng]);
+  }, [hasPlan, waypoints, sLat, sLng, eLat, eLng]);
 
   const bounds = polylinePositions;
 
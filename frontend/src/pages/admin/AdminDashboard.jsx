@@ -6,14 +6,27 @@ import { useNavigate } from "react-router-dom";
 import api from "../../services/api";
 import "./Admin.css";
 
+// Detail lists are paginated; the overview tab is a single aggregated request.
+const PAGE_SIZE = 20;
+const LIST_ENDPOINTS = {
+  restaurants: "/admin/restaurants",
+  drones: "/admin/drones",
+  users: "/admin/users",
+  orders: "/admin/orders",
+};
+const EMPTY_LIST = { data: [], next_cursor: null, loaded: false };
+
 function AdminDashboard() {
   const navigate = useNavigate();
   const user = JSON.parse(localStorage.getItem("user") || "{}");
-  const [activeTab, setActiveTab] = useState("restaurants");
-  const [restaurants, setRestaurants] = useState([]);
-  const [drones, setDrones] = useState([]);
-  const [users, setUsers] = useState([]);
-  const [orders, setOrders] = useState([]);
+  const [activeTab, setActiveTab] = useState("overview");
+  const [overview, setOverview] = useState(null);
+  const [lists, setLists] = useState({
+    restaurants: EMPTY_LIST,
+    drones: EMPTY_LIST,
+    users: EMPTY_LIST,
+    orders: EMPTY_LIST,
+  });
   const [loading, setLoading] = useState(true);
   const [newRestaurant, setNewRestaurant] = useState({
     name: "",
@@ -30,34 +43,62 @@ function AdminDashboard() {
     restaurant_id: "",
   });
 
+  const restaurants = lists.restaurants.data;
+  const drones = lists.drones.data;
+  const users = lists.users.data;
+  const orders = lists.orders.data;
+
   useEffect(() => {
     if (!user || user.role !== "ADMIN") {
       navigate("/login", { replace: true });
       return;
     }
-    fetchAllData();
+    fetchOverview().finally(() => setLoading(false));
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
-  const fetchAllData = async () => {
+  // Load a tab's first page the first time it is opened (the drone form also needs restaurants).
+  useEffect(() => {
+    const needed = activeTab === "drones" ? ["drones", "restaurants"] : [activeTab];
+    needed
+      .filter((kind) => LIST_ENDPOINTS[kind] && !lists[kind].loaded)
+      .forEach((kind) => loadList(kind));
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [activeTab]);
+
+  const fetchOverview = async () => {
     try {
-      const [restRes, droneRes, usersRes, ordersRes] = await Promise.all([
-        api.get("/admin/restaurants"),
-        api.get("/admin/drones"),
-        api.get("/admin/users"),
-        api.get("/admin/orders"),
-      ]);
-      setRestaurants(restRes.data);
-      setDrones(droneRes.data);
-      setUsers(usersRes.data);
-      setOrders(ordersRes.data);
-      setLoading(false);
+      const res = await api.get("/admin/overview");
+      setOverview(res.data);
     } catch (error) {
-      console.error("Error fetching data:", error);
-      setLoading(false);
+      console.error("Error fetching overview:", error);
     }
   };
 
+  // First page when cursor is null, otherwise append the next page.
+  const loadList = async (kind, cursor = null) => {
+    try {
+      const res = await api.get(LIST_ENDPOINTS[kind], { params: { limit: PAGE_SIZE, cursor } });
+      setLists((prev) => ({
+        ...prev,
+        [kind]: {
+          data: cursor ? [...prev[kind].data, ...res.data.data] : res.data.data,
+          next_cursor: res.data.next_cursor,
+          loaded: true,
+        },
+      }));
+    } catch (error) {
+      console.error(`Error fetching ${kind}:`, error);
+    }
+  };
+
+  const renderLoadMore = (kind) =>
+    lists[kind].next_cursor ? (
+      <button onClick={() => loadList(kind, lists[kind].next_cursor)} className="btn btn-primary">
+        ⬇️ Load more
+      </button>
+    ) : null;
+
   const handleCreateRestaurant = async () => {
     if (!newRestaurant.name || !newRestaurant.owner_id || !newRestaurant.owner_username) {
       alert("❌ Please fill in name, owner ID, and owner username");
@@ -85,7 +126,7 @@ function AdminDashboard() {
 
       setNewRestaurant({ name: "", owner_id: "", owner_username: "", description: "", address: "", phone: "" });
       setNewRestaurantImage(null);
-      await fetchAllData();
+      await Promise.all([fetchOverview(), loadList("restaurants")]);
       alert("✅ Restaurant created!");
     } catch (error) {
       const status = error?.response?.status;
@@ -116,13 +157,8 @@ function AdminDashboard() {
         alert("✅ Drone created successfully");
         setNewDrone({ name: "", restaurant_id: "" });
 
-        // Refresh drones list immediately (don’t fail the UX if another tab’s data has issues)
-        try {
-          const droneRes = await api.get("/admin/drones");
-          setDrones(droneRes.data);
-        } catch (refreshError) {
-          console.warn("Failed to refresh drones list:", refreshError);
-        }
+        // Refresh the first drones page and the counts (don’t fail the UX if the refresh fails)
+        await Promise.all([fetchOverview(), loadList("drones")]);
       } else {
         alert("❌ Failed to create drone");
       }
@@ -161,6 +197,12 @@ function AdminDashboard() {
       </div>
 
       <div className="tabs">
+        <button
+          className={`tab ${activeTab === "overview" ? "active" : ""}`}
+          onClick={() => setActiveTab("overview")}
+        >
+          📊 Overview
+        </button>
         <button
           className={`tab ${activeTab === "restaurants" ? "active" : ""}`}
           onClick={() => setActiveTab("restaurants")}
@@ -188,6 +230,90 @@ function AdminDashboard() {
       </div>
 
       <div className="content">
+        {activeTab === "overview" && (
+          <div>
+            <h2>System Overview</h2>
+            {!overview ? (
+              <p className="empty-state">Overview unavailable</p>
+            ) : (
+              <>
+                <div className="grid">
+                  <div className="item-card">
+                    <h4>📋 Orders: {overview.orders.total}</h4>
+                    <p>Active: {overview.orders.active}</p>
+                    <p>Revenue: ${overview.orders.revenue?.toFixed(2)}</p>
+                    {Object.entries(overview.orders.by_status).map(([status, count]) => (
+                      <p key={status}>{status}: {count}</p>
+                    ))}
+                  </div>
+                  <div className="item-card">
+                    <h4>🚁 Drones: {overview.fleet.total}</h4>
+                    <p>Utilization: {(overview.fleet.utilization * 100).toFixed(0)}% ({overview.fleet.busy} busy)</p>
+                    {Object.entries(overview.fleet.by_status).map(([status, count]) => (
+                      <p key={status}>{status}: {count}</p>
+                    ))}
+                  </div>
+                  <div className="item-card">
+                    <h4>👥 Users: {overview.users.total}</h4>
+                    {Object.entries(overview.users.by_role).map(([role, count]) => (
+                      <p key={role}>{role}: {count}</p>
+                    ))}
+                  </div>
+                  <div className="item-card">
+                    <h4>🏪 Restaurants: {overview.restaurants.total}</h4>
+                  </div>
+                </div>
+
+                <div className="items-list">
+                  <h3>Restaurants</h3>
+                  {overview.restaurants.summaries.length === 0 ? (
+                    <p className="empty-state">No orders yet</p>
+                  ) : (
+                    <div className="table-view">
+                      <table>
+                        <thead>
+                          <tr>
+                            <th>Restaurant</th>
+                            <th>Orders</th>
+                            <th>Active</th>
+                            <th>Revenue</th>
+                            <th>Drones (busy)</th>
+                          </tr>
+                        </thead>
+                        <tbody>
+                          {overview.restaurants.summaries.map((rest) => (
+                            <tr key={rest.restaurant_id}>
+                              <td>{rest.name || rest.restaurant_id?.substring(0, 8)}</td>
+                              <td>{rest.orders}</td>
+                              <td>{rest.active_orders}</td>
+                              <td>${rest.revenue?.toFixed(2)}</td>
+                              <td>{rest.drones} ({rest.busy_drones})</td>
+                            </tr>
+                          ))}
+                        </tbody>
+                      </table>
+                    </div>
+                  )}
+                </div>
+
+                <div className="items-list">
+                  <h3>Recent Orders</h3>
+                  <div className="grid">
+                    {overview.orders.recent.map((order) => (
+                      <div key={order.id} className="item-card">
+                        <h4>Order #{order.id?.substring(0, 8)}</h4>
+                        <p>Status: {order.status}</p>
+                        <p>Total: ${order.total?.toFixed(2)}</p>
+                        <p>Items: {order.item_count}</p>
+                      </div>
+                    ))}
+                  </div>
+                </div>
+              </>
+            )}
+          </div>
+        )}
+
         {activeTab === "restaurants" && (
           <div>
             <h2>Restaurant Management</h2>
@@ -267,6 +393,7 @@ function AdminDashboard() {
                   ))}
                 </div>
               )}
+              {renderLoadMore("restaurants")}
             </div>
           </div>
         )}
@@ -315,6 +442,7 @@ function AdminDashboard() {
                   ))}
                 </div>
               )}
+              {renderLoadMore("drones")}
             </div>
           </div>
         )}
@@ -351,6 +479,7 @@ function AdminDashboard() {
                   </table>
                 </div>
               )}
+              {renderLoadMore("users")}
             </div>
           </div>
         )}
@@ -368,12 +497,13 @@ function AdminDashboard() {
                       <h4>Order #{order.id?.substring(0, 8)}</h4>
                       <p>Status: <span style={{ fontWeight: "bold", color: order.status === "COMPLETED" ? "green" : "orange" }}>{order.status}</span></p>
                       <p>Total: ${order.total?.toFixed(2)}</p>
-                      <p>Items: {order.items?.length}</p>
+                      <p>Items: {order.item_count ?? order.items?.length}</p>
                       <p className="id">Customer: {order.customer_id?.substring(0, 8)}</p>
                     </div>
                   ))}
                 </div>
               )}
+              {renderLoadMore("orders")}
             </div>
           </div>
         )}
@@ -9,8 +9,15 @@ import "./Customer.css";
 function CustomerHome() {
   const [restaurants, setRestaurants] = useState([]);
   const [loading, setLoading] = useState(true);
-  const [currentPage, setCurrentPage] = useState(1);
-  const [totalPages, setTotalPages] = useState(1);
+  // Keyset pagination: the API hands back opaque cursors for the adjacent pages.
+  const [cursor, setCursor] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [prevCursor, setPrevCursor] = useState(null);
+  // { lat, lon } while browsing restaurants near the customer (nearest first)
+  const [nearby, setNearby] = useState(null);
+  // Search box: hits for the current query (null when the box is empty)
+  const [query, setQuery] = useState("");
+  const [searchResults, setSearchResults] = useState(null);
   const navigate = useNavigate();
   const [user, setUser] = useState(() => {
     try {
@@ -36,17 +43,42 @@ function CustomerHome() {
   }, []);
 
   useEffect(() => {
-    fetchRestaurants(currentPage);
-  }, [currentPage]);
+    fetchRestaurants(cursor);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [cursor, nearby]);
 
-  const fetchRestaurants = async (page) => {
+  useEffect(() => {
+    const q = query.trim();
+    if (q.length < 2) {
+      setSearchResults(null);
+      return undefined;
+    }
+    // Debounce keystrokes; drop answers to queries the user has typed past.
+    let stale = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.get("/search", { params: { q, limit: 20 } });
+        if (!stale) setSearchResults(response.data.data);
+      } catch (error) {
+        console.error("Error searching:", error);
+      }
+    }, 200);
+    return () => {
+      stale = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
+
+  const fetchRestaurants = async (pageCursor) => {
     try {
       setLoading(true);
-      const response = await api.get("/restaurants", {
-        params: { page, limit: 10 }
-      });
+      const params = { limit: 10, ...(pageCursor ? { cursor: pageCursor } : {}) };
+      const response = nearby
+        ? await api.get("/restaurants/nearby", { params: { ...params, lat: nearby.lat, lon: nearby.lon } })
+        : await api.get("/restaurants", { params });
       setRestaurants(response.data.data);
-      setTotalPages(response.data.totalPages);
+      setNextCursor(response.data.next_cursor);
+      setPrevCursor(response.data.prev_cursor);
       setLoading(false);
     } catch (error) {
       console.error("Error fetching restaurants:", error);
@@ -54,6 +86,25 @@ function CustomerHome() {
     }
   };
 
+  const toggleNearby = () => {
+    if (nearby) {
+      setCursor(null);
+      setNearby(null);
+      return;
+    }
+    if (!navigator.geolocation) {
+      alert("❌ Location is not available in this browser");
+      return;
+    }
+    navigator.geolocation.getCurrentPosition(
+      (position) => {
+        setCursor(null);
+        setNearby({ lat: position.coords.latitude, lon: position.coords.longitude });
+      },
+      () => alert("❌ Could not get your location")
+    );
+  };
+
   const handleSelectRestaurant = (restaurantId) => {
     navigate(`/customer/checkout/${restaurantId}`);
   };
@@ -105,10 +156,45 @@ function CustomerHome() {
       </div>
 
       <div className="content">
-        <h2>Browse Restaurants</h2>
+        <input
+          type="search"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          placeholder="🔎 Search restaurants and dishes..."
+          style={{ width: "100%", padding: "10px", marginBottom: "16px" }}
+        />
+        {searchResults && (
+          <div className="search-results" style={{ marginBottom: "24px" }}>
+            {searchResults.length === 0 ? (
+              <p className="empty-state">No matches for “{query.trim()}”.</p>
+            ) : (
+              searchResults.map((hit) => (
+                <div
+                  key={`${hit.type}:${hit.id}`}
+                  className="restaurant-card"
+                  style={{ cursor: "pointer", marginBottom: "8px" }}
+                  onClick={() => handleSelectRestaurant(hit.type === "restaurant" ? hit.id : hit.restaurant_id)}
+                >
+                  <strong>{hit.type === "restaurant" ? "🏪" : "🍽️"} {hit.name}</strong>
+                  {hit.type === "menu_item" && (
+                    <span>
+                      {" "}— {hit.restaurant_name || "Restaurant"}
+                      {hit.price != null ? ` · $${Number(hit.price).toFixed(2)}` : ""}
+                    </span>
+                  )}
+                </div>
+              ))
+            )}
+          </div>
+        )}
+
+        <h2>{nearby ? "Restaurants Near You" : "Browse Restaurants"}</h2>
+        <button onClick={toggleNearby} className="btn btn-secondary">
+          {nearby ? "🌍 All restaurants" : "📍 Near me"}
+        </button>
 
         {restaurants.length === 0 ? (
-          <p className="empty-state">No restaurants available yet.</p>
+          <p className="empty-state">{nearby ? "No restaurants nearby." : "No restaurants available yet."}</p>
         ) : (
           <>
             <div className="restaurants-grid">
@@ -129,7 +215,10 @@ function CustomerHome() {
                     <h3>{restaurant.name}</h3>
                   </div>
                   <p className="restaurant-description">{restaurant.description || "No description"}</p>
-                  <p className="restaurant-address">📍 {restaurant.address || "Address not provided"}</p>
+                  <p className="restaurant-address">
+                    📍 {restaurant.address || "Address not provided"}
+                    {restaurant.distance_m != null ? ` (${(restaurant.distance_m / 1000).toFixed(1)} km)` : ""}
+                  </p>
                   <p className="restaurant-phone">📞 {restaurant.phone || "Phone not provided"}</p>
                   <button
                     onClick={() => handleSelectRestaurant(restaurant.id)}
@@ -141,22 +230,19 @@ function CustomerHome() {
               ))}
             </div>
 
-            {totalPages > 1 && (
+            {(prevCursor || nextCursor) && (
               <div className="pagination-controls" style={{ marginTop: "24px", textAlign: "center" }}>
                 <button
-                  onClick={() => setCurrentPage(Math.max(1, currentPage - 1))}
-                  disabled={currentPage === 1}
+                  onClick={() => setCursor(prevCursor)}
+                  disabled={!prevCursor}
                   className="btn btn-secondary"
                   style={{ marginRight: "12px" }}
                 >
                   ← Previous
                 </button>
-                <span style={{ marginRight: "12px", fontSize: "16px", fontWeight: "bold" }}>
-                  Page {currentPage} of {totalPages}
-                </span>
                 <button
-                  onClick={() => setCurrentPage(Math.min(totalPages, currentPage + 1))}
-                  disabled={currentPage === totalPages}
+                  onClick={() => setCursor(nextCursor)}
+                  disabled={!nextCursor}
                   className="btn btn-secondary"
                 >
                   Next →
@@ -11,11 +11,17 @@ function CustomerOrders() {
   const user = JSON.parse(localStorage.getItem("user") || "{}");
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(true);
+  // Cursor of the next (older) page; null once the whole history is loaded.
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
-  const fetchOrders = useCallback(async () => {
+  const fetchOrders = useCallback(async (cursor = null) => {
     try {
-      const response = await api.get(`/customer/${user.id}/orders`);
-      setOrders(response.data);
+      const response = await api.get(`/customer/${user.id}/orders`, {
+        params: { limit: 50, ...(cursor ? { cursor } : {}) },
+      });
+      setOrders((prev) => (cursor ? [...prev, ...response.data.data] : response.data.data));
+      setNextCursor(response.data.next_cursor);
       setLoading(false);
     } catch (error) {
       console.error("Error fetching orders:", error);
@@ -23,6 +29,12 @@ function CustomerOrders() {
     }
   }, [user.id]);
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    await fetchOrders(nextCursor);
+    setLoadingMore(false);
+  };
+
   useEffect(() => {
     if (!user?.id) {
       navigate("/login", { replace: true });
@@ -62,7 +74,7 @@ function CustomerOrders() {
                   </span>
                 </div>
                 <p>Total: ${order.total?.toFixed(2)}</p>
-                <p>Items: {order.items?.length}</p>
+                <p>Items: {order.item_count ?? order.items?.length}</p>
                 <button
                   onClick={() => handleTrackOrder(order.id)}
                   className="btn btn-primary btn-small"
@@ -73,6 +85,11 @@ function CustomerOrders() {
             ))}
           </div>
         )}
+        {nextCursor && (
+          <button onClick={handleLoadMore} disabled={loadingMore} className="btn btn-primary">
+            {loadingMore ? "⏳ Loading..." : "⬇️ Load more"}
+          </button>
+        )}
       </div>
     </div>
   );
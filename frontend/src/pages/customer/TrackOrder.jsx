@@ -3,14 +3,27 @@
  */
 import React, { useState, useEffect, useRef, useCallback } from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import api from "../../services/api";
-import DroneMap from "../../components/DroneMap";
+import api, { API_BASE_URL } from "../../services/api";
+import DroneMap, { positionAlong } from "../../components/DroneMap";
 import "./Customer.css";
 
 function clamp01(x) {
   return Math.max(0, Math.min(1, x));
 }
 
+// Server timestamps are naive UTC ISO strings.
+function parseUtc(iso) {
+  return Date.parse(iso.endsWith("Z") ? iso : `${iso}Z`);
+}
+
+// Percent of a planned flight completed at `nowMs` (server clock).
+function routeProgress(route, nowMs) {
+  const departed = parseUtc(route.departed_at);
+  const eta = parseUtc(route.eta);
+  if (!(eta > departed)) return 100;
+  return Math.round(clamp01((nowMs - departed) / (eta - departed)) * 1000) / 10;
+}
+
 function CustomerTrackOrder() {
   const { orderId } = useParams();
   const navigate = useNavigate();
@@ -18,9 +31,12 @@ function CustomerTrackOrder() {
   const orderStatus = order?.status;
   const droneLat = order?.drone_lat;
   const droneLon = order?.drone_lon;
+  const route = order?.route;
   const [loading, setLoading] = useState(true);
   const [paymentDone, setPaymentDone] = useState(false);
   const wsRef = useRef(null);
+  // Server clock minus local clock, from the tracking snapshot.
+  const clockOffsetRef = useRef(0);
   const [progress, setProgress] = useState(0);
   const [completing, setCompleting] = useState(false);
   const [deliveredMessage, setDeliveredMessage] = useState("");
@@ -41,21 +57,86 @@ function CustomerTrackOrder() {
     }
   }, [orderId]);
 
+  // Apply one protocol 2 tracking message; returns false on a sequence gap.
+  const applyTrackingMessage = useCallback((message, seqRef) => {
+    if (message.type === "snapshot") {
+      seqRef.current = message.seq;
+      if (message.server_time) {
+        clockOffsetRef.current = parseUtc(message.server_time) - Date.now();
+      }
+      setOrder(message.order);
+      return true;
+    }
+    if (message.type !== "delta" || seqRef.current === null) return true;
+    if (message.seq !== seqRef.current + 1) return false;
+    seqRef.current = message.seq;
+    setOrder((prev) => {
+      const next = { ...prev, ...message.set };
+      (message.unset || []).forEach((key) => delete next[key]);
+      return next;
+    });
+    return true;
+  }, []);
+
+  // Fallback for networks that block WebSockets: the same messages over SSE.
+  // EventSource reconnects by itself and resumes with Last-Event-ID.
+  const setupEventSource = useCallback(() => {
+    const source = new EventSource(`${API_BASE_URL}/sse/orders/${orderId}`);
+    const seqRef = { current: null };
+    const onMessage = (event) => {
+      if (!applyTrackingMessage(JSON.parse(event.data), seqRef)) {
+        source.close();
+        setupEventSource();
+      }
+    };
+    source.addEventListener("snapshot", onMessage);
+    source.addEventListener("delta", onMessage);
+    wsRef.current = source;
+  }, [orderId, applyTrackingMessage]);
+
   const setupWebSocket = useCallback(() => {
-    const wsUrl = `ws://localhost:8000/ws/orders/${orderId}`;
+    // Protocol 2: one snapshot, then only the fields that changed.
+    const wsUrl = `ws://localhost:8000/ws/orders/${orderId}?protocol=2`;
     const wsConnection = new WebSocket(wsUrl);
+    const seqRef = { current: null };
+    let opened = false;
+
+    wsConnection.onopen = () => {
+      opened = true;
+    };
 
     wsConnection.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      setOrder(data);
+      const message = JSON.parse(event.data);
+      if (message.type === "ping") {
+        wsConnection.send("pong");
+        return;
+      }
+      if (!applyTrackingMessage(message, seqRef)) {
+        // Missed an update: reconnect for a fresh snapshot.
+        wsConnection.close();
+        setupWebSocket();
+      }
     };
 
     wsConnection.onerror = (error) => {
       console.error("WebSocket error:", error);
+      if (!opened && wsRef.current === wsConnection) {
+        setupEventSource();
+      }
+    };
+
+    // Server restart (1012), overload (1013) or idle reaping (1001): reconnect
+    // after a short, jittered delay so clients do not all return at once.
+    wsConnection.onclose = (event) => {
+      if (opened && wsRef.current === wsConnection && [1001, 1012, 1013].includes(event.code)) {
+        setTimeout(() => {
+          if (wsRef.current === wsConnection) setupWebSocket();
+        }, 1000 + Math.random() * 2000);
+      }
     };
 
     wsRef.current = wsConnection;
-  }, [orderId]);
+  }, [orderId, applyTrackingMessage, setupEventSource]);
 
   useEffect(() => {
     fetchOrder();
@@ -74,6 +155,14 @@ function CustomerTrackOrder() {
       return;
     }
 
+    if (route) {
+      // The server only sends plan changes: animate along the route locally.
+      const tick = () => setProgress(routeProgress(route, Date.now() + clockOffsetRef.current));
+      tick();
+      const intervalId = setInterval(tick, 250);
+      return () => clearInterval(intervalId);
+    }
+
     if (!startPoint && droneLat != null && droneLon != null) {
       setStartPoint({ lat: droneLat, lng: droneLon });
     }
@@ -87,7 +176,7 @@ function CustomerTrackOrder() {
     }, 1000);
 
     return () => clearInterval(intervalId);
-  }, [orderStatus, droneLat, droneLon, startPoint]);
+  }, [orderStatus, droneLat, droneLon, startPoint, route]);
 
   useEffect(() => {
     const shouldComplete = orderStatus === "DELIVERING" && progress >= 100;
@@ -169,13 +258,20 @@ function CustomerTrackOrder() {
     );
   }
 
+  // Planned flights start at the route origin, older ones where the drone was first seen.
+  const flightStart = route ? { lat: route.start_lat, lng: route.start_lon } : startPoint;
+
   const simulatedDronePosition = (() => {
-    if (!startPoint) return null;
+    if (!flightStart) return null;
     if (order?.delivery_lat == null || order?.delivery_lon == null) return null;
 
     const t = clamp01(Number(progress) / 100);
-    const lat = startPoint.lat + (order.delivery_lat - startPoint.lat) * t;
-    const lng = startPoint.lng + (order.delivery_lon - startPoint.lng) * t;
+    if (route?.waypoints?.length >= 2) {
+      const [lat, lng] = positionAlong(route.waypoints, t);
+      return { lat, lng };
+    }
+    const lat = flightStart.lat + (order.delivery_lat - flightStart.lat) * t;
+    const lng = flightStart.lng + (order.delivery_lon - flightStart.lng) * t;
 
     return { lat, lng };
   })();
@@ -223,13 +319,14 @@ function CustomerTrackOrder() {
           {order.status === "DELIVERING" && order.drone_id && (
             <div className="drone-tracking">
               <h3>🚁 Drone Tracking</h3>
-              {startPoint && order.delivery_lat != null && order.delivery_lon != null ? (
+              {flightStart && order.delivery_lat != null && order.delivery_lon != null ? (
                 <div style={{ marginBottom: 12 }}>
                   <DroneMap
-                    startLat={startPoint.lat}
-                    startLng={startPoint.lng}
+                    startLat={flightStart.lat}
+                    startLng={flightStart.lng}
                     endLat={order.delivery_lat}
                     endLng={order.delivery_lon}
+                    waypoints={route?.waypoints}
                     progress={progress}
                   />
                 </div>
@@ -252,13 +349,14 @@ function CustomerTrackOrder() {
             </div>
           )}
 
-          {order.status === "COMPLETED" && startPoint && (
+          {order.status === "COMPLETED" && flightStart && (
             <div style={{ marginTop: 16 }}>
               <DroneMap
-                startLat={startPoint.lat}
-                startLng={startPoint.lng}
+                startLat={flightStart.lat}
+                startLng={flightStart.lng}
                 endLat={order.delivery_lat}
                 endLng={order.delivery_lon}
+                waypoints={route?.waypoints}
                 progress={100}
               />
             </div>
@@ -1,7 +1,7 @@
 /**
  * Restaurant Dashboard
  */
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useNavigate, useParams } from "react-router-dom";
 import api from "../../services/api";
 import "./Restaurant.css";
@@ -27,6 +27,8 @@ function RestaurantDashboard() {
     price: "",
   });
   const [newItemImage, setNewItemImage] = useState(null);
+  // `since` watermark of the last dashboard response, for incremental refreshes
+  const sinceRef = useRef(null);
 
   const effectiveRestaurantId = params.restaurantId || user.restaurant_id;
 
@@ -45,17 +47,15 @@ function RestaurantDashboard() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [effectiveRestaurantId]);
 
+  const dashboardUrl = `/restaurant/${effectiveRestaurantId}/dashboard`;
+
   const fetchData = async () => {
     try {
       setErrorMessage("");
       
-      // Fetch restaurant details with ownership check
-      const restaurantRes = await api.get(
-        `/restaurants/${effectiveRestaurantId}`,
-        { params: { username: user.username, role: user.role } }
-      );
-      
-      const restaurantData = restaurantRes.data;
+      // Restaurant (with ownership check), active orders, menu and drones in one call
+      const res = await api.get(dashboardUrl, { params: { username: user.username, role: user.role } });
+      const restaurantData = res.data.restaurant;
       
       // Verify ownership with case-insensitive and trimmed comparison
       const ownerUsername = restaurantData.owner_username?.trim().toLowerCase();
@@ -74,14 +74,10 @@ function RestaurantDashboard() {
       
       console.log("[OWNERSHIP CHECK] ALLOWED");
       setRestaurant(restaurantData);
-      
-      const [ordersRes, menuRes] = await Promise.all([
-        api.get(`/restaurant/${effectiveRestaurantId}/orders`),
-        api.get(`/restaurants/${effectiveRestaurantId}/menu`),
-      ]);
-
-      setOrders(Array.isArray(ordersRes.data) ? ordersRes.data : []);
-      setMenuItems(Array.isArray(menuRes.data) ? menuRes.data : []);
+      setOrders(Array.isArray(res.data.orders) ? res.data.orders : []);
+      setMenuItems(Array.isArray(res.data.menu) ? res.data.menu : []);
+      setAvailableDrones(Array.isArray(res.data.drones) ? res.data.drones : []);
+      sinceRef.current = res.data.since;
       setLoading(false);
     } catch (error) {
       console.error("Error fetching data:", error);
@@ -102,6 +98,26 @@ function RestaurantDashboard() {
     }
   };
 
+  // Orders changed since the last response (completed ones drop out) and the current drones.
+  const refreshOrders = async () => {
+    if (!sinceRef.current) return fetchData();
+    const res = await api.get(dashboardUrl, {
+      params: { username: user.username, role: user.role, since: sinceRef.current },
+    });
+    const changed = Array.isArray(res.data.orders) ? res.data.orders : [];
+    setOrders((prev) => {
+      const byId = new Map(prev.map((order) => [order.id, order]));
+      changed.forEach((order) => {
+        if (order.status === "COMPLETED") byId.delete(order.id);
+        else byId.set(order.id, order);
+      });
+      return [...byId.values()].sort((a, b) => (b.updated_at || "").localeCompare(a.updated_at || ""));
+    });
+    setAvailableDrones(Array.isArray(res.data.drones) ? res.data.drones : []);
+    sinceRef.current = res.data.since;
+    return res.data;
+  };
+
   const handleAddMenuItem = async () => {
     if (!newItem.name || !newItem.price) {
       alert("❌ Please fill in name and price");
@@ -125,7 +141,8 @@ function RestaurantDashboard() {
       formData.append("image", newItemImage);
 
       // Do NOT set Content-Type manually; axios will add the correct boundary.
-      await api.post("/restaurant/menu", formData);
+      // The image uploads in the background; image_url shows up on a later refresh.
+      await api.post("/restaurant/menu", formData, { params: { background: true } });
 
       setNewItem({ name: "", description: "", price: "" });
       setNewItemImage(null);
@@ -147,7 +164,7 @@ function RestaurantDashboard() {
   const handleAcceptOrder = async (orderId) => {
     try {
       await api.post(`/restaurant/orders/${orderId}/accept`);
-      await fetchData();
+      await refreshOrders();
       alert("✅ Order accepted!");
     } catch (error) {
       alert("❌ Error: " + error.message);
@@ -161,7 +178,7 @@ function RestaurantDashboard() {
         null,
         { params: { status } }
       );
-      await fetchData();
+      await refreshOrders();
       alert(`✅ Status updated to ${status}`);
     } catch (error) {
       alert("❌ Error: " + error.message);
@@ -171,13 +188,12 @@ function RestaurantDashboard() {
   const startAssignDrone = async (orderId) => {
     setAssigningOrderId(orderId);
     setSelectedDroneId("");
-    setAvailableDrones([]);
     setLoadingDrones(true);
     setErrorMessage("");
 
     try {
-      const res = await api.get(`/restaurant/${user.restaurant_id}/drones`);
-      setAvailableDrones(Array.isArray(res.data) ? res.data : []);
+      // The incremental refresh also returns the currently available drones.
+      await refreshOrders();
     } catch (error) {
       const status = error?.response?.status;
       const detail = error?.response?.data?.detail;
@@ -203,8 +219,7 @@ function RestaurantDashboard() {
       await api.post(`/orders/${orderId}/assign-drone`, { drone_id: selectedDroneId });
       setAssigningOrderId(null);
       setSelectedDroneId("");
-      setAvailableDrones([]);
-      await fetchData();
+      await refreshOrders();
       alert("✅ Drone assigned!");
     } catch (error) {
       const status = error?.response?.status;
@@ -285,7 +300,7 @@ function RestaurantDashboard() {
                       <h4>Order #{order.id?.substring(0, 8)}</h4>
                       <p className="status">{order.status}</p>
                       <p>Total: ${order.total?.toFixed(2)}</p>
-                      <p>Items: {order.items?.length}</p>
+                      <p>Items: {order.item_count ?? order.items?.length}</p>
                     </div>
                     <div className="actions">
                       {order.status === "PENDING" && (
@@ -421,6 +436,8 @@ function RestaurantDashboard() {
                             e.currentTarget.style.display = "none";
                           }}
                         />
+                      ) : item.image_status === "PENDING" ? (
+                        <p className="menu-list-item-image">⏳ Uploading image...</p>
                       ) : null}
                       <div>
                         <h4>{item.name}</h4>